@@ -0,0 +1,128 @@
+"""
+Adaptive sampling of power curves
+
+Instead of a fixed grid, a curve is evaluated on a coarse grid and then
+refined only where it bends (an interior point deviates from the chord of its
+neighbours by more than ``curvature_tol``) or where it crosses a target
+power. Each refinement round evaluates all new points in one call, so a
+vectorized power function, or a simulation run over a batch of scenarios,
+is called a handful of times rather than once per point.
+
+Crossings are then solved exactly: with a bracketed root finder for a
+continuous axis (e.g. the odds ratio), or by integer bisection for a sample
+size axis, where the crossing is the first integer on the target side.
+"""
+
+import numpy as np
+
+
+def _crossing_brackets(x, y, target):
+    """Indices i where the curve crosses ``target`` between x[i] and x[i + 1]"""
+    finite = np.isfinite(y[:-1]) & np.isfinite(y[1:])
+    return np.flatnonzero(finite & ((y[:-1] < target) != (y[1:] < target)))
+
+
+def adaptive_curve(func, lo, hi, targets=(0.8,), n_initial=9, curvature_tol=0.01,
+                   min_width=None, integer=False, xtol=1e-10, max_evaluations=500):
+    """
+    Sample ``func`` on [lo, hi], refining only where it bends or crosses a target
+
+    ``func`` maps an array of x values to an array of y values. With
+    ``integer=True`` the axis is a sample size and only integers are
+    evaluated. ``min_width`` (default 1/1000 of the range, or 1 for integer
+    axes) is the narrowest interval refined for curvature.
+
+    Returns a dict with the sorted evaluation points 'x' and 'y', 'crossings'
+    mapping each target to the array of x values where the curve reaches it,
+    and 'n_evaluations', the total number of points evaluated including the
+    crossing solves.
+    """
+    evaluations = 0
+
+    def evaluate(points):
+        nonlocal evaluations
+        points = np.asarray(points, dtype=float)
+        evaluations += points.size
+        return np.asarray(func(points), dtype=float).reshape(points.shape)
+
+    targets = np.atleast_1d(np.asarray(targets, dtype=float))
+    if min_width is None:
+        min_width = 1.0 if integer else (hi - lo) / 1000
+    x = np.linspace(lo, hi, n_initial)
+    if integer:
+        x = np.unique(np.round(x))
+    y = evaluate(x)
+
+    while evaluations < max_evaluations:
+        width = np.diff(x)
+        refine = np.zeros(width.size, dtype=bool)
+        if x.size >= 3:
+            # Deviation of each interior point from the chord of its neighbours
+            chord = y[:-2] + (y[2:] - y[:-2]) * (x[1:-1] - x[:-2]) / (x[2:] - x[:-2])
+            bent = ~(np.abs(y[1:-1] - chord) <= curvature_tol)
+            refine[:-1] |= bent
+            refine[1:] |= bent
+        for target in targets:
+            refine[_crossing_brackets(x, y, target)] = True
+        refine &= width > (2 if integer else 2 * min_width) - 1e-12
+        if not refine.any():
+            break
+        new = (x[:-1][refine] + x[1:][refine]) / 2
+        if integer:
+            new = np.floor(new)
+        new = new[:max_evaluations - evaluations]
+        x = np.concatenate([x, new])
+        y = np.concatenate([y, evaluate(new)])
+        order = np.argsort(x, kind='stable')
+        x, y = x[order], y[order]
+
+    crossings = {}
+    for target in targets:
+        brackets = _crossing_brackets(x, y, target)
+        a, b = x[brackets], x[brackets + 1]
+        rising = y[brackets] < target
+        if integer:
+            crossings[float(target)] = _integer_crossings(evaluate, a, b, rising, target)
+        else:
+            crossings[float(target)] = _continuous_crossings(evaluate, a, b, target, xtol)
+
+    return {
+        'x': x,
+        'y': y,
+        'crossings': crossings,
+        'n_evaluations': evaluations,
+    }
+
+
+def _continuous_crossings(evaluate, a, b, target, xtol):
+    """Exact crossings inside brackets [a, b] with a bracketed root finder"""
+    if a.size == 0:
+        return a
+    from scipy.optimize import elementwise
+
+    root = elementwise.find_root(
+        lambda points: evaluate(points) - target, (a, b),
+        tolerances=dict(xatol=xtol, xrtol=xtol)
+    )
+    return root.x
+
+
+def _integer_crossings(evaluate, a, b, rising, target):
+    """
+    First integer on the target side of each bracket, by integer bisection
+
+    Rising curves give the smallest n reaching the target, falling curves
+    the largest n still reaching it.
+    """
+    lo, hi = a.copy(), b.copy()
+    active = hi - lo > 1
+    while active.any():
+        mid = np.floor((lo[active] + hi[active]) / 2)
+        below = evaluate(mid) < target
+        # Keep the target strictly between f(lo) and f(hi)
+        move_lo = below == rising[active]
+        idx = np.flatnonzero(active)
+        lo[idx[move_lo]] = mid[move_lo]
+        hi[idx[~move_lo]] = mid[~move_lo]
+        active = hi - lo > 1
+    return np.where(rising, hi, lo)
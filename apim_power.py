@@ -0,0 +1,123 @@
+"""
+Native APIMPowerR power for distinguishable dyads
+
+Pure NumPy/SciPy implementation of the APIMPowerR "Power Given N" computation
+for distinguishable dyads with effects given as Cohen's d, reproducing the
+tables in apimpower-200dyads.txt and apimpower-154effectivedyads.txt.
+
+For each person, the actor and partner effects are coefficients in the
+regression of that person's outcome on both partners' predictors:
+
+- d -> standardized beta and correlation r with the outcome
+- ncp = d * sqrt(var_x * (1 - r_xx^2) * (N - 2)), with df = N - 3
+- partial r = ncp / sqrt(ncp^2 + df)
+- power from the noncentral t distribution
+
+Average and difference of the Person 1 and Person 2 effects use the
+coefficient covariance implied by the error correlation times the
+actor-partner predictor correlation, with normal-theory power, as APIMPowerR
+reports them. All arguments broadcast, so many scenarios are evaluated at
+once.
+"""
+
+import numpy as np
+
+import power_engine
+
+
+def odds_ratio_to_d(odds_ratio):
+    """Logistic conversion of an odds ratio to Cohen's d: log(OR) * sqrt(3) / pi"""
+    return np.log(np.asarray(odds_ratio, dtype=float)) * np.sqrt(3) / np.pi
+
+
+def apim_power(n_dyads, actor_d, partner_d, alpha=0.05, actor_d2=None, partner_d2=None,
+               predictor_correlation=0.3, error_correlation=0.3, predictor_variance=0.25,
+               predictor_ratio=1.0, error_ratio=1.0):
+    """
+    APIMPowerR power for actor and partner effects in distinguishable dyads
+
+    ``actor_d``/``partner_d`` are Person 1's effects; Person 2's default to the
+    same values. ``predictor_variance`` is Person 1's predictor variance (0.25
+    for a 50/50 dichotomy); ``predictor_ratio`` and ``error_ratio`` are
+    Person 2's predictor and error variances relative to Person 1's.
+
+    Returns a dict with 'df' and one entry per APIMPowerR table row
+    ('actor_1', 'actor_2', 'partner_1', 'partner_2', 'actor_difference',
+    'partner_difference', 'actor_average', 'partner_average'), each a dict of
+    arrays ('power', 'ncp', and for the individual effects 'd', 'beta', 'r',
+    'partial_r').
+    """
+    n_dyads, actor_d, partner_d, alpha, rxx, ree, var_x1, predictor_ratio, error_ratio = (
+        np.asarray(v, dtype=float) for v in (
+            n_dyads, actor_d, partner_d, alpha, predictor_correlation, error_correlation,
+            predictor_variance, predictor_ratio, error_ratio
+        )
+    )
+    actor_d2 = actor_d if actor_d2 is None else np.asarray(actor_d2, dtype=float)
+    partner_d2 = partner_d if partner_d2 is None else np.asarray(partner_d2, dtype=float)
+
+    df = n_dyads - 3
+    var_x2 = var_x1 * predictor_ratio
+    # Predictor information per dyad, net of the actor-partner correlation
+    info = (1 - rxx ** 2) * (n_dyads - 2)
+
+    def person(actor, partner, var_own, var_other):
+        scale = np.sqrt(1 + var_own * actor ** 2 + var_other * partner ** 2)
+        beta_actor = actor * np.sqrt(var_own) / scale
+        beta_partner = partner * np.sqrt(var_other) / scale
+        ncp_actor = actor * np.sqrt(var_own * info)
+        ncp_partner = partner * np.sqrt(var_other * info)
+        rows = {}
+        for name, d, beta, other_beta, ncp in (
+            ('actor', actor, beta_actor, beta_partner, ncp_actor),
+            ('partner', partner, beta_partner, beta_actor, ncp_partner),
+        ):
+            rows[name] = {
+                'd': d,
+                'beta': beta,
+                'r': beta + other_beta * rxx,
+                'partial_r': ncp / np.sqrt(ncp ** 2 + df),
+                'ncp': ncp,
+                'power': power_engine.noncentral_t_power(ncp, df, alpha),
+            }
+        return rows
+
+    person1 = person(actor_d, partner_d, var_x1, var_x2)
+    person2 = person(actor_d2, partner_d2, var_x2, var_x1)
+
+    result = {
+        'df': df,
+        'actor_1': person1['actor'],
+        'actor_2': person2['actor'],
+        'partner_1': person1['partner'],
+        'partner_2': person2['partner'],
+    }
+
+    # Unstandardized coefficients (Person 1 error SD = 1) and their sampling
+    # variances; estimates for the two persons correlate by r_ee * r_xx
+    sd_e2 = np.sqrt(error_ratio)
+    coef_corr = ree * rxx
+    for effect, var_1, var_2 in (('actor', var_x1, var_x2), ('partner', var_x2, var_x1)):
+        b1 = result[f'{effect}_1']['d']
+        b2 = result[f'{effect}_2']['d'] * sd_e2
+        v1 = 1 / (var_1 * info)
+        v2 = error_ratio / (var_2 * info)
+        cov = coef_corr * np.sqrt(v1 * v2)
+        for name, estimate, variance in (
+            ('difference', b1 - b2, v1 + v2 - 2 * cov),
+            ('average', (b1 + b2) / 2, (v1 + v2 + 2 * cov) / 4),
+        ):
+            ncp = estimate / np.sqrt(variance)
+            result[f'{effect}_{name}'] = {
+                'ncp': ncp,
+                'power': power_engine.normal_power(np.abs(ncp), alpha),
+            }
+
+    shape = np.broadcast_shapes(*(np.shape(v) for row in result.values() if isinstance(row, dict)
+                                  for v in row.values()), df.shape)
+    for name, row in result.items():
+        if name == 'df':
+            result[name] = np.broadcast_to(row, shape)
+        else:
+            result[name] = {key: np.broadcast_to(value, shape) for key, value in row.items()}
+    return result
@@ -0,0 +1,276 @@
+"""
+Batch runner for many K01 scenarios with shared sub-computations
+
+A scenario file holds one JSON object per line: a 'name' plus optional
+'aim1' and 'aim3' overrides of config.aim1_params / aim3_params.
+
+    {"name": "base"}
+    {"name": "n300", "aim1": {"n_south_asian": 300}}
+    {"name": "icc05", "aim3": {"icc_partners": 0.5}}
+
+Each scenario needs the primitive calls behind write_grant_ready_summary:
+two-sample power for the observed and target ORs at the scenario alpha,
+0.1 and 0.05, the simulated BH (FDR) power of the Aim 1 outcomes, and APIM
+power for Aim 3. The runner maps every scenario onto these calls, keyed by
+their arguments, so a call shared by several scenarios, or twice by one
+scenario (target OR at alpha 0.1 when alpha is 0.1), is computed once.
+The unique analytic calls of each kind are evaluated together in one
+vectorized power_engine call, and the unique simulations run in a process
+pool. Every scenario then gets its summary, written by
+K01PowerAnalysis.write_grant_ready_summary with the scenario's parameters
+to <output>/<name>.txt, plus one row of scenarios.csv.
+
+Usage:
+    python batch_runner.py scenarios.jsonl --output batch_summaries --jobs 4
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+
+import numpy as np
+
+import config
+import instrumentation
+import power_engine
+from k01_power_analysis import K01PowerAnalysis
+from result_writer import write_table
+from simulation import run_chunks
+
+# Aim 1 parameters the outcome simulation depends on (target_or does not enter)
+MULTIPLICITY_PARAMS = ('n_south_asian', 'n_others', 'design_effect', 'alpha', 'ipv_p_south_asian', 'ipv_p_others')
+
+# Columns of scenarios.csv: (results entry, key)
+SUMMARY_COLUMNS = {
+    'power_unadjusted': ('aim1_results', 'power_unadjusted'),
+    'power_05': ('aim1_results', 'power_05'),
+    'power_fdr': ('aim1_results', 'power_fdr'),
+    'target_power_01': ('target_or_results', 'power_01'),
+    'target_power_05': ('target_or_results', 'power_05'),
+    'actor_power': ('aim3_results', 'actor_power'),
+    'partner_power': ('aim3_results', 'partner_power'),
+}
+
+
+def read_scenarios(path):
+    """Scenarios of a JSON lines file, with parameters merged over config"""
+    scenarios = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            spec = json.loads(line)
+            name = spec.get('name')
+            if not isinstance(name, str) or not re.fullmatch(r'[\w.-]+', name):
+                raise ValueError(f"{path}:{line_number}: scenario name has to be letters, digits, '_', '.' or '-'")
+            if any(s['name'] == name for s in scenarios):
+                raise ValueError(f"{path}:{line_number}: duplicate scenario {name!r}")
+            unknown = set(spec) - {'name', 'aim1', 'aim3'}
+            for aim, defaults in (('aim1', config.aim1_params), ('aim3', config.aim3_params)):
+                unknown |= {f'{aim}.{key}' for key in set(spec.get(aim, {})) - set(defaults)}
+            if unknown:
+                raise ValueError(f"{path}:{line_number}: unknown parameters {', '.join(sorted(unknown))}")
+            scenarios.append({
+                'name': name,
+                'aim1_params': {**config.aim1_params, **spec.get('aim1', {})},
+                'aim3_params': {**config.aim3_params, **spec.get('aim3', {})},
+            })
+    return scenarios
+
+
+def scenario_calls(scenario):
+    """
+    Primitive calls of one scenario, by role
+
+    Calls are (kind, arguments) tuples of plain floats, so equal calls of
+    different scenarios compare equal.
+    """
+    p1, p3 = scenario['aim1_params'], scenario['aim3_params']
+    p_target = float(power_engine.or_to_proportion(p1['target_or'], p1['ipv_p_others']))
+
+    def two_sample(p_south_asian, alpha):
+        return ('two_sample', tuple(float(v) for v in (
+            p1['n_south_asian'], p1['n_others'], p_south_asian, p1['ipv_p_others'], alpha, p1['design_effect']
+        )))
+
+    return {
+        'aim1': two_sample(p1['ipv_p_south_asian'], p1['alpha']),
+        'aim1_05': two_sample(p1['ipv_p_south_asian'], 0.05),
+        'target_01': two_sample(p_target, 0.1),
+        'target_05': two_sample(p_target, 0.05),
+        'multiplicity': ('multiplicity', tuple(float(p1[key]) for key in MULTIPLICITY_PARAMS)),
+        'aim3': ('dyadic', tuple(float(p3[key]) for key in (
+            'n_couples', 'baseline_ipv_rate', 'actor_effect_OR', 'partner_effect_OR', 'icc_partners', 'alpha'
+        ))),
+    }
+
+
+def build_graph(scenarios):
+    """
+    Unique calls and the calls each scenario depends on
+
+    Returns (calls, dependencies): ``calls`` maps each kind to its unique
+    argument tuples in first-seen order, ``dependencies`` maps each scenario
+    name to role -> (kind, index into calls[kind]).
+    """
+    calls = {}
+    index = {}
+    dependencies = {}
+    for scenario in scenarios:
+        roles = {}
+        for role, (kind, args) in scenario_calls(scenario).items():
+            if (kind, args) not in index:
+                index[(kind, args)] = len(calls.setdefault(kind, []))
+                calls[kind].append(args)
+            roles[role] = (kind, index[(kind, args)])
+        dependencies[scenario['name']] = roles
+    return calls, dependencies
+
+
+def _two_sample(calls):
+    columns = np.array(calls).T
+    result = power_engine.two_sample_proportion_power(*columns)
+    return [
+        {
+            'power': float(result['power'][i]),
+            'effect_size_h': float(result['effect_size_h'][i]),
+            'n1_effective': float(result['n1_effective'][i]),
+            'n2_effective': float(result['n2_effective'][i]),
+            'observed_OR': float(result['observed_OR'][i]),
+            'p1': float(result['p1'][i]),
+            'p2': float(result['p2'][i]),
+        }
+        for i in range(len(calls))
+    ]
+
+
+def _dyadic(calls):
+    columns = np.array(calls).T
+    result = power_engine.dyadic_power_apim(*columns)
+    return [
+        {key: float(result[key][i]) for key in ('actor_power', 'partner_power', 'design_effect', 'n_effective')}
+        for i in range(len(calls))
+    ]
+
+
+def _multiplicity(args, n_jobs):
+    """BH/Holm outcome simulation of one Aim 1 design (K01PowerAnalysis.multiplicity_power)"""
+    analysis = K01PowerAnalysis()
+    analysis.aim1_params.update(zip(MULTIPLICITY_PARAMS, args))
+    return analysis.multiplicity_power(n_jobs=n_jobs)
+
+
+def evaluate_calls(calls, n_jobs=None):
+    """Results of every unique call, by kind, in the order of ``calls``"""
+    results = {}
+    if calls.get('two_sample'):
+        results['two_sample'] = _two_sample(calls['two_sample'])
+    if calls.get('dyadic'):
+        results['dyadic'] = _dyadic(calls['dyadic'])
+    tasks = calls.get('multiplicity', [])
+    if len(tasks) == 1:
+        # A single simulation uses the pool for its own chunks instead
+        results['multiplicity'] = [_multiplicity(tasks[0], n_jobs)]
+    elif tasks:
+        results['multiplicity'] = run_chunks(_multiplicity, [(args, 1) for args in tasks], n_jobs)
+    return results
+
+
+def scenario_results(scenario, roles, results):
+    """Aim 1, target OR and Aim 3 results of one scenario, in the form write_grant_ready_summary reads"""
+    def get(role):
+        kind, i = roles[role]
+        return results[kind][i]
+
+    aim1, aim1_05, joint = get('aim1'), get('aim1_05'), get('multiplicity')
+    ipv = joint['outcomes'].index('ipv')
+    target_01 = get('target_01')
+    return {
+        'aim1_results': {
+            'p_south_asian': aim1['p1'],
+            'p_others': aim1['p2'],
+            'observed_OR': aim1['observed_OR'],
+            'power_unadjusted': aim1['power'],
+            'power_05': aim1_05['power'],
+            'power_fdr': joint['bh']['outcome_power'][ipv],
+            'power_holm': joint['holm']['outcome_power'][ipv],
+            'n_sa_effective': aim1['n1_effective'],
+        },
+        'target_or_results': {
+            'target_or': scenario['aim1_params']['target_or'],
+            'target_proportion': target_01['p1'],
+            'power_01': target_01['power'],
+            'power_05': get('target_05')['power'],
+        },
+        'aim3_results': get('aim3'),
+    }
+
+
+def render_summary(scenario, results):
+    """Text of write_grant_ready_summary for one scenario"""
+    analysis = K01PowerAnalysis()
+    analysis.aim1_params = dict(scenario['aim1_params'])
+    analysis.aim3_params = dict(scenario['aim3_params'])
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        analysis.write_grant_ready_summary(results['aim1_results'], results['target_or_results'],
+                                           results['aim3_results'])
+    return buffer.getvalue()
+
+
+def run_batch(scenarios, output=None, n_jobs=None):
+    """
+    Compute every scenario, each unique primitive call once
+
+    ``scenarios`` is a list as returned by read_scenarios. With ``output``,
+    summaries are written to <output>/<name>.txt and the key numbers to
+    <output>/scenarios.csv. Returns 'scenarios' (name -> results and
+    'summary' text), 'n_calls' (calls needed without deduplication) and
+    'n_unique' (calls computed).
+    """
+    calls, dependencies = build_graph(scenarios)
+    n_calls = sum(len(roles) for roles in dependencies.values())
+    n_unique = sum(len(args) for args in calls.values())
+    instrumentation.count('batch_runner.calls', n_calls)
+    instrumentation.count('batch_runner.unique_calls', n_unique)
+
+    with instrumentation.stage('batch_runner.evaluate'):
+        results = evaluate_calls(calls, n_jobs)
+
+    output_scenarios = {}
+    for scenario in scenarios:
+        scenario_result = scenario_results(scenario, dependencies[scenario['name']], results)
+        scenario_result['summary'] = render_summary(scenario, scenario_result)
+        output_scenarios[scenario['name']] = scenario_result
+
+    if output is not None:
+        os.makedirs(output, exist_ok=True)
+        for name, scenario_result in output_scenarios.items():
+            with open(os.path.join(output, f'{name}.txt'), 'w') as f:
+                f.write(scenario_result['summary'])
+        columns = {'name': np.array(list(output_scenarios))}
+        for column, (entry, key) in SUMMARY_COLUMNS.items():
+            columns[column] = np.array([r[entry][key] for r in output_scenarios.values()])
+        write_table(os.path.join(output, 'scenarios.csv'), columns)
+
+    return {'scenarios': output_scenarios, 'n_calls': n_calls, 'n_unique': n_unique}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grant-ready power summaries for many K01 scenarios")
+    parser.add_argument('scenarios', help="JSON lines file of scenarios")
+    parser.add_argument('--output', default=config.batch_params['output_dir'])
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: every core)")
+    args = parser.parse_args(argv)
+
+    result = run_batch(read_scenarios(args.scenarios), args.output, args.jobs)
+    print(f"{len(result['scenarios'])} scenarios, {result['n_unique']} unique of {result['n_calls']} calls; "
+          f"summaries in {args.output}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Benchmark suite for the K01 power primitives
+
+Times the scalar and batched paths of the power primitives, the full
+create_power_vs_or_plots sweep and main() end to end, and compares each
+timing with the stored baseline in baselines.json. A benchmark fails when it
+runs more than ``--threshold`` times slower than its baseline.
+
+Usage:
+    python benchmarks/bench_power.py                 # compare with baselines
+    python benchmarks/bench_power.py --update        # record new baselines
+    python benchmarks/bench_power.py --only batch    # benchmarks matching 'batch'
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import numpy as np
+
+import config
+import k01_power_analysis
+from k01_power_analysis import K01PowerAnalysis
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# Grids shared by the scalar and batched benchmarks
+N_GRID = np.arange(100, 500, 25)
+OR_GRID = np.arange(1.05, 2.5, 0.05)
+
+
+def bench_two_sample_scalar(analysis):
+    p = config.aim1_params
+    for n in N_GRID:
+        for alpha in (0.05, 0.1):
+            analysis.two_sample_proportion_power(
+                n, p['n_others'], p['ipv_p_south_asian'], p['ipv_p_others'], alpha, p['design_effect']
+            )
+
+
+def bench_two_sample_batch(analysis):
+    p = config.aim1_params
+    analysis.two_sample_proportion_power_batch(
+        N_GRID[:, None], p['n_others'], p['ipv_p_south_asian'], p['ipv_p_others'],
+        np.array([0.05, 0.1]), p['design_effect']
+    )
+
+
+def bench_min_detectable_OR_scalar(analysis):
+    p = config.aim1_params
+    for n in N_GRID:
+        analysis.min_detectable_OR(n, p['n_others'], p['ipv_p_others'], 0.8, p['alpha'], p['design_effect'])
+
+
+def bench_min_detectable_OR_batch(analysis):
+    analysis.min_detectable_OR_grid(n1=N_GRID)
+
+
+def bench_dyadic_scalar(analysis):
+    p = config.aim3_params
+    for odds_ratio in OR_GRID:
+        analysis.dyadic_power_apim(
+            p['n_couples'], p['baseline_ipv_rate'], odds_ratio, odds_ratio, p['icc_partners'], p['alpha']
+        )
+
+
+def bench_dyadic_batch(analysis):
+    p = config.aim3_params
+    analysis.dyadic_power_apim_batch(
+        p['n_couples'], p['baseline_ipv_rate'], OR_GRID, OR_GRID, p['icc_partners'], p['alpha']
+    )
+
+
+def bench_power_vs_or_plots(analysis):
+    with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp):
+        analysis.create_power_vs_or_plots()
+
+
+# Working directory of the cached figure benchmark; main() creates it for the
+# session and removes it on exit
+_figure_dir = None
+
+
+def bench_power_vs_or_plots_cached(analysis):
+    # Same directory every call (the warm-up renders it cold): the panels come from the figure cache
+    with contextlib.chdir(_figure_dir):
+        analysis.create_power_vs_or_plots()
+
+
+def bench_main(analysis):
+    with tempfile.TemporaryDirectory() as tmp, contextlib.chdir(tmp), \
+            contextlib.redirect_stdout(io.StringIO()):
+        k01_power_analysis.main()
+
+
+BENCHMARKS = {
+    'two_sample_proportion_power.scalar': (bench_two_sample_scalar, 20),
+    'two_sample_proportion_power.batch': (bench_two_sample_batch, 200),
+    'min_detectable_OR.scalar': (bench_min_detectable_OR_scalar, 5),
+    'min_detectable_OR.batch': (bench_min_detectable_OR_batch, 50),
+    'dyadic_power_apim.scalar': (bench_dyadic_scalar, 20),
+    'dyadic_power_apim.batch': (bench_dyadic_batch, 200),
+    'create_power_vs_or_plots': (bench_power_vs_or_plots, 1),
+    'create_power_vs_or_plots.cached': (bench_power_vs_or_plots_cached, 1),
+    'main': (bench_main, 1),
+}
+
+
+def time_benchmark(func, number, repeat=3):
+    """Best-of-``repeat`` seconds per call of ``func`` over ``number`` calls (no cache)"""
+    analysis = K01PowerAnalysis()
+    func(analysis)  # warm-up: lazy imports, first-call setup
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(analysis)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def load_baselines(path=BASELINES):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    global _figure_dir
+    parser = argparse.ArgumentParser(description="Benchmark the K01 power primitives")
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help="fail when a benchmark is this many times slower than its baseline")
+    parser.add_argument('--update', action='store_true', help="store the timings as the new baselines")
+    parser.add_argument('--only', default=None, help="run benchmarks whose name contains this text")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines()
+    timings = {}
+    failures = []
+    print(f"{'benchmark':<38}{'seconds':>12}{'baseline':>12}{'ratio':>8}")
+    with tempfile.TemporaryDirectory(prefix='k01_bench_figures_') as _figure_dir:
+        for name, (func, number) in BENCHMARKS.items():
+            if args.only and args.only not in name:
+                continue
+            seconds = time_benchmark(func, number, args.repeat)
+            timings[name] = seconds
+            baseline = baselines.get(name)
+            if baseline:
+                ratio = seconds / baseline
+                status = '  SLOW' if ratio > args.threshold else ''
+                print(f"{name:<38}{seconds:>12.6f}{baseline:>12.6f}{ratio:>8.2f}{status}")
+                if ratio > args.threshold:
+                    failures.append(name)
+            else:
+                print(f"{name:<38}{seconds:>12.6f}{'-':>12}{'-':>8}")
+
+    _figure_dir = None
+
+    if args.update:
+        baselines.update({name: round(seconds, 6) for name, seconds in timings.items()})
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baselines written to {BASELINES}")
+    elif failures:
+        print(f"{len(failures)} benchmark(s) slower than {args.threshold}x baseline: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
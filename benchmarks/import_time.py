@@ -0,0 +1,61 @@
+"""
+Import-time benchmark for the K01 modules
+
+Times each import in a fresh interpreter (median of several runs) and lists
+the heavy plotting/reporting libraries it pulls in.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+HEAVY_MODULES = ['matplotlib', 'seaborn', 'pandas', 'statsmodels', 'scipy.optimize']
+
+TARGETS = ['power_engine', 'k01_power_analysis', 'plotting']
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module, repeat=5):
+    """Median import time of ``module`` in a fresh interpreter, and the heavy modules it loads"""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'seconds': statistics.median(run['seconds'] for run in runs),
+        'heavy': runs[-1]['heavy'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time imports of the K01 modules")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = {module: measure(module, args.repeat) for module in TARGETS}
+    print(f"{'module':<22}{'import (s)':>12}  heavy modules loaded")
+    for module, result in results.items():
+        print(f"{module:<22}{result['seconds']:>12.3f}  {', '.join(result['heavy']) or '-'}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,37 @@ aim1_params = {
     'ipv_p_others': 0.06
 }
 
+# Aim 1 outcomes tested together (consultation notes, line 92). Rates of None
+# take the IPV rates from aim1_params until outcome-specific CHIS estimates
+# are available; outcome_correlation is the correlation of the test statistics.
+aim1_outcomes = {
+    'names': ['ipv', 'contraceptive_use', 'contraceptive_counseling'],
+    'p_south_asian': [None, None, None],
+    'p_others': [None, None, None],
+    'outcome_correlation': 0.3
+}
+
+# Covariates of the Aim 1 Fairlie decomposition (see decomposition.py):
+# prevalence in each group and log odds ratio on IPV. Illustrative values
+# until the CHIS estimates are in.
+aim1_decomposition = {
+    'covariates': {
+        'immigrant': {'p_south_asian': 0.75, 'p_others': 0.30, 'log_or': 0.2},
+        'married': {'p_south_asian': 0.70, 'p_others': 0.50, 'log_or': -0.2},
+        'college': {'p_south_asian': 0.65, 'p_others': 0.35, 'log_or': -0.4},
+        'low_income': {'p_south_asian': 0.15, 'p_others': 0.25, 'log_or': 0.5}
+    }
+}
+
+# Simulated CHIS-like survey design for simulation-based Aim 1 power
+# (weight CV 0.7 gives a Kish design effect of about 1.5)
+aim1_survey_design = {
+    'n_strata': 40,
+    'psus_per_stratum': 10,
+    'weight_cv': 0.7,
+    'psu_icc': 0.02
+}
+
 aim3_params = {
     'n_couples': 200,
     'n_individuals': 400,
@@ -18,5 +49,149 @@ aim3_params = {
     'baseline_ipv_rate': 0.20,
     'icc_partners': 0.3,
     'actor_effect_OR': 1.4,
-    'partner_effect_OR': 1.6
-}
\ No newline at end of file
+    'partner_effect_OR': 1.6,
+    'predictor_prevalence': 0.5,
+    'predictor_correlation': 0.3
+}
+
+# Sensitivity sweep grids (see sweep.py); keys match aim1_params/aim3_params,
+# except 'odds_ratio', which sets the South Asian IPV rate relative to
+# ipv_p_others. Parameters left out stay at their point values.
+aim1_grid = {
+    'n_south_asian': [150, 200, 237, 300, 400],
+    'odds_ratio': [1.15, 1.3, 1.5, 1.74, 2.0],
+    'alpha': [0.05, 0.1],
+    'design_effect': [1.0, 1.5, 2.0],
+    'ipv_p_others': [0.04, 0.06, 0.08]
+}
+
+aim3_grid = {
+    'n_couples': [100, 150, 200, 250, 300],
+    'actor_effect_OR': [1.2, 1.4, 1.6, 1.8],
+    'partner_effect_OR': [1.2, 1.4, 1.6, 1.8],
+    'alpha': [0.05, 0.1],
+    'icc_partners': [0.1, 0.3, 0.5],
+    'baseline_ipv_rate': [0.1, 0.2, 0.3]
+}
+
+# Sobol sensitivity analysis over the grid ranges above (see sensitivity.py);
+# n_base * (number of parameters + 2) power evaluations per aim
+sensitivity_params = {
+    'n_base': 16384,
+    'n_bootstrap': 500,
+    'confidence': 0.95,
+    'seed': 20250603,
+    'chunk_size': 50_000,
+    'n_jobs': None
+}
+
+# Monte Carlo settings for simulation-based power
+simulation_params = {
+    'n_reps': 2000,
+    'seed': 20250603,
+    'n_jobs': None,
+    'chunk_size': 250,
+    'survey_chunk_size': 50,
+    'multiplicity_reps': 1_000_000,
+    'multiplicity_chunk_size': 250_000,
+    'decomposition_reps': 1000,
+    'decomposition_bootstrap': 200,
+    'decomposition_chunk_size': 50
+}
+
+# Priors for assurance (expected power, see assurance.py), keyed by
+# aim1_params/aim3_params entry: scipy.stats distribution name and parameters.
+# Beta(10, 90) has mean 0.10 and SD 0.03; Beta(6, 14) has mean 0.3 and SD 0.1.
+assurance_priors = {
+    'aim1': {
+        'ipv_p_south_asian': {'distribution': 'beta', 'a': 10, 'b': 90}
+    },
+    'aim3': {
+        'icc_partners': {'distribution': 'beta', 'a': 6, 'b': 14}
+    }
+}
+
+# 'quadrature' (Gauss-Legendre in quantile space) or 'qmc' (scrambled Sobol)
+assurance_params = {
+    'method': 'quadrature',
+    'n_nodes': 32,
+    'n_samples': 4096,
+    'seed': 20250603
+}
+
+# Sequential Monte Carlo (see sequential.py): stop once the Wilson interval
+# of every power is narrower than 'tolerance' or excludes 'target'
+sequential_params = {
+    'target': 0.8,
+    'tolerance': 0.02,
+    'confidence': 0.95,
+    'min_reps': 500,
+    'max_reps': 20000
+}
+
+# Memoization cache for power computations (see power_cache.py)
+cache_params = {
+    'path': '.k01_cache/power_cache.sqlite',
+    'max_memory_items': 4096,
+    'max_disk_mb': 512
+}
+
+# Precomputed power surfaces (see surface_store.py). Each dimension is a list
+# of values or an evenly spaced {'start', 'stop', 'num'} range; aim3_power is
+# the power of one APIM effect, actor or partner, as a function of its OR.
+surface_params = {
+    'directory': '.k01_cache/surfaces',
+    'chunk_size': 8
+}
+
+surface_grids = {
+    'aim1_power': {
+        'n_south_asian': {'start': 50, 'stop': 1000, 'num': 191},
+        'odds_ratio': {'start': 1.0, 'stop': 2.5, 'num': 151},
+        'alpha': [0.01, 0.05, 0.1],
+        'design_effect': {'start': 1.0, 'stop': 2.5, 'num': 16}
+    },
+    'aim3_power': {
+        'n_couples': {'start': 50, 'stop': 500, 'num': 91},
+        'effect_OR': {'start': 1.0, 'stop': 2.5, 'num': 151},
+        'alpha': [0.01, 0.05, 0.1],
+        'icc_partners': {'start': 0.0, 'stop': 0.8, 'num': 17}
+    }
+}
+
+# Figure rendering (see plotting.py); panels are cached by data hash
+render_params = {
+    'dpi': 300,
+    'cache_dir': '.k01_cache/figures',
+    'max_cache_mb': 256,
+    'n_jobs': None
+}
+
+# Local power-calculation service (see service.py)
+service_params = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'max_batch': 512,
+    'max_delay_ms': 2
+}
+
+# Batch scenario runner (see batch_runner.py)
+batch_params = {
+    'output_dir': 'batch_summaries'
+}
+
+# Opt-in lookup tables for critical values and noncentral-t power (see lookup_tables.py);
+# other alphas, df below df_min and |ncp| above ncp_max are evaluated exactly
+lookup_params = {
+    'enabled': False,
+    'alphas': [0.01, 0.05, 0.1],
+    'tolerance': 1e-5,
+    'df_min': 20,
+    'ncp_max': 12.0
+}
+
+# Opt-in timing and counters for main() (see instrumentation.py)
+instrumentation_params = {
+    'enabled': False,
+    'json_path': 'k01_instrumentation.json'
+}
@@ -0,0 +1,167 @@
+"""
+Power of the Aim 1 Fairlie decomposition of the South Asian vs others IPV gap
+
+The gap in IPV rates is split into an explained part, due to differences in
+covariates between the groups, and an unexplained part (Fairlie's nonlinear
+Blinder-Oaxaca decomposition with the comparison group's logistic
+coefficients):
+
+    explained   = mean_SA F(X b) - mean_others F(X b)
+    unexplained = ybar_SA - mean_SA F(X b)
+
+Data are simulated from binary covariates with group-specific prevalences
+(config.aim1_decomposition) and a logistic IPV model calibrated to the two
+IPV rates. With binary covariates each respondent falls in one of 2^K
+covariate cells, so a sample is a vector of cell counts by group and
+outcome. Resampling respondents with replacement is then exactly a
+multinomial draw of cell counts, which batches thousands of replicates x
+hundreds of bootstrap resamples into arrays independent of the 33,000-person
+comparison group. All fits of a chunk run as one stacked IRLS
+(simulation.batched_logistic_irls), and chunks run in a process pool with
+independent RNG streams.
+
+Each component is tested with a two-sided Wald test using its bootstrap
+standard error; power is the rejection rate among converged replicates.
+"""
+
+import numpy as np
+from scipy import special
+
+from simulation import batched_logistic_irls, run_chunks, spawn_streams, split_reps
+
+COMPONENTS = ('explained', 'unexplained', 'gap')
+
+
+def covariate_design(n_covariates):
+    """Design of every binary covariate pattern (2^K rows), with an intercept column"""
+    patterns = (np.arange(2 ** n_covariates)[:, None] >> np.arange(n_covariates)) & 1
+    return np.column_stack([np.ones(len(patterns)), patterns.astype(float)])
+
+
+def calibrate(covariates, p_south_asian, p_others):
+    """
+    Logistic IPV model reproducing both groups' IPV rates
+
+    ``covariates`` maps each name to its 'p_south_asian' and 'p_others'
+    prevalence and its 'log_or' on IPV (covariates independent within
+    group). The intercept fits the comparison rate and a South Asian group
+    effect the South Asian rate. Returns the design, cell probabilities of
+    each group and the true components.
+    """
+    from scipy.optimize import brentq
+
+    specs = list(covariates.values())
+    design = covariate_design(len(specs))
+    patterns = design[:, 1:] == 1
+    cells = {}
+    for group in ('p_south_asian', 'p_others'):
+        prevalence = np.array([spec[group] for spec in specs])
+        cells[group] = np.prod(np.where(patterns, prevalence, 1 - prevalence), axis=1)
+    log_or = np.array([spec['log_or'] for spec in specs])
+    eta = design[:, 1:] @ log_or
+
+    intercept = brentq(lambda b: cells['p_others'] @ special.expit(b + eta) - p_others, -30, 30)
+    group_effect = brentq(
+        lambda g: cells['p_south_asian'] @ special.expit(intercept + g + eta) - p_south_asian, -30, 30
+    )
+    explained = cells['p_south_asian'] @ special.expit(intercept + eta) - p_others
+    risk_sa = special.expit(intercept + group_effect + eta)
+    risk_others = special.expit(intercept + eta)
+    return {
+        'design': design,
+        # Cell probabilities ordered [IPV by pattern, no IPV by pattern]
+        'cells_south_asian': np.concatenate([cells['p_south_asian'] * risk_sa,
+                                             cells['p_south_asian'] * (1 - risk_sa)]),
+        'cells_others': np.concatenate([cells['p_others'] * risk_others, cells['p_others'] * (1 - risk_others)]),
+        'coef': np.concatenate([[intercept], log_or]),
+        'group_effect': group_effect,
+        'explained': explained,
+        'unexplained': p_south_asian - p_others - explained,
+        'gap': p_south_asian - p_others,
+    }
+
+
+def fairlie_components(counts_sa, counts_others, design):
+    """
+    Decomposition of each sample given as cell counts (..., 2 * n_cells)
+
+    Counts are ordered as in calibrate(). Returns 'explained',
+    'unexplained', 'gap' and 'converged' (the comparison-group fit), shaped
+    like the leading axes.
+    """
+    n_cells = design.shape[0]
+    shape = counts_others.shape[:-1]
+    sa = counts_sa.reshape(-1, 2 * n_cells).astype(float)
+    others = counts_others.reshape(-1, 2 * n_cells).astype(float)
+
+    # Logistic fit on the comparison group: one weighted row per cell and outcome
+    X = np.vstack([design, design])
+    y = np.broadcast_to(np.repeat([1.0, 0.0], n_cells), others.shape)
+    fit = batched_logistic_irls(X, y, others)
+    risk = special.expit(fit['coef'] @ design.T)
+
+    totals = {}
+    for name, counts in (('sa', sa), ('others', others)):
+        per_cell = counts[:, :n_cells] + counts[:, n_cells:]
+        n = per_cell.sum(axis=1)
+        totals[name] = (counts[:, :n_cells].sum(axis=1) / n, (per_cell * risk).sum(axis=1) / n)
+    (ybar_sa, predicted_sa), (ybar_others, predicted_others) = totals['sa'], totals['others']
+    return {
+        'explained': (predicted_sa - predicted_others).reshape(shape),
+        'unexplained': (ybar_sa - predicted_sa).reshape(shape),
+        'gap': (ybar_sa - ybar_others).reshape(shape),
+        'converged': fit['converged'].reshape(shape),
+    }
+
+
+def _decomposition_chunk(seed_seq, n_reps, n_sa, n_others, model, n_bootstrap, alpha):
+    """Rejections, estimates and bootstrap SEs of one chunk of replicates"""
+    rng = np.random.default_rng(seed_seq)
+    sa = rng.multinomial(n_sa, model['cells_south_asian'], size=n_reps)
+    others = rng.multinomial(n_others, model['cells_others'], size=n_reps)
+    # Resampling respondents within group, drawn directly as cell counts
+    boot_sa = rng.multinomial(n_sa, sa / n_sa, size=(n_bootstrap, n_reps))
+    boot_others = rng.multinomial(n_others, others / n_others, size=(n_bootstrap, n_reps))
+
+    estimate = fairlie_components(sa, others, model['design'])
+    boot = fairlie_components(boot_sa, boot_others, model['design'])
+    z_crit = special.ndtri(1 - alpha / 2)
+    result = {'converged': estimate['converged']}
+    for name in COMPONENTS:
+        se = np.nanstd(np.where(boot['converged'], boot[name], np.nan), axis=0, ddof=1)
+        result[name] = (np.abs(estimate[name]) > z_crit * se, estimate[name], se)
+    return result
+
+
+def simulate_decomposition_power(covariates, p_south_asian, p_others, n_south_asian, n_others,
+                                 design_effect=1.0, alpha=0.05, n_reps=1000, n_bootstrap=200,
+                                 seed=None, n_jobs=None, chunk_size=50):
+    """
+    Monte Carlo power to detect the explained, unexplained and total gap
+
+    Samples have the effective sizes n / ``design_effect`` (rounded). Returns
+    '<component>_power' for each component, the true components, the mean
+    estimates ('<component>_mean') and bootstrap SEs ('<component>_se'),
+    'n_reps' and 'n_converged'.
+    """
+    model = calibrate(covariates, p_south_asian, p_others)
+    n_sa = int(round(n_south_asian / design_effect))
+    n_o = int(round(n_others / design_effect))
+
+    chunks = split_reps(n_reps, chunk_size)
+    streams = spawn_streams(seed, len(chunks))
+    tasks = [(stream, reps, n_sa, n_o, model, n_bootstrap, alpha) for stream, reps in zip(streams, chunks)]
+    results = run_chunks(_decomposition_chunk, tasks, n_jobs)
+
+    converged = np.concatenate([r['converged'] for r in results])
+    n_converged = int(converged.sum())
+    output = {}
+    for name in COMPONENTS:
+        reject, estimate, se = (np.concatenate([r[name][i] for r in results])[converged] for i in range(3))
+        output[f'{name}_power'] = float(reject.mean()) if n_converged else np.nan
+        output[name] = float(model[name])
+        output[f'{name}_mean'] = float(estimate.mean()) if n_converged else np.nan
+        output[f'{name}_se'] = float(np.mean(se)) if n_converged else np.nan
+    output['n_reps'] = n_reps
+    output['n_converged'] = n_converged
+    return output
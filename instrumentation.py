@@ -0,0 +1,150 @@
+"""
+Opt-in instrumentation for the K01 power computations
+
+Records per-method wall time and call counts, cache hits and misses,
+normal-approximation fallback hits and root-finder iterations, plus the
+wall time of named stages (e.g. the steps of k01_power_analysis.main).
+Nothing is recorded unless instrumentation is enabled, and the hooks cost a
+single check when it is not.
+
+    with instrumentation.instrumented() as record:
+        analysis.run_sweep('aim3')
+    print(record.summary())
+    record.to_json('k01_instrumentation.json')
+
+Only the current process is recorded; work done in pool workers
+(n_jobs > 1) shows up as the wall time of the calling method.
+"""
+
+import contextlib
+import functools
+import json
+import time
+from collections import defaultdict
+
+import numpy as np
+
+_active = None
+
+
+class Instrumentation:
+    """Timings and counters collected while instrumentation is enabled"""
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = defaultdict(int)
+
+    def record(self, name, seconds):
+        entry = self.timings.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] += int(n)
+
+    def reset(self):
+        self.timings.clear()
+        self.counters.clear()
+
+    def to_dict(self):
+        return {
+            'timings': {name: dict(entry) for name, entry in sorted(self.timings.items())},
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def to_json(self, path=None):
+        """JSON export; written to ``path`` if given"""
+        text = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text + '\n')
+        return text
+
+    def summary(self):
+        """Plain-text table of timings (slowest first) and counters"""
+        lines = [f"{'name':<46}{'calls':>8}{'total (s)':>12}{'mean (ms)':>12}{'max (ms)':>12}"]
+        for name, entry in sorted(self.timings.items(), key=lambda item: -item[1]['seconds']):
+            mean_ms = 1000 * entry['seconds'] / entry['calls']
+            lines.append(f"{name:<46}{entry['calls']:>8}{entry['seconds']:>12.4f}"
+                         f"{mean_ms:>12.3f}{1000 * entry['max_seconds']:>12.3f}")
+        if self.counters:
+            lines.append('')
+            lines.append(f"{'counter':<46}{'count':>8}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name:<46}{value:>8}")
+        return '\n'.join(lines)
+
+
+def enable():
+    """Start recording into a fresh Instrumentation and return it"""
+    global _active
+    _active = Instrumentation()
+    return _active
+
+
+def disable():
+    """Stop recording; returns what was recorded"""
+    global _active
+    record, _active = _active, None
+    return record
+
+
+def active():
+    """The current Instrumentation, or None when disabled"""
+    return _active
+
+
+@contextlib.contextmanager
+def instrumented():
+    """Record everything inside the block, restoring the previous state afterwards"""
+    global _active
+    previous = _active
+    record = enable()
+    try:
+        yield record
+    finally:
+        _active = previous
+
+
+def count(name, n=1):
+    """Add ``n`` to a counter if instrumentation is enabled"""
+    if _active is not None:
+        _active.count(name, n)
+
+
+def count_mask(name, mask):
+    """Count the True elements of a boolean mask (e.g. fallback elements)"""
+    if _active is not None:
+        _active.count(name, np.count_nonzero(mask))
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a block as a named stage"""
+    if _active is None:
+        yield
+        return
+    record = _active
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.record(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Record wall time and calls of a function under ``name``"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            record = _active
+            if record is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -10,29 +10,41 @@ Author: K01 Applicant
 Date: 2025-06-10
 """
 
+import contextlib
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy import stats
-import statsmodels.stats.power as smp
-from statsmodels.stats.proportion import proportions_ztest, proportion_effectsize
-from statsmodels.stats.multitest import multipletests
-from scipy.optimize import fsolve
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
+import adaptive
 import config
-
-# Set plotting style
-plt.style.use('default')
-sns.set_palette("husl")
+import apim_power
+import assurance
+import decomposition
+import exact_power
+import instrumentation
+import lookup_tables
+import multiplicity
+import power_engine
+from power_cache import PowerCache, cached
+from results import PowerResultTable
+import sensitivity
+import sequential
+import simulation
+import surface_store
+import sweep
 
 class K01PowerAnalysis:
     """Power calculations for K01 research aims"""
     
-    def __init__(self):
-        """Initialize study parameters based on consultation notes (25.06.03-call.md)"""
+    def __init__(self, cache=None):
+        """
+        Initialize study parameters based on consultation notes (25.06.03-call.md)
+        
+        ``cache`` is an optional power_cache.PowerCache memoizing the power
+        primitives and simulation-based estimators.
+        """
+        self.cache = cache
         
         # Aim 1: CHIS Analysis - IPV only (power-limiting outcome)
         # Parameters from consultation notes lines 99-124
@@ -42,111 +54,480 @@ class K01PowerAnalysis:
         # Parameters from consultation notes lines 219-346
         self.aim3_params = config.aim3_params.copy()
     
+    def _cache_context(self):
+        """Study parameters that cached methods may read besides their arguments"""
+        return {
+            'aim1_params': self.aim1_params,
+            'aim3_params': self.aim3_params,
+            'simulation_params': {k: v for k, v in config.simulation_params.items() if k != 'n_jobs'},
+            'aim1_survey_design': config.aim1_survey_design,
+            'aim1_outcomes': config.aim1_outcomes,
+            'aim1_decomposition': config.aim1_decomposition,
+            'assurance_priors': config.assurance_priors,
+            'assurance_params': config.assurance_params,
+            'lookup_tables': lookup_tables.settings()
+        }
+    
+    @instrumentation.timed('two_sample_proportion_power')
+    @cached('two_sample_proportion_power', version=1)
     def two_sample_proportion_power(self, n1, n2, p1, p2, alpha=0.05, design_effect=1.0):
         """Calculate power for two-sample proportion test with design effects"""
         
-        # Adjust sample sizes for design effect
-        n1_eff = n1 / design_effect
-        n2_eff = n2 / design_effect
-        
-        # Calculate effect size (Cohen's h)
-        effect_size = proportion_effectsize(p1, p2)
-        
-        # Use harmonic mean for unequal sample sizes
-        n_harmonic = 2 / (1/n1_eff + 1/n2_eff)
-        
-        try:
-            power = smp.ttest_power(effect_size, n_harmonic, alpha, alternative='two-sided')
-        except:
-            # Fallback calculation
-            p_pooled = (n1_eff * p1 + n2_eff * p2) / (n1_eff + n2_eff)
-            se = np.sqrt(p_pooled * (1 - p_pooled) * (1/n1_eff + 1/n2_eff))
-            effect = p1 - p2
-            z_stat = abs(effect) / se
-            z_alpha = stats.norm.ppf(1 - alpha/2)
-            power = 1 - stats.norm.cdf(z_alpha - z_stat) + stats.norm.cdf(-z_alpha - z_stat)
-        
-        # Calculate odds ratio
-        odds1 = p1 / (1 - p1)
-        odds2 = p2 / (1 - p2)
-        observed_OR = odds1 / odds2
+        result = power_engine.two_sample_proportion_power(n1, n2, p1, p2, alpha, design_effect)
         
         return {
-            'power': max(0, min(1, power)),
-            'effect_size_h': effect_size,
-            'n1_effective': n1_eff,
-            'n2_effective': n2_eff,
-            'observed_OR': observed_OR,
+            'power': float(result['power']),
+            'effect_size_h': float(result['effect_size_h']),
+            'n1_effective': float(result['n1_effective']),
+            'n2_effective': float(result['n2_effective']),
+            'observed_OR': float(result['observed_OR']),
             'p1': p1,
             'p2': p2
         }
     
+    @instrumentation.timed('two_sample_proportion_power_batch')
+    @cached('two_sample_proportion_power_batch', version=2)
+    def two_sample_proportion_power_batch(self, n1, n2, p1, p2, alpha=0.05, design_effect=1.0):
+        """Array version of two_sample_proportion_power; inputs broadcast into one PowerResultTable"""
+        return PowerResultTable(power_engine.two_sample_proportion_power(n1, n2, p1, p2, alpha, design_effect))
+    
+    @instrumentation.timed('min_detectable_OR')
+    @cached('min_detectable_OR', version=1)
     def min_detectable_OR(self, n1, n2, p2, power=0.8, alpha=0.05, design_effect=1.0):
         """Calculate minimum detectable odds ratio"""
         
-        # Adjust for design effect
-        n1_eff = n1 / design_effect
-        n2_eff = n2 / design_effect
-        n_harmonic = 2 / (1/n1_eff + 1/n2_eff)
-        
-        # Find effect size for target power
-        def power_func(effect_size):
-            return smp.ttest_power(effect_size, n_harmonic, alpha, alternative='two-sided') - power
-        
-        try:
-            min_effect_size = fsolve(power_func, 0.2)[0]
-        except:
-            z_alpha = stats.norm.ppf(1 - alpha/2)
-            z_beta = stats.norm.ppf(power)
-            min_effect_size = (z_alpha + z_beta) / np.sqrt(n_harmonic/2)
-        
-        # Convert to proportion difference
-        arcsin_p2 = np.arcsin(np.sqrt(p2))
-        arcsin_p1 = arcsin_p2 + min_effect_size / 2
-        arcsin_p1 = max(0, min(np.pi/2, arcsin_p1))
-        p1_min = np.sin(arcsin_p1) ** 2
-        
-        # Calculate OR
-        if 0 < p1_min < 1 and 0 < p2 < 1:
-            odds1 = p1_min / (1 - p1_min)
-            odds2 = p2 / (1 - p2)
-            min_OR = odds1 / odds2
+        result = power_engine.min_detectable_OR(n1, n2, p2, power, alpha, design_effect)
+        return float(result['min_OR'])
+    
+    @instrumentation.timed('min_detectable_OR_grid')
+    @cached('min_detectable_OR_grid', version=2)
+    def min_detectable_OR_grid(self, n1=None, n2=None, p2=None, power=0.8, alpha=None,
+                               design_effect=None, method='exact'):
+        """
+        Minimum detectable OR over a whole parameter surface in one call
+        
+        Parameters default to aim1_params. Every 1-D array argument becomes an
+        axis of the surface (in argument order); 'converged' flags the points
+        where the solver succeeded.
+        """
+        dims, coords, grid = power_engine.outer_grid(
+            n1=self.aim1_params['n_south_asian'] if n1 is None else n1,
+            n2=self.aim1_params['n_others'] if n2 is None else n2,
+            p2=self.aim1_params['ipv_p_others'] if p2 is None else p2,
+            power=power,
+            alpha=self.aim1_params['alpha'] if alpha is None else alpha,
+            design_effect=self.aim1_params['design_effect'] if design_effect is None else design_effect
+        )
+        result = power_engine.min_detectable_OR(method=method, **grid)
+        return PowerResultTable(result, dims=dims, coords=coords)
+    
+    @instrumentation.timed('dyadic_power_apim')
+    @cached('dyadic_power_apim', version=1, ignore=('n_jobs',))
+    def dyadic_power_apim(self, n_couples, p_baseline, actor_OR, partner_OR, icc, alpha=0.05,
+                          method='approx', n_reps=None, seed=None, n_jobs=None):
+        """
+        Calculate power for dyadic APIM analysis
+        
+        method='approx' uses the t-test approximation on the effective sample
+        size; method='simulation' estimates power by Monte Carlo (GEE logistic
+        APIM fits, see simulation.simulate_apim_power) with settings from
+        config.simulation_params unless given.
+        """
+        
+        result = power_engine.dyadic_power_apim(n_couples, p_baseline, actor_OR, partner_OR, icc, alpha)
+        
+        output = {
+            'actor_power': float(result['actor_power']),
+            'partner_power': float(result['partner_power']),
+            'design_effect': float(result['design_effect']),
+            'n_effective': float(result['n_effective'])
+        }
+        
+        if method == 'simulation':
+            sim_params = config.simulation_params
+            simulated = simulation.simulate_apim_power(
+                n_couples, p_baseline, actor_OR, partner_OR, icc, alpha,
+                n_reps=sim_params['n_reps'] if n_reps is None else n_reps,
+                seed=sim_params['seed'] if seed is None else seed,
+                n_jobs=sim_params['n_jobs'] if n_jobs is None else n_jobs,
+                chunk_size=sim_params['chunk_size'],
+                x_prevalence=self.aim3_params['predictor_prevalence'],
+                x_correlation=self.aim3_params['predictor_correlation']
+            )
+            output.update(simulated)
+        elif method != 'approx':
+            raise ValueError("method has to be 'approx' or 'simulation'")
+        
+        return output
+    
+    @instrumentation.timed('dyadic_power_apim_batch')
+    @cached('dyadic_power_apim_batch', version=2)
+    def dyadic_power_apim_batch(self, n_couples, p_baseline, actor_OR, partner_OR, icc, alpha=0.05):
+        """Array version of dyadic_power_apim; inputs broadcast into one PowerResultTable"""
+        return PowerResultTable(power_engine.dyadic_power_apim(n_couples, p_baseline, actor_OR, partner_OR, icc, alpha))
+    
+    @instrumentation.timed('exact_power_curve')
+    @cached('exact_power_curve', version=1)
+    def exact_power_curve(self, odds_ratios=None, alpha=None, test='score'):
+        """
+        Exact Aim 1 power over odds ratios, next to the current approximation
+        
+        Enumerates the rejection region of the score test or Fisher's exact
+        test (``test='fisher'``) on the effective sample sizes; see
+        exact_power.exact_power. Other parameters come from aim1_params.
+        Returns a PowerResultTable with 'power', 'approx_power' and
+        'approx_error' per odds ratio and the attained 'size' as metadata.
+        """
+        or_range = np.arange(1.0, 2.5, 0.05) if odds_ratios is None else np.asarray(odds_ratios, dtype=float)
+        p_others = self.aim1_params['ipv_p_others']
+        p_sa = power_engine.or_to_proportion(or_range, p_others)
+        result = exact_power.exact_power(
+            self.aim1_params['n_south_asian'], self.aim1_params['n_others'], p_sa, p_others,
+            self.aim1_params['alpha'] if alpha is None else alpha, self.aim1_params['design_effect'], test
+        )
+        return PowerResultTable({
+            'odds_ratio': or_range,
+            'p_south_asian': p_sa,
+            'power': result['power'],
+            'approx_power': result['approx_power'],
+            'approx_error': result['approx_error'],
+        }, test=test, size=result['size'], n1_effective=result['n1_effective'],
+           n2_effective=result['n2_effective'])
+    
+    @instrumentation.timed('survey_power_simulation')
+    @cached('survey_power_simulation', version=1, ignore=('n_jobs',))
+    def survey_power_simulation(self, p_south_asian=None, p_others=None, alpha=None,
+                                n_reps=None, seed=None, n_jobs=None):
+        """
+        Simulation-based Aim 1 power under a CHIS-like complex survey design
+        
+        Replaces the flat design-effect adjustment with survey-weighted logistic
+        fits on stratified, PSU-clustered samples (config.aim1_survey_design);
+        see simulation.simulate_survey_power. Parameters default to aim1_params
+        and config.simulation_params.
+        """
+        sim_params = config.simulation_params
+        return simulation.simulate_survey_power(
+            self.aim1_params['n_south_asian'],
+            self.aim1_params['n_others'],
+            self.aim1_params['ipv_p_south_asian'] if p_south_asian is None else p_south_asian,
+            self.aim1_params['ipv_p_others'] if p_others is None else p_others,
+            self.aim1_params['alpha'] if alpha is None else alpha,
+            n_reps=sim_params['n_reps'] if n_reps is None else n_reps,
+            seed=sim_params['seed'] if seed is None else seed,
+            n_jobs=sim_params['n_jobs'] if n_jobs is None else n_jobs,
+            chunk_size=sim_params['survey_chunk_size'],
+            **config.aim1_survey_design
+        )
+    
+    @instrumentation.timed('decomposition_power')
+    @cached('decomposition_power', version=2, ignore=('n_jobs',))
+    def decomposition_power(self, alpha=None, n_reps=None, n_bootstrap=None, seed=None, n_jobs=None):
+        """
+        Simulated power for the Aim 1 Fairlie decomposition of the IPV gap
+        
+        Power to detect the explained (covariate) and unexplained parts of the
+        South Asian vs others IPV gap with bootstrap standard errors, from the
+        covariates in config.aim1_decomposition; see
+        decomposition.simulate_decomposition_power. Settings default to
+        aim1_params and config.simulation_params.
+        """
+        sim_params = config.simulation_params
+        return decomposition.simulate_decomposition_power(
+            config.aim1_decomposition['covariates'],
+            self.aim1_params['ipv_p_south_asian'],
+            self.aim1_params['ipv_p_others'],
+            self.aim1_params['n_south_asian'],
+            self.aim1_params['n_others'],
+            self.aim1_params['design_effect'],
+            self.aim1_params['alpha'] if alpha is None else alpha,
+            n_reps=sim_params['decomposition_reps'] if n_reps is None else n_reps,
+            n_bootstrap=sim_params['decomposition_bootstrap'] if n_bootstrap is None else n_bootstrap,
+            seed=sim_params['seed'] if seed is None else seed,
+            n_jobs=sim_params['n_jobs'] if n_jobs is None else n_jobs,
+            chunk_size=sim_params['decomposition_chunk_size']
+        )
+    
+    @instrumentation.timed('multiplicity_power')
+    @cached('multiplicity_power', version=2, ignore=('n_jobs',))
+    def multiplicity_power(self, alpha=None, outcome_correlation=None, n_reps=None, seed=None, n_jobs=None):
+        """
+        Simulated power of the Aim 1 outcomes tested together
+        
+        The outcomes in config.aim1_outcomes are compared with the z-test
+        counterpart of two_sample_proportion_power, their statistics
+        correlated by ``outcome_correlation``; see
+        multiplicity.simulate_multiplicity_power. Reports per-outcome,
+        any-outcome and all-outcome power, unadjusted and under Bonferroni,
+        Holm and Benjamini-Hochberg (FDR).
+        """
+        outcomes = config.aim1_outcomes
+        sim_params = config.simulation_params
+        alpha = self.aim1_params['alpha'] if alpha is None else alpha
+        rho = outcomes['outcome_correlation'] if outcome_correlation is None else outcome_correlation
+        p_sa = [self.aim1_params['ipv_p_south_asian'] if p is None else p for p in outcomes['p_south_asian']]
+        p_others = [self.aim1_params['ipv_p_others'] if p is None else p for p in outcomes['p_others']]
+        
+        result = power_engine.two_sample_proportion_power(
+            self.aim1_params['n_south_asian'], self.aim1_params['n_others'],
+            p_sa, p_others, alpha, self.aim1_params['design_effect']
+        )
+        n_harmonic = 2 / (1 / result['n1_effective'] + 1 / result['n2_effective'])
+        ncp = result['effect_size_h'] * np.sqrt(n_harmonic)
+        
+        output = multiplicity.simulate_multiplicity_power(
+            ncp, multiplicity.equicorrelation(len(outcomes['names']), rho), alpha,
+            n_reps=sim_params['multiplicity_reps'] if n_reps is None else n_reps,
+            seed=sim_params['seed'] if seed is None else seed,
+            n_jobs=sim_params['n_jobs'] if n_jobs is None else n_jobs,
+            chunk_size=sim_params['multiplicity_chunk_size']
+        )
+        output['outcomes'] = list(outcomes['names'])
+        return output
+    
+    def _assurance(self, power_func, priors, uncertain, method, ndim):
+        """Expected power over ``priors`` (on parameters in ``uncertain``) with config.assurance_params"""
+        unknown = set(priors) - set(uncertain)
+        if unknown:
+            raise ValueError(f"priors are only supported on {', '.join(uncertain)}; "
+                             f"got {', '.join(sorted(unknown))}")
+        settings = config.assurance_params
+        return assurance.expected_power(
+            power_func, priors, settings['method'] if method is None else method,
+            n_nodes=settings['n_nodes'], n_samples=settings['n_samples'], seed=settings['seed'], ndim=ndim
+        )
+    
+    @instrumentation.timed('aim1_assurance')
+    @cached('aim1_assurance', version=2)
+    def aim1_assurance(self, n_south_asian=None, alpha=None, priors=None, method=None):
+        """
+        Assurance (expected power) of the Aim 1 IPV comparison
+        
+        Power is averaged over the priors in config.assurance_priors['aim1']
+        (by default on the South Asian IPV rate) instead of taking the point
+        guesses as known. An array of sample sizes gives the whole assurance
+        curve from one batched power call. 'power' is the power at the point
+        values for comparison. Priors can be put on the rates, the comparison
+        group size and the design effect; sample size and alpha are design
+        choices and raise ValueError.
+        """
+        n = self.aim1_params['n_south_asian'] if n_south_asian is None else n_south_asian
+        alpha = self.aim1_params['alpha'] if alpha is None else alpha
+        priors = config.assurance_priors['aim1'] if priors is None else priors
+        
+        def power(**values):
+            params = {**self.aim1_params, **values}
+            return power_engine.two_sample_proportion_power(
+                n, params['n_others'], params['ipv_p_south_asian'], params['ipv_p_others'],
+                alpha, params['design_effect']
+            )['power']
+        
+        uncertain = ('ipv_p_south_asian', 'ipv_p_others', 'n_others', 'design_effect')
+        output = self._assurance(power, priors, uncertain, method, np.ndim(n))
+        output['power'] = power()
+        output['n_south_asian'] = np.asarray(n, dtype=float)
+        return output
+    
+    @instrumentation.timed('aim3_assurance')
+    @cached('aim3_assurance', version=2)
+    def aim3_assurance(self, n_couples=None, alpha=None, priors=None, method=None):
+        """
+        Assurance of the Aim 3 actor and partner effects
+        
+        As aim1_assurance, over config.assurance_priors['aim3'] (by default on
+        the partner ICC); returns 'actor_assurance' and 'partner_assurance'
+        next to the point-value 'actor_power' and 'partner_power'. Priors can
+        be put on the baseline rate, the effect ORs and the ICC.
+        """
+        n = self.aim3_params['n_couples'] if n_couples is None else n_couples
+        alpha = self.aim3_params['alpha'] if alpha is None else alpha
+        priors = config.assurance_priors['aim3'] if priors is None else priors
+        
+        def power(**values):
+            params = {**self.aim3_params, **values}
+            result = power_engine.dyadic_power_apim(
+                n, params['baseline_ipv_rate'], params['actor_effect_OR'], params['partner_effect_OR'],
+                params['icc_partners'], alpha
+            )
+            return {'actor_assurance': result['actor_power'], 'partner_assurance': result['partner_power']}
+        
+        uncertain = ('baseline_ipv_rate', 'actor_effect_OR', 'partner_effect_OR', 'icc_partners')
+        output = self._assurance(power, priors, uncertain, method, np.ndim(n))
+        point = power()
+        output['actor_power'] = point['actor_assurance']
+        output['partner_power'] = point['partner_assurance']
+        output['n_couples'] = np.asarray(n, dtype=float)
+        return output
+    
+    @instrumentation.timed('sequential_power')
+    def sequential_power(self, aim='aim3', checkpoint=None, seed=None, n_jobs=None, **params):
+        """
+        Simulation-based power with early stopping
+        
+        aim='aim3' monitors actor and partner power of the GEE logistic APIM
+        (simulation.simulate_apim_power); aim='aim1' the survey-weighted IPV
+        comparison (simulation.simulate_survey_power). Replicates run in
+        batches until every power is pinned down or clearly on one side of
+        the target (config.sequential_params); see sequential.run_sequential.
+        ``params`` override aim1_params/aim3_params for the scenario, and
+        ``checkpoint`` names a JSON file to resume from after an interruption.
+        """
+        sim_params = config.simulation_params
+        seed = sim_params['seed'] if seed is None else seed
+        if aim == 'aim3':
+            p = {**self.aim3_params, **params}
+            worker = sequential.apim_batch
+            args = (int(p['n_couples']), p['baseline_ipv_rate'], p['actor_effect_OR'], p['partner_effect_OR'],
+                    p['icc_partners'], p['alpha'], p['predictor_prevalence'], p['predictor_correlation'])
+            batch_size = sim_params['chunk_size']
+            root = np.random.SeedSequence(seed)
+        elif aim == 'aim1':
+            p = {**self.aim1_params, **params}
+            survey = {k: v for k, v in config.aim1_survey_design.items() if k != 'psu_icc'}
+            # One design for the whole run, from its own stream
+            design_stream, root = np.random.SeedSequence(seed).spawn(2)
+            design = simulation.build_survey_design(np.random.default_rng(design_stream), int(p['n_south_asian']),
+                                                    int(p['n_others']), **survey)
+            worker = sequential.survey_batch
+            args = (design, p['ipv_p_south_asian'], p['ipv_p_others'], config.aim1_survey_design['psu_icc'],
+                    p['alpha'])
+            batch_size = sim_params['survey_chunk_size']
+        else:
+            raise ValueError("aim has to be 'aim1' or 'aim3'")
+        
+        return sequential.run_sequential(
+            worker, args, batch_size=batch_size, seed=root,
+            n_jobs=sim_params['n_jobs'] if n_jobs is None else n_jobs, checkpoint=checkpoint,
+            fingerprint={'aim': aim, 'params': p, 'seed': seed, 'survey': config.aim1_survey_design},
+            **config.sequential_params
+        )
+    
+    @instrumentation.timed('required_n_south_asian')
+    def required_n_south_asian(self, OR=None, power=0.8, alpha=None, design_effect=None,
+                               p_others=None, n_others=None):
+        """
+        Smallest South Asian sample size reaching the target power
+        
+        Parameters default to aim1_params (OR defaults to the hypothesised IPV
+        rates). Array arguments broadcast, so whole scenario sets are solved in
+        one call; 'achievable' is False where no n can reach the target against
+        the fixed comparison group.
+        """
+        p_others = self.aim1_params['ipv_p_others'] if p_others is None else p_others
+        if OR is None:
+            p_sa = self.aim1_params['ipv_p_south_asian']
         else:
-            min_OR = np.nan
+            p_sa = power_engine.or_to_proportion(OR, p_others)
         
-        return min_OR
+        return power_engine.required_n_two_sample(
+            p_sa, p_others,
+            self.aim1_params['n_others'] if n_others is None else n_others,
+            power,
+            self.aim1_params['alpha'] if alpha is None else alpha,
+            self.aim1_params['design_effect'] if design_effect is None else design_effect
+        )
     
-    def dyadic_power_apim(self, n_couples, p_baseline, actor_OR, partner_OR, icc, alpha=0.05):
-        """Calculate power for dyadic APIM analysis"""
+    @instrumentation.timed('required_n_couples')
+    def required_n_couples(self, OR=None, effect='actor', power=0.8, alpha=None, icc=None,
+                           p_baseline=None):
+        """
+        Smallest number of couples reaching the target power for an APIM effect
         
-        # Design effect for clustered data
-        design_effect = 1 + icc
-        n_effective = (2 * n_couples) / design_effect
+        Parameters default to aim3_params; OR defaults to the actor or partner
+        OR depending on ``effect``. Array arguments broadcast.
+        """
+        if OR is None:
+            if effect not in ('actor', 'partner'):
+                raise ValueError("effect has to be 'actor' or 'partner'")
+            OR = self.aim3_params[f'{effect}_effect_OR']
+        
+        return power_engine.required_n_couples(
+            OR,
+            self.aim3_params['icc_partners'] if icc is None else icc,
+            power,
+            self.aim3_params['alpha'] if alpha is None else alpha,
+            self.aim3_params['baseline_ipv_rate'] if p_baseline is None else p_baseline
+        )
+    
+    @instrumentation.timed('run_sweep')
+    def run_sweep(self, aim='aim1', grid=None, design='cartesian', n_samples=None, seed=None,
+                  chunk_size=50_000, n_jobs=None):
+        """
+        Sensitivity sweep over parameter grids (config.aim1_grid / aim3_grid by default)
         
-        # Convert ORs to effect sizes
-        d_actor = np.log(actor_OR) * np.sqrt(3) / np.pi
-        d_partner = np.log(partner_OR) * np.sqrt(3) / np.pi
+        Parameters not in the grid stay at this instance's point values.
+        Returns a PowerResultTable with one row per scenario.
+        """
+        if grid is None:
+            grid = config.aim1_grid if aim == 'aim1' else config.aim3_grid
+        base_params = self.aim1_params if aim == 'aim1' else self.aim3_params
+        plan = sweep.expand_plan(grid, design, n_samples, seed)
+        return sweep.run_sweep(aim, plan, base_params, chunk_size, n_jobs)
+    
+    @instrumentation.timed('sensitivity_analysis')
+    def sensitivity_analysis(self, aim='aim1', ranges=None, n_base=None, n_jobs=None):
+        """
+        First-order and total Sobol indices of the power results
         
-        # Calculate power
-        try:
-            power_actor = smp.ttest_power(d_actor, n_effective, alpha, alternative='two-sided')
-            power_partner = smp.ttest_power(d_partner, n_effective, alpha, alternative='two-sided')
-        except:
-            se_approx = np.sqrt(4 / (n_effective * p_baseline * (1 - p_baseline)))
-            z_alpha = stats.norm.ppf(1 - alpha/2)
-            
-            z_actor = abs(np.log(actor_OR)) / se_approx
-            z_partner = abs(np.log(partner_OR)) / se_approx
-            
-            power_actor = 1 - stats.norm.cdf(z_alpha - z_actor) + stats.norm.cdf(-z_alpha - z_actor)
-            power_partner = 1 - stats.norm.cdf(z_alpha - z_partner) + stats.norm.cdf(-z_alpha - z_partner)
+        Parameters vary over ``ranges`` (config.aim1_grid / aim3_grid by
+        default) and the rest stay at this instance's point values; see
+        sensitivity.run_sensitivity. Settings come from config.sensitivity_params.
+        """
+        base_params = self.aim1_params if aim == 'aim1' else self.aim3_params
+        return sensitivity.run_sensitivity(aim, ranges, n_base, base_params=base_params, n_jobs=n_jobs)
+    
+    @instrumentation.timed('power_surface')
+    def power_surface(self, name='aim1_power', directory=None, n_jobs=None):
+        """
+        Stored power surface over config.surface_grids[name], built on first use
         
-        return {
-            'actor_power': max(0, min(1, power_actor)),
-            'partner_power': max(0, min(1, power_partner)),
-            'design_effect': design_effect,
-            'n_effective': n_effective
+        'aim1_power' spans South Asian n, odds ratio, alpha and design effect;
+        'aim3_power' spans couples, effect OR, alpha and partner ICC. Other
+        parameters come from aim1_params/aim3_params. Returns a
+        surface_store.Surface for slice() and interpolate() queries, e.g.
+        power_surface().slice(n_south_asian=237, alpha=0.1, design_effect=1.5).
+        """
+        settings = config.surface_params
+        base_params = self.aim1_params if name.startswith('aim1') else self.aim3_params
+        directory = os.path.join(settings['directory'] if directory is None else directory, name)
+        return surface_store.build_surface(directory, name, config.surface_grids[name], base_params,
+                                           settings['chunk_size'], n_jobs)
+    
+    @instrumentation.timed('adaptive_power_curve')
+    def adaptive_power_curve(self, curve='aim1_or', targets=(0.8,), lo=None, hi=None, **options):
+        """
+        Power curve sampled adaptively, with the exact target-power crossings
+        
+        ``curve`` is one of the panels of create_power_vs_or_plots: 'aim1_or',
+        'aim1_n' (South Asian sample size), 'aim3_or', 'aim3_actor_n' or
+        'aim3_partner_n' (number of couples). Other parameters come from
+        aim1_params/aim3_params. ``options`` go to adaptive.adaptive_curve.
+        """
+        p1 = self.aim1_params
+        p3 = self.aim3_params
+        curves = {
+            'aim1_or': (1.0, 2.5, False, lambda x: power_engine.two_sample_proportion_power(
+                p1['n_south_asian'], p1['n_others'], power_engine.or_to_proportion(x, p1['ipv_p_others']),
+                p1['ipv_p_others'], p1['alpha'], p1['design_effect'])['power']),
+            'aim1_n': (100, 500, True, lambda x: power_engine.two_sample_proportion_power(
+                x, p1['n_others'], p1['ipv_p_south_asian'], p1['ipv_p_others'],
+                p1['alpha'], p1['design_effect'])['power']),
+            'aim3_or': (1.0, 2.5, False, lambda x: power_engine.apim_effect_power(
+                p3['n_couples'], p3['baseline_ipv_rate'], x, p3['icc_partners'], p3['alpha'])[0]),
+            'aim3_actor_n': (100, 400, True, lambda x: power_engine.apim_effect_power(
+                x, p3['baseline_ipv_rate'], p3['actor_effect_OR'], p3['icc_partners'], p3['alpha'])[0]),
+            'aim3_partner_n': (100, 400, True, lambda x: power_engine.apim_effect_power(
+                x, p3['baseline_ipv_rate'], p3['partner_effect_OR'], p3['icc_partners'], p3['alpha'])[0]),
         }
+        if curve not in curves:
+            raise ValueError(f"curve has to be one of {sorted(curves)}")
+        default_lo, default_hi, integer, func = curves[curve]
+        return adaptive.adaptive_curve(
+            func,
+            default_lo if lo is None else lo,
+            default_hi if hi is None else hi,
+            targets, integer=integer, **options
+        )
     
     def consultation_question_target_or_power(self):
         """
@@ -234,6 +615,9 @@ class K01PowerAnalysis:
             self.aim1_params['design_effect']
         )
         
+        # Exact score-test power at the observed OR
+        exact = self.exact_power_curve(odds_ratios=[power_result['observed_OR']])
+        
         # Minimum detectable OR
         min_OR = self.min_detectable_OR(
             self.aim1_params['n_south_asian'],
@@ -244,20 +628,10 @@ class K01PowerAnalysis:
         )
         
         # For 3 outcomes (IPV, contraceptive use, contraceptive counseling - line 92 in consultation notes)
-        # FDR correction using standard method
-        n_tests = 3
-        p_values_example = [self.aim1_params['alpha']] * n_tests  # Conservative assumption
-        fdr_rejected, fdr_pvals = multipletests(p_values_example, alpha=self.aim1_params['alpha'], method='fdr_bh')[:2]
-        fdr_threshold = fdr_pvals[0]  # FDR-adjusted threshold
-        
-        # Power with FDR threshold
-        power_fdr = self.two_sample_proportion_power(
-            self.aim1_params['n_south_asian'],
-            self.aim1_params['n_others'],
-            p_sa, p_others,
-            fdr_threshold,
-            self.aim1_params['design_effect']
-        )
+        # BH (FDR) and Holm power by simulation of the correlated test statistics
+        joint = self.multiplicity_power()
+        n_tests = len(joint['outcomes'])
+        ipv = joint['outcomes'].index('ipv')
         
         # Bonferroni correction
         power_bonf = self.two_sample_proportion_power(
@@ -274,11 +648,13 @@ class K01PowerAnalysis:
             'observed_OR': power_result['observed_OR'],
             'power_unadjusted': power_result['power'],
             'power_05': power_05['power'],
-            'power_fdr': power_fdr['power'],
+            'power_exact': float(exact['power'][0]),
+            'power_fdr': joint['bh']['outcome_power'][ipv],
+            'power_holm': joint['holm']['outcome_power'][ipv],
             'power_bonferroni': power_bonf['power'],
             'n_sa_effective': power_result['n1_effective'],
             'min_detectable_OR': min_OR,
-            'fdr_threshold': fdr_threshold
+            'multiplicity': joint
         }
         
         print("IPV (Primary Outcome):")
@@ -287,13 +663,21 @@ class K01PowerAnalysis:
         print(f"  Observed OR: {power_result['observed_OR']:.2f}")
         print(f"  Power (α=0.1, unadjusted): {power_result['power']:.3f}")
         print(f"  Power (α=0.05, unadjusted): {power_05['power']:.3f}")
-        print(f"  Power (FDR corrected): {power_fdr['power']:.3f}")
+        print(f"  Power (α=0.1, exact score test): {results['power_exact']:.3f} "
+              f"(approximation error {exact['approx_error'][0]:+.3f})")
+        print(f"  Power (FDR corrected): {results['power_fdr']:.3f}")
+        print(f"  Power (Holm): {results['power_holm']:.3f}")
         print(f"  Power (Bonferroni): {power_bonf['power']:.3f}")
         print(f"  Min detectable OR (80% power): {min_OR:.2f}")
         print()
         
-        print(f"Multiple Comparisons Summary (3 outcomes from consultation notes):")
-        print(f"  FDR threshold: α = {fdr_threshold:.3f}")
+        print(f"Multiple Comparisons Summary ({n_tests} outcomes from consultation notes, "
+              f"correlation {config.aim1_outcomes['outcome_correlation']}, {joint['n_reps']:,} replicates):")
+        print(f"  {'Method':<12}{'IPV':>8}{'Any':>8}{'All':>8}")
+        for method, label in [('unadjusted', 'Unadjusted'), ('bonferroni', 'Bonferroni'),
+                              ('holm', 'Holm'), ('bh', 'FDR (BH)')]:
+            print(f"  {label:<12}{joint[method]['outcome_power'][ipv]:>8.3f}"
+                  f"{joint[method]['any_power']:>8.3f}{joint[method]['all_power']:>8.3f}")
         print(f"  Bonferroni threshold: α = {self.aim1_params['alpha']/n_tests:.3f}")
         print()
         
@@ -332,157 +716,114 @@ class K01PowerAnalysis:
         
         return dyadic_results
     
-    def create_power_vs_or_plots(self):
-        """Generate power vs OR plots as requested"""
+    @instrumentation.timed('power_curves')
+    def power_curves(self):
+        """
+        Power curves behind the 2x2 panel: power vs OR and vs sample size for Aims 1 and 3
+        
+        Returns a dict of arrays keyed by curve; no plotting libraries needed.
+        """
         
         # OR range for plotting
         or_range = np.arange(1.0, 2.5, 0.05)
         
         # Aim 1: Power vs OR for fixed sample size and alpha
-        powers_01 = []
-        powers_05 = []
         p_others = self.aim1_params['ipv_p_others']  # 6% baseline
         
-        for or_val in or_range:
-            # Convert OR to proportion
-            p_sa = (or_val * p_others) / (1 + or_val * p_others - p_others)
-            
-            if 0 < p_sa < 1:  # Valid proportion
-                # Power at α=0.1
-                power_01 = self.two_sample_proportion_power(
-                    self.aim1_params['n_south_asian'],
-                    self.aim1_params['n_others'],
-                    p_sa, p_others, 0.1,
-                    self.aim1_params['design_effect']
-                )['power']
-                
-                # Power at α=0.05
-                power_05 = self.two_sample_proportion_power(
-                    self.aim1_params['n_south_asian'],
-                    self.aim1_params['n_others'],
-                    p_sa, p_others, 0.05,
-                    self.aim1_params['design_effect']
-                )['power']
-            else:
-                power_01 = np.nan
-                power_05 = np.nan
-                
-            powers_01.append(power_01)
-            powers_05.append(power_05)
+        # Convert OR to proportion; invalid proportions are masked out
+        p_sa = power_engine.or_to_proportion(or_range, p_others)
+        valid = (p_sa > 0) & (p_sa < 1)
         
-        # Aim 3: Power vs OR for dyadic effects
-        dyadic_actor_01 = []
-        dyadic_partner_01 = []
-        
-        for or_val in or_range:
-            dyadic_result = self.dyadic_power_apim(
-                self.aim3_params['n_couples'],
-                self.aim3_params['baseline_ipv_rate'],
-                or_val,  # Actor OR
-                or_val,  # Partner OR (same for comparison)
-                self.aim3_params['icc_partners'],
-                0.1
-            )
-            dyadic_actor_01.append(dyadic_result['actor_power'])
-            dyadic_partner_01.append(dyadic_result['partner_power'])
-        
-        # Create plots
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
-        
-        # Aim 1: Power vs OR
-        ax1.plot(or_range, powers_01, 'b-', linewidth=3, label='α = 0.1')
-        ax1.plot(or_range, powers_05, 'r-', linewidth=3, label='α = 0.05')
-        ax1.axhline(y=0.8, color='gray', linestyle='--', alpha=0.7, label='80% Power')
-        ax1.axvline(x=1.15, color='orange', linestyle=':', linewidth=2, label='Target OR=1.15')
-        ax1.axvline(x=1.74, color='purple', linestyle=':', linewidth=2, label='Observed OR=1.74')
-        ax1.set_xlabel('Odds Ratio')
-        ax1.set_ylabel('Power')
-        ax1.set_title('Aim 1: Power vs Odds Ratio\n(n=237 SA, n=158 effective)')
-        ax1.grid(True, alpha=0.3)
-        ax1.legend()
-        ax1.set_xlim(1.0, 2.2)
-        ax1.set_ylim(0, 1)
-        
-        # Sample size sensitivity
+        # Power at α=0.1 and α=0.05 in one broadcast call
+        aim1_or = self.two_sample_proportion_power_batch(
+            self.aim1_params['n_south_asian'],
+            self.aim1_params['n_others'],
+            p_sa[:, None], p_others, np.array([0.1, 0.05]),
+            self.aim1_params['design_effect']
+        )
+        aim1_or_power = np.where(valid[:, None], aim1_or['power'], np.nan)
+        
+        # Aim 1: Sample size sensitivity
         n_range = np.arange(100, 500, 25)
-        ipv_powers = []
-        
-        for n in n_range:
-            power_result = self.two_sample_proportion_power(
-                n, self.aim1_params['n_others'],
-                self.aim1_params['ipv_p_south_asian'],
-                self.aim1_params['ipv_p_others'],
-                self.aim1_params['alpha'],
-                self.aim1_params['design_effect']
-            )
-            ipv_powers.append(power_result['power'])
-        
-        ax2.plot(n_range, ipv_powers, 'b-', marker='o', linewidth=2, markersize=4)
-        ax2.axhline(y=0.8, color='r', linestyle='--', alpha=0.7, label='80% Power')
-        ax2.axvline(x=self.aim1_params['n_south_asian'], color='orange', linestyle=':', alpha=0.7, label='Current N=237')
-        ax2.set_xlabel('South Asian Sample Size')
-        ax2.set_ylabel('Power')
-        ax2.set_title('Aim 1: Power vs Sample Size\n(IPV outcome, OR=1.74)')
-        ax2.grid(True, alpha=0.3)
-        ax2.legend()
-        
-        # Aim 3: Actor vs Partner Effects
-        ax3.plot(or_range, dyadic_actor_01, 'purple', linewidth=3, label='Actor Effect')
-        ax3.plot(or_range, dyadic_partner_01, 'orange', linewidth=3, label='Partner Effect')
-        ax3.axhline(y=0.8, color='gray', linestyle='--', alpha=0.7, label='80% Power')
-        ax3.axvline(x=1.4, color='purple', linestyle=':', alpha=0.7, label='Actor OR=1.4')
-        ax3.axvline(x=1.6, color='orange', linestyle=':', alpha=0.7, label='Partner OR=1.6')
-        ax3.set_xlabel('Odds Ratio')
-        ax3.set_ylabel('Power')
-        ax3.set_title('Aim 3: Power vs Odds Ratio\n(200 couples, α=0.1)')
-        ax3.grid(True, alpha=0.3)
-        ax3.legend()
-        ax3.set_xlim(1.0, 2.2)
-        ax3.set_ylim(0, 1)
+        ipv_powers = self.two_sample_proportion_power_batch(
+            n_range, self.aim1_params['n_others'],
+            self.aim1_params['ipv_p_south_asian'],
+            self.aim1_params['ipv_p_others'],
+            self.aim1_params['alpha'],
+            self.aim1_params['design_effect']
+        )['power']
+        
+        # Aim 3: Power vs OR for dyadic effects
+        dyadic_result = self.dyadic_power_apim_batch(
+            self.aim3_params['n_couples'],
+            self.aim3_params['baseline_ipv_rate'],
+            or_range,  # Actor OR
+            or_range,  # Partner OR (same for comparison)
+            self.aim3_params['icc_partners'],
+            0.1
+        )
         
         # Aim 3: Sample size sensitivity
         couples_range = np.arange(100, 400, 25)
-        actor_powers = []
-        partner_powers = []
-        
-        for n_couples in couples_range:
-            dyadic_result = self.dyadic_power_apim(
-                n_couples,
-                self.aim3_params['baseline_ipv_rate'],
-                self.aim3_params['actor_effect_OR'],
-                self.aim3_params['partner_effect_OR'],
-                self.aim3_params['icc_partners'],
-                self.aim3_params['alpha']
-            )
-            actor_powers.append(dyadic_result['actor_power'])
-            partner_powers.append(dyadic_result['partner_power'])
-        
-        ax4.plot(couples_range, actor_powers, 'purple', marker='o', linewidth=2, markersize=4, label='Actor Effect')
-        ax4.plot(couples_range, partner_powers, 'orange', marker='s', linewidth=2, markersize=4, label='Partner Effect')
-        ax4.axhline(y=0.8, color='r', linestyle='--', alpha=0.7, label='80% Power')
-        ax4.axvline(x=self.aim3_params['n_couples'], color='blue', linestyle=':', alpha=0.7, label='Current N=200')
-        ax4.set_xlabel('Number of Couples')
-        ax4.set_ylabel('Power')
-        ax4.set_title('Aim 3: Power vs Sample Size')
-        ax4.grid(True, alpha=0.3)
-        ax4.legend()
-        
-        plt.tight_layout()
-        plt.savefig('k01_comprehensive_power_analysis.png', dpi=300, bbox_inches='tight')
-        
-        # Export result tables to CSV
-        df_aim1_or = pd.DataFrame({'OR': or_range, 'power_alpha_0.1': powers_01, 'power_alpha_0.05': powers_05})
-        df_aim1_or.to_csv('aim1_power_vs_or.csv', index=False)
-        df_aim1_n = pd.DataFrame({'n': n_range, 'power': ipv_powers})
-        df_aim1_n.to_csv('aim1_power_vs_n.csv', index=False)
-        df_aim3_or = pd.DataFrame({'OR': or_range, 'actor_power': dyadic_actor_01, 'partner_power': dyadic_partner_01})
-        df_aim3_or.to_csv('aim3_power_vs_or.csv', index=False)
-        df_aim3_n = pd.DataFrame({'n_couples': couples_range, 'actor_power': actor_powers, 'partner_power': partner_powers})
-        df_aim3_n.to_csv('aim3_power_vs_n.csv', index=False)
-        
-        plt.show()
-        
-        return or_range, powers_01, powers_05
+        dyadic_n = self.dyadic_power_apim_batch(
+            couples_range,
+            self.aim3_params['baseline_ipv_rate'],
+            self.aim3_params['actor_effect_OR'],
+            self.aim3_params['partner_effect_OR'],
+            self.aim3_params['icc_partners'],
+            self.aim3_params['alpha']
+        )
+        
+        return {
+            'or_range': or_range,
+            'aim1_power_01': aim1_or_power[:, 0],
+            'aim1_power_05': aim1_or_power[:, 1],
+            'n_range': n_range,
+            'aim1_power_vs_n': np.asarray(ipv_powers),
+            'aim3_actor_vs_or': dyadic_result['actor_power'],
+            'aim3_partner_vs_or': dyadic_result['partner_power'],
+            'couples_range': couples_range,
+            'aim3_actor_vs_n': dyadic_n['actor_power'],
+            'aim3_partner_vs_n': dyadic_n['partner_power']
+        }
+    
+    def create_power_vs_or_plots(self, show=False):
+        """
+        Generate power vs OR plots as requested
+        
+        The figure is rendered off-screen; ``show=True`` also opens it in a
+        window, which blocks until closed.
+        """
+        
+        curves = self.power_curves()
+        
+        # Write the result tables before plotting so a plotting failure
+        # cannot lose them
+        PowerResultTable({
+            'OR': curves['or_range'], 'power_alpha_0.1': curves['aim1_power_01'],
+            'power_alpha_0.05': curves['aim1_power_05']
+        }).to_csv('aim1_power_vs_or.csv')
+        PowerResultTable({
+            'n': curves['n_range'], 'power': curves['aim1_power_vs_n']
+        }).to_csv('aim1_power_vs_n.csv')
+        PowerResultTable({
+            'OR': curves['or_range'], 'actor_power': curves['aim3_actor_vs_or'],
+            'partner_power': curves['aim3_partner_vs_or']
+        }).to_csv('aim3_power_vs_or.csv')
+        PowerResultTable({
+            'n_couples': curves['couples_range'], 'actor_power': curves['aim3_actor_vs_n'],
+            'partner_power': curves['aim3_partner_vs_n']
+        }).to_csv('aim3_power_vs_n.csv')
+        
+        # Plotting is only loaded when asked for; panels whose data did not
+        # change are reused from the figure cache
+        import plotting
+        plotting.plot_power_panel(curves, self.aim1_params, self.aim3_params,
+                                  'k01_comprehensive_power_analysis.png')
+        if show:
+            plotting.show('k01_comprehensive_power_analysis.png')
+        
+        return curves['or_range'], curves['aim1_power_01'].tolist(), curves['aim1_power_05'].tolist()
 
     def write_grant_ready_summary(self, aim1_results, target_or_results, aim3_results):
         """Generate grant application ready summary"""
@@ -496,8 +837,10 @@ class K01PowerAnalysis:
         print("-" * 50)
         print()
         
+        aim1, aim3 = self.aim1_params, self.aim3_params
         print("Aim 1: CHIS Decomposition Analysis")
-        print("Sample: n=237 South Asians (n=158 effective after design effect adjustment)")
+        print(f"Sample: n={aim1['n_south_asian']} South Asians "
+              f"(n={aim1['n_south_asian'] / aim1['design_effect']:.0f} effective after design effect adjustment)")
         print("Comparison: All other racial/ethnic groups in California")
         print("Primary outcome: IPV disparities")
         print()
@@ -523,7 +866,7 @@ class K01PowerAnalysis:
         print()
         
         print("Aim 3: Dyadic Actor-Partner Interdependence Model")
-        print("Sample: n=200 couples (n=400 individuals)")
+        print(f"Sample: n={aim3['n_couples']} couples (n={2 * aim3['n_couples']} individuals)")
         print("Design: Distinguishable dyads (heterosexual couples)")
         print("Outcome: IPV perpetration (binary)")
         print()
@@ -547,11 +890,11 @@ class K01PowerAnalysis:
         print("POWER CALCULATION ASSUMPTIONS")
         print("-" * 50)
         print("All assumptions documented from consultation notes (25.06.03-call.md):")
-        print("• CHIS design effect = 1.5 (typical for complex surveys)")
-        print("• South Asian IPV rate = 10% (estimated from literature)")
-        print("• General population IPV rate = 6% (CHIS baseline)")
-        print("• Dyadic ICC = 0.3 (typical for couples)")
-        print("• α = 0.1 (specified by investigator, justified for exploratory research)")
+        print(f"• CHIS design effect = {aim1['design_effect']} (typical for complex surveys)")
+        print(f"• South Asian IPV rate = {aim1['ipv_p_south_asian']:.0%} (estimated from literature)")
+        print(f"• General population IPV rate = {aim1['ipv_p_others']:.0%} (CHIS baseline)")
+        print(f"• Dyadic ICC = {aim3['icc_partners']} (typical for couples)")
+        print(f"• α = {aim1['alpha']} (specified by investigator, justified for exploratory research)")
         print()
         
         adequacy = "adequate" if aim1_results['power_unadjusted'] >= 0.8 else "moderate but informative"
@@ -560,57 +903,82 @@ class K01PowerAnalysis:
         print("and other populations, supporting the feasibility of this K01 research plan.")
 
     def validate_with_apimpowerr(self):
-        """Validate dyadic APIM power using R's APIMPowerR package via rpy2"""
-        try:
-            from rpy2.robjects import r
-            from rpy2.robjects.packages import importr
-            import math
-            apim_pkg = importr('APIMPowerR')
-            r('library(APIMPowerR)')
-            n = self.aim3_params['n_couples']
-            icc = self.aim3_params['icc_partners']
-            actorOR = self.aim3_params['actor_effect_OR']
-            partnerOR = self.aim3_params['partner_effect_OR']
-            alpha = self.aim3_params['alpha']
-            r_code = f"powerAPIM(n={n}, ICC={icc}, adirect=log({actorOR}), apartner=log({partnerOR}), alpha={alpha})"
-            res = r(r_code)
-            actor_power_r = float(res[0])
-            partner_power_r = float(res[1])
-            print(f"R APIMPowerR actor effect power: {actor_power_r:.3f}")
-            print(f"R APIMPowerR partner effect power: {partner_power_r:.3f}")
-            return {'actor_power_r': actor_power_r, 'partner_power_r': partner_power_r}
-        except Exception as e:
-            print("R integration error:", e)
-            return None
+        """Validate dyadic APIM power with a native implementation of APIMPowerR (distinguishable dyads)"""
+        
+        actor_d = apim_power.odds_ratio_to_d(self.aim3_params['actor_effect_OR'])
+        partner_d = apim_power.odds_ratio_to_d(self.aim3_params['partner_effect_OR'])
+        result = apim_power.apim_power(
+            self.aim3_params['n_couples'], actor_d, partner_d, self.aim3_params['alpha'],
+            predictor_correlation=self.aim3_params['predictor_correlation'],
+            error_correlation=self.aim3_params['icc_partners']
+        )
+        actor_power = float(result['actor_1']['power'])
+        partner_power = float(result['partner_1']['power'])
+        
+        print(f"APIMPowerR actor effect power (d={actor_d:.3f}): {actor_power:.3f}")
+        print(f"APIMPowerR partner effect power (d={partner_d:.3f}): {partner_power:.3f}")
+        return {'actor_power_r': actor_power, 'partner_power_r': partner_power}
 
-def main():
-    """Run comprehensive power analysis addressing all consultation questions"""
-    
-    print("K01 SOUTH ASIAN SRH RESEARCH - COMPREHENSIVE POWER ANALYSIS")
-    print("Addressing all consultation questions from 25.06.03-call.md")
-    print("=" * 80)
-    print()
-    
-    # Initialize analysis
-    analysis = K01PowerAnalysis()
-    
-    # Answer specific consultation question about OR=1.15
-    target_or_results = analysis.consultation_question_target_or_power()
-    
-    # Run full analyses
-    aim1_results = analysis.run_aim1_analysis()
-    aim3_results = analysis.run_aim3_analysis()
+def main(instrument=None, lookup=None):
+    """
+    Run comprehensive power analysis addressing all consultation questions
     
-    # Generate comprehensive plots including power vs OR
-    print("Generating comprehensive power analysis plots...")
-    or_range, powers_01, powers_05 = analysis.create_power_vs_or_plots()
+    ``instrument`` (default: config.instrumentation_params['enabled']) records
+    stage and method timings, cache and fallback counters, printed as a
+    summary table and written as JSON at the end. ``lookup`` (default:
+    config.lookup_params['enabled']) interpolates critical values and
+    noncentral t power from lookup tables.
+    """
+    settings = config.instrumentation_params
+    if instrument is None:
+        instrument = settings['enabled']
+    if lookup is None:
+        lookup = config.lookup_params['enabled']
+    # Instrumentation and lookup tables are process-wide; the context
+    # managers switch them back off even if a stage fails
+    with contextlib.ExitStack() as stack:
+        record = stack.enter_context(instrumentation.instrumented()) if instrument else None
+        if lookup:
+            stack.enter_context(lookup_tables.tabulated())
+        
+        print("K01 SOUTH ASIAN SRH RESEARCH - COMPREHENSIVE POWER ANALYSIS")
+        print("Addressing all consultation questions from 25.06.03-call.md")
+        print("=" * 80)
+        print()
+        
+        # Initialize analysis; results are memoized across runs
+        analysis = K01PowerAnalysis(cache=PowerCache(**config.cache_params))
+        
+        # Answer specific consultation question about OR=1.15
+        with instrumentation.stage('main.consultation_question'):
+            target_or_results = analysis.consultation_question_target_or_power()
+        
+        # Run full analyses
+        with instrumentation.stage('main.aim1_analysis'):
+            aim1_results = analysis.run_aim1_analysis()
+        with instrumentation.stage('main.aim3_analysis'):
+            aim3_results = analysis.run_aim3_analysis()
+        
+        # Generate comprehensive plots including power vs OR
+        print("Generating comprehensive power analysis plots...")
+        with instrumentation.stage('main.power_vs_or_plots'):
+            or_range, powers_01, powers_05 = analysis.create_power_vs_or_plots()
+        
+        # Generate grant-ready summary
+        with instrumentation.stage('main.grant_summary'):
+            analysis.write_grant_ready_summary(aim1_results, target_or_results, aim3_results)
+        # Validate against APIMPowerR
+        print("Validating dyadic APIM power with APIMPowerR...")
+        with instrumentation.stage('main.apimpowerr_validation'):
+            validation = analysis.validate_with_apimpowerr()
+        print("APIMPowerR validation results:", validation)
     
-    # Generate grant-ready summary
-    analysis.write_grant_ready_summary(aim1_results, target_or_results, aim3_results)
-    # Validate with R's APIMPowerR
-    print("Validating dyadic APIM power with R's APIMPowerR...")
-    validation = analysis.validate_with_apimpowerr()
-    print("R validation results:", validation)
+    if record is not None:
+        print()
+        print("INSTRUMENTATION")
+        print(record.summary())
+        record.to_json(settings['json_path'])
+        print(f"Instrumentation written to {settings['json_path']}")
     
     return {
         'aim1_results': aim1_results,
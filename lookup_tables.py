@@ -0,0 +1,238 @@
+"""
+Opt-in lookup tables for critical values and noncentral-t power
+
+Every power evaluation of the engine computes a Student t critical value
+(special.stdtrit) and one or two noncentral t CDFs (special.nctdtr), a few
+microseconds per element and seconds per million grid points. With lookup
+tables enabled, power_engine interpolates both from tables instead:
+
+    critical values   per (alpha, sides) over u = 1/df in [0, 1/df_min]
+    two-sided power   per alpha over (ncp, u) in [0, ncp_max] x [0, 1/df_min]
+
+u = 0 is the normal limit (df = inf). Interpolation is linear in u for
+critical values and bilinear in (ncp, u) for power. Each table starts on a
+coarse uniform grid and is refined by halving the spacing along an axis
+until the exact values at the midpoints between all neighbouring nodes
+differ from the interpolation by at most ``tolerance`` split evenly across
+the axes, so interpolation errors stay within ``tolerance`` to leading order.
+
+Tables are built lazily, once per listed alpha, and kept for as long as the
+tables are enabled. Alphas not listed, df below ``df_min``, |ncp| above
+``ncp_max`` and non-finite inputs are evaluated exactly, so results outside
+the tables' range are unchanged.
+
+    with lookup_tables.tabulated():
+        analysis.run_sweep('aim1')
+
+Only the current process is affected; pool workers started by fork inherit
+the tables enabled at the time.
+"""
+
+import contextlib
+
+import numpy as np
+from scipy import special
+
+import config
+import instrumentation
+
+_active = None
+
+
+def exact_critical_value(alpha, df=np.inf, sides=2):
+    """Upper critical value of Student's t (normal for infinite df) at level ``alpha``"""
+    alpha, df = np.broadcast_arrays(np.asarray(alpha, dtype=float), np.asarray(df, dtype=float))
+    return -special.stdtrit(df, alpha / sides)
+
+
+def _midpoints(coords):
+    return (coords[:-1] + coords[1:]) / 2
+
+
+def _interleave(nodes, midpoints, axis):
+    """Nodes and the midpoints between them, in order along ``axis``"""
+    shape = list(nodes.shape)
+    shape[axis] += midpoints.shape[axis]
+    merged = np.empty(shape)
+    index = [slice(None)] * len(shape)
+    index[axis] = slice(0, None, 2)
+    merged[tuple(index)] = nodes
+    index[axis] = slice(1, None, 2)
+    merged[tuple(index)] = midpoints
+    return merged
+
+
+def refine(func, axes, tolerance, max_nodes=2 ** 14):
+    """
+    Tabulate ``func`` on a uniform grid fine enough for multilinear interpolation
+
+    ``axes`` is a list of (start, stop, initial intervals); ``func`` takes
+    one broadcastable coordinate array per axis. The spacing along each axis
+    is halved until the midpoint error along it is at most ``tolerance`` /
+    len(axes). Returns (coords, values, errors) with the final midpoint error
+    of each axis. Raises ValueError when an axis would exceed ``max_nodes``.
+    """
+    coords = [np.linspace(start, stop, n + 1) for start, stop, n in axes]
+    values = func(*np.meshgrid(*coords, indexing='ij', sparse=True))
+    errors = [np.inf] * len(axes)
+    settled = [False] * len(axes)
+    while not all(settled):
+        for axis in range(len(axes)):
+            if settled[axis]:
+                continue
+            grid = list(coords)
+            grid[axis] = _midpoints(coords[axis])
+            exact = func(*np.meshgrid(*grid, indexing='ij', sparse=True))
+            lower = np.take(values, np.arange(len(coords[axis]) - 1), axis=axis)
+            upper = np.take(values, np.arange(1, len(coords[axis])), axis=axis)
+            errors[axis] = float(np.max(np.abs(exact - (lower + upper) / 2)))
+            if errors[axis] <= tolerance / len(axes):
+                settled[axis] = True
+                continue
+            if 2 * len(coords[axis]) - 1 > max_nodes:
+                raise ValueError(f"tolerance {tolerance:g} needs more than {max_nodes} nodes along axis {axis}")
+            values = _interleave(values, exact, axis)
+            coords[axis] = _interleave(coords[axis], grid[axis], 0)
+            # A finer axis adds nodes the other axes have not been checked on
+            settled = [False] * len(axes)
+    return coords, values, errors
+
+
+def _locate(coords, x):
+    """Lower node index and weight of the upper node on a uniform grid"""
+    step = coords[1] - coords[0]
+    position = (x - coords[0]) / step
+    index = np.clip(np.floor(position).astype(np.intp), 0, len(coords) - 2)
+    return index, position - index
+
+
+class LookupTables:
+    """Lazily built critical-value and power tables, exact outside their range"""
+
+    def __init__(self, alphas=(0.01, 0.05, 0.1), tolerance=1e-5, df_min=20, ncp_max=12.0):
+        self.alphas = tuple(float(a) for a in alphas)
+        self.tolerance = float(tolerance)
+        self.df_min = float(df_min)
+        self.ncp_max = float(ncp_max)
+        self._critical = {}
+        self._power = {}
+
+    def settings(self):
+        """Parameters that determine the tabulated values (for cache keys)"""
+        return {'alphas': list(self.alphas), 'tolerance': self.tolerance, 'df_min': self.df_min,
+                'ncp_max': self.ncp_max}
+
+    def _u_axis(self, n):
+        return (0.0, 1 / self.df_min, n)
+
+    def critical_table(self, alpha, sides=2):
+        """(u nodes, critical values, midpoint error) for one alpha and sidedness"""
+        key = (float(alpha), sides)
+        if key not in self._critical:
+            with np.errstate(divide='ignore'):
+                coords, values, errors = refine(
+                    lambda u: exact_critical_value(alpha, 1 / u, sides), [self._u_axis(4)], self.tolerance
+                )
+            self._critical[key] = (coords[0], values, errors[0])
+        return self._critical[key]
+
+    def power_table(self, alpha, exact):
+        """(ncp nodes, u nodes, two-sided power, midpoint errors) for one alpha"""
+        key = float(alpha)
+        if key not in self._power:
+            with np.errstate(divide='ignore'):
+                coords, values, errors = refine(
+                    lambda nc, u: exact(nc, 1 / u, alpha), [(0.0, self.ncp_max, 48), self._u_axis(4)],
+                    self.tolerance
+                )
+            self._power[key] = (coords[0], coords[1], values, errors)
+        return self._power[key]
+
+    def _split(self, alpha, df, *extra):
+        """Broadcast inputs; mask of elements inside the range, per tabulated alpha"""
+        alpha, df, *extra = np.broadcast_arrays(
+            np.asarray(alpha, dtype=float), np.asarray(df, dtype=float), *(np.asarray(e, dtype=float) for e in extra)
+        )
+        inside = df >= self.df_min
+        for value in extra:
+            inside &= np.abs(value) <= self.ncp_max
+        groups = [(a, inside & (alpha == a)) for a in self.alphas]
+        tabulated = np.zeros(alpha.shape, dtype=bool)
+        for _, mask in groups:
+            tabulated |= mask
+        instrumentation.count('lookup_tables.points', alpha.size)
+        instrumentation.count_mask('lookup_tables.exact', ~tabulated)
+        return alpha, df, extra, groups, tabulated
+
+    def critical_value(self, alpha, df=np.inf, sides=2):
+        """Upper critical value of Student's t, interpolated wherever tabulated"""
+        alpha, df, _, groups, tabulated = self._split(alpha, df)
+        result = np.empty(alpha.shape)
+        for a, mask in groups:
+            if mask.any():
+                u_nodes, values, _ = self.critical_table(a, sides)
+                j, w = _locate(u_nodes, 1 / df[mask])
+                result[mask] = (1 - w) * values[j] + w * values[j + 1]
+        rest = ~tabulated
+        if rest.any():
+            result[rest] = exact_critical_value(alpha[rest], df[rest], sides)
+        return result[()]
+
+    def noncentral_t_power(self, ncp, df, alpha, exact):
+        """
+        Two-sided noncentral t power, interpolated wherever tabulated
+
+        ``exact(ncp, df, alpha)`` builds the tables and evaluates the elements
+        outside them.
+        """
+        alpha, df, (ncp,), groups, tabulated = self._split(alpha, df, ncp)
+        result = np.empty(alpha.shape)
+        for a, mask in groups:
+            if mask.any():
+                nc_nodes, u_nodes, values, _ = self.power_table(a, exact)
+                i, wx = _locate(nc_nodes, np.abs(ncp[mask]))
+                j, wy = _locate(u_nodes, 1 / df[mask])
+                result[mask] = ((1 - wx) * ((1 - wy) * values[i, j] + wy * values[i, j + 1])
+                                + wx * ((1 - wy) * values[i + 1, j] + wy * values[i + 1, j + 1]))
+        rest = ~tabulated
+        if rest.any():
+            result[rest] = exact(ncp[rest], df[rest], alpha[rest])
+        return result[()]
+
+
+def enable(**params):
+    """Use lookup tables from now on (defaults: config.lookup_params) and return them"""
+    global _active
+    settings = {k: v for k, v in config.lookup_params.items() if k != 'enabled'}
+    settings.update(params)
+    _active = LookupTables(**settings)
+    return _active
+
+
+def disable():
+    """Go back to exact evaluation; returns the tables that were in use"""
+    global _active
+    tables, _active = _active, None
+    return tables
+
+
+def active():
+    """The LookupTables in use, or None when evaluation is exact"""
+    return _active
+
+
+def settings():
+    """Settings of the tables in use, or None when evaluation is exact"""
+    return None if _active is None else _active.settings()
+
+
+@contextlib.contextmanager
+def tabulated(**params):
+    """Use lookup tables inside the block, restoring the previous state afterwards"""
+    global _active
+    previous = _active
+    tables = enable(**params)
+    try:
+        yield tables
+    finally:
+        _active = previous
@@ -0,0 +1,258 @@
+"""
+Figures for the K01 power analysis
+
+Kept out of k01_power_analysis so the compute core imports without the
+plotting stack. Figures are described as panel specs (plain dicts of data
+and styling) and rendered off-screen with the Agg canvas, without pyplot:
+nothing is registered with a figure manager, so batches of figures do not
+accumulate in memory and nothing blocks in headless runs.
+
+Each panel is rendered to its own PNG named by a hash of its spec, so a
+panel whose data and styling have not changed is reused from the cache
+instead of being drawn again. Panels missing from the cache are rendered in
+parallel and then tiled into the final figure. The cache is bounded: once it
+exceeds its size cap, the least recently used images not needed by the
+current batch are deleted.
+"""
+
+import os
+import shutil
+
+import numpy as np
+from matplotlib import image as mpimg
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+import config
+from power_cache import cache_key
+from simulation import run_chunks
+
+# Bump when the drawing code changes, so cached panels are re-rendered
+RENDER_VERSION = 1
+
+# Size of one panel; the 2x2 power figure is 16x12 inches as before
+PANEL_SIZE = (8, 6)
+
+
+def power_panel_specs(curves, aim1_params, aim3_params):
+    """Specs of the four panels of the power figure, from K01PowerAnalysis.power_curves()"""
+    or_range = curves['or_range']
+    return [
+        # Aim 1: Power vs OR
+        {
+            'lines': [
+                {'x': or_range, 'y': curves['aim1_power_01'], 'fmt': 'b-', 'linewidth': 3, 'label': 'α = 0.1'},
+                {'x': or_range, 'y': curves['aim1_power_05'], 'fmt': 'r-', 'linewidth': 3, 'label': 'α = 0.05'},
+            ],
+            'hlines': [{'y': 0.8, 'color': 'gray', 'linestyle': '--', 'alpha': 0.7, 'label': '80% Power'}],
+            'vlines': [
+                {'x': 1.15, 'color': 'orange', 'linestyle': ':', 'linewidth': 2, 'label': 'Target OR=1.15'},
+                {'x': 1.74, 'color': 'purple', 'linestyle': ':', 'linewidth': 2, 'label': 'Observed OR=1.74'},
+            ],
+            'xlabel': 'Odds Ratio',
+            'ylabel': 'Power',
+            'title': 'Aim 1: Power vs Odds Ratio\n(n=237 SA, n=158 effective)',
+            'xlim': [1.0, 2.2],
+            'ylim': [0, 1],
+        },
+        # Sample size sensitivity
+        {
+            'lines': [
+                {'x': curves['n_range'], 'y': curves['aim1_power_vs_n'], 'fmt': 'b-', 'marker': 'o',
+                 'linewidth': 2, 'markersize': 4},
+            ],
+            'hlines': [{'y': 0.8, 'color': 'r', 'linestyle': '--', 'alpha': 0.7, 'label': '80% Power'}],
+            'vlines': [{'x': aim1_params['n_south_asian'], 'color': 'orange', 'linestyle': ':', 'alpha': 0.7,
+                        'label': 'Current N=237'}],
+            'xlabel': 'South Asian Sample Size',
+            'ylabel': 'Power',
+            'title': 'Aim 1: Power vs Sample Size\n(IPV outcome, OR=1.74)',
+        },
+        # Aim 3: Actor vs Partner Effects
+        {
+            'lines': [
+                {'x': or_range, 'y': curves['aim3_actor_vs_or'], 'color': 'purple', 'linewidth': 3,
+                 'label': 'Actor Effect'},
+                {'x': or_range, 'y': curves['aim3_partner_vs_or'], 'color': 'orange', 'linewidth': 3,
+                 'label': 'Partner Effect'},
+            ],
+            'hlines': [{'y': 0.8, 'color': 'gray', 'linestyle': '--', 'alpha': 0.7, 'label': '80% Power'}],
+            'vlines': [
+                {'x': 1.4, 'color': 'purple', 'linestyle': ':', 'alpha': 0.7, 'label': 'Actor OR=1.4'},
+                {'x': 1.6, 'color': 'orange', 'linestyle': ':', 'alpha': 0.7, 'label': 'Partner OR=1.6'},
+            ],
+            'xlabel': 'Odds Ratio',
+            'ylabel': 'Power',
+            'title': 'Aim 3: Power vs Odds Ratio\n(200 couples, α=0.1)',
+            'xlim': [1.0, 2.2],
+            'ylim': [0, 1],
+        },
+        # Aim 3: Sample size sensitivity
+        {
+            'lines': [
+                {'x': curves['couples_range'], 'y': curves['aim3_actor_vs_n'], 'color': 'purple', 'marker': 'o',
+                 'linewidth': 2, 'markersize': 4, 'label': 'Actor Effect'},
+                {'x': curves['couples_range'], 'y': curves['aim3_partner_vs_n'], 'color': 'orange', 'marker': 's',
+                 'linewidth': 2, 'markersize': 4, 'label': 'Partner Effect'},
+            ],
+            'hlines': [{'y': 0.8, 'color': 'r', 'linestyle': '--', 'alpha': 0.7, 'label': '80% Power'}],
+            'vlines': [{'x': aim3_params['n_couples'], 'color': 'blue', 'linestyle': ':', 'alpha': 0.7,
+                        'label': 'Current N=200'}],
+            'xlabel': 'Number of Couples',
+            'ylabel': 'Power',
+            'title': 'Aim 3: Power vs Sample Size',
+        },
+    ]
+
+
+def panel_key(spec, dpi):
+    """Hash of a panel's data and styling; the name of its cached image"""
+    return cache_key('panel', RENDER_VERSION, {'spec': spec, 'dpi': dpi, 'size': list(PANEL_SIZE)})
+
+
+def render_panel(spec, path, dpi=300):
+    """Draw one panel spec off-screen and save it as a PNG"""
+    fig = Figure(figsize=PANEL_SIZE, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    for line in spec.get('lines', []):
+        style = {k: v for k, v in line.items() if k not in ('x', 'y', 'fmt')}
+        args = (line['x'], line['y']) + ((line['fmt'],) if 'fmt' in line else ())
+        ax.plot(*args, **style)
+    for line in spec.get('hlines', []):
+        ax.axhline(**line)
+    for line in spec.get('vlines', []):
+        ax.axvline(**line)
+    ax.set_xlabel(spec.get('xlabel', ''))
+    ax.set_ylabel(spec.get('ylabel', ''))
+    ax.set_title(spec.get('title', ''))
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    if 'xlim' in spec:
+        ax.set_xlim(*spec['xlim'])
+    if 'ylim' in spec:
+        ax.set_ylim(*spec['ylim'])
+    fig.tight_layout()
+    canvas.draw()
+    # Cached panels are intermediate files: light compression keeps them quick to write
+    Image.fromarray(np.asarray(canvas.buffer_rgba())).convert('RGB').save(
+        path, format='PNG', dpi=(dpi, dpi), compress_level=1
+    )
+    return path
+
+
+def _render_panel_task(spec, path, dpi):
+    """Process-pool worker: render to a temporary name, then move into the cache"""
+    render_panel(spec, f'{path}.{os.getpid()}.png', dpi)
+    os.replace(f'{path}.{os.getpid()}.png', path)
+    return path
+
+
+def tile_panels(paths, path, layout=(2, 2), dpi=300):
+    """Tile panel PNGs row by row into one RGB image"""
+    rows, cols = layout
+    panels = [Image.open(p).convert('RGB') for p in paths]
+    width, height = panels[0].size
+    tiled = Image.new('RGB', (cols * width, rows * height), 'white')
+    for i, panel in enumerate(panels):
+        tiled.paste(panel, ((i % cols) * width, (i // cols) * height))
+    tiled.save(path, format='PNG', dpi=(dpi, dpi))
+    return path
+
+
+def prune_cache(cache_dir, max_bytes, keep=()):
+    """
+    Delete the least recently used images until ``cache_dir`` fits in ``max_bytes``
+
+    Images in ``keep`` are never deleted. Returns the number deleted.
+    """
+    keep = {os.path.abspath(p) for p in keep}
+    entries = []
+    total = 0
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith('.png'):
+                stat = entry.stat()
+                total += stat.st_size
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def render_batch(figures, dpi=None, cache_dir=None, n_jobs=None, max_cache_mb=None):
+    """
+    Render many figures, each a (panel specs, output path) pair, in one pass
+
+    Panels are deduplicated by hash across all figures; only those missing
+    from ``cache_dir`` are drawn, in parallel over ``n_jobs`` processes.
+    Afterwards the cache is pruned to ``max_cache_mb`` (see prune_cache).
+    Returns one dict per figure with its 'path' and the number of panels
+    'rendered' and taken from the cache ('cached').
+    """
+    settings = config.render_params
+    dpi = settings['dpi'] if dpi is None else dpi
+    cache_dir = settings['cache_dir'] if cache_dir is None else cache_dir
+    n_jobs = settings['n_jobs'] if n_jobs is None else n_jobs
+    max_cache_mb = settings['max_cache_mb'] if max_cache_mb is None else max_cache_mb
+    os.makedirs(cache_dir, exist_ok=True)
+
+    panel_paths = []
+    missing = {}
+    for specs, _ in figures:
+        paths = []
+        for spec in specs:
+            panel_path = os.path.join(cache_dir, f'{panel_key(spec, dpi)}.png')
+            if not os.path.exists(panel_path):
+                missing.setdefault(panel_path, spec)
+            paths.append(panel_path)
+        panel_paths.append(paths)
+
+    run_chunks(_render_panel_task, [(spec, p, dpi) for p, spec in missing.items()], n_jobs)
+
+    results = []
+    used = set()
+    for (specs, path), paths in zip(figures, panel_paths):
+        # The tiled figure is cached too, keyed by its panels
+        figure_path = os.path.join(cache_dir, f"{cache_key('figure', RENDER_VERSION, paths)}.png")
+        if not os.path.exists(figure_path):
+            tile_panels(paths, f'{figure_path}.{os.getpid()}.png', dpi=dpi)
+            os.replace(f'{figure_path}.{os.getpid()}.png', figure_path)
+        shutil.copyfile(figure_path, path)
+        rendered = sum(p in missing for p in paths)
+        results.append({'path': path, 'rendered': rendered, 'cached': len(paths) - rendered})
+        used.update(paths)
+        used.add(figure_path)
+
+    # Mark this batch's images as recently used, then evict the oldest others
+    for p in used:
+        os.utime(p)
+    prune_cache(cache_dir, max_cache_mb * 2 ** 20, keep=used)
+    return results
+
+
+def plot_power_panel(curves, aim1_params, aim3_params, path, dpi=None, cache_dir=None, n_jobs=None):
+    """Render the 2x2 power figure from K01PowerAnalysis.power_curves() to ``path``"""
+    specs = power_panel_specs(curves, aim1_params, aim3_params)
+    return render_batch([(specs, path)], dpi, cache_dir, n_jobs)[0]
+
+
+def show(path):
+    """Display a rendered figure in an interactive window (blocks until closed)"""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(16, 12))
+    ax.imshow(mpimg.imread(path))
+    ax.set_axis_off()
+    plt.show()
+    plt.close(fig)
@@ -0,0 +1,204 @@
+"""
+Persistent memoization cache for K01 power computations
+
+Results are keyed by a canonical SHA-256 hash of the method name, the method
+version and the call parameters (plus the study parameters the method reads).
+Lookups go through an in-memory LRU first, then an on-disk SQLite store with
+size-bounded, least-recently-used eviction. Bumping a method's version makes
+its old entries unreachable, and they are purged the first time the new
+version is used.
+"""
+
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import instrumentation
+
+
+def canonical(value):
+    """JSON-serializable canonical form of a parameter value"""
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        if array.dtype.kind in 'iub':
+            array = array.astype(float)
+        return {
+            '__ndarray__': str(array.dtype),
+            'shape': list(array.shape),
+            'sha256': hashlib.sha256(array.tobytes()).hexdigest(),
+        }
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        # 200, 200.0 and np.int64(200) are the same parameter
+        return repr(float(value))
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [canonical(v) for v in value]
+    if value is None or isinstance(value, str):
+        return value
+    raise TypeError(f"cannot build a cache key from {type(value).__name__}")
+
+
+def cache_key(name, version, params):
+    """Canonical hash of a method name, its version and its parameters"""
+    payload = json.dumps([name, str(version), canonical(params)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PowerCache:
+    """In-memory LRU in front of an optional size-bounded on-disk store"""
+
+    def __init__(self, path=None, max_memory_items=4096, max_disk_mb=512):
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = int(max_disk_mb * 2 ** 20)
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.path = path
+        self._versions = {}
+        self._lock = threading.RLock()
+        self._db = None
+        if path is not None:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, name TEXT, version TEXT, value BLOB, size INTEGER, accessed REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._db.commit()
+
+    def register_version(self, name, version):
+        """Purge stored entries for ``name`` written by any other version"""
+        version = str(version)
+        with self._lock:
+            if self._versions.get(name) == version:
+                return
+            self._versions[name] = version
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries WHERE name = ? AND version != ?", (name, version))
+                self._db.commit()
+
+    def get(self, key):
+        """Return (hit, value); values are copies, so callers may mutate them"""
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(self.memory[key])
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    value = pickle.loads(row[0])
+                    self._remember(key, value)
+                    self.hits += 1
+                    return True, copy.deepcopy(value)
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, name='', version=''):
+        """Store a value in memory and, if configured, on disk"""
+        with self._lock:
+            self._remember(key, copy.deepcopy(value))
+            if self._db is None:
+                return
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(blob) > self.max_disk_bytes:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, name, str(version), blob, len(blob), time.time())
+            )
+            self._evict()
+            self._db.commit()
+
+    def clear(self):
+        """Drop every entry from memory and disk"""
+        with self._lock:
+            self.memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def disk_usage(self):
+        """Total size in bytes of the values stored on disk"""
+        if self._db is None:
+            return 0
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        rows = self._db.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+
+def cached(name, version, ignore=()):
+    """
+    Memoize a K01PowerAnalysis method through ``self.cache``
+
+    The key covers every bound argument except those in ``ignore`` (settings
+    such as n_jobs that do not change the result) together with
+    ``self._cache_context()``, the study parameters the method may read.
+    Without a cache on the instance the method runs unchanged.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, 'cache', None)
+            if cache is None:
+                return method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = {k: v for k, v in bound.arguments.items() if k != 'self' and k not in ignore}
+            context = self._cache_context() if hasattr(self, '_cache_context') else None
+            cache.register_version(name, version)
+            key = cache_key(name, version, {'params': params, 'context': context})
+            hit, value = cache.get(key)
+            instrumentation.count(f'cache.{name}.{"hit" if hit else "miss"}')
+            if hit:
+                return value
+            value = method(self, *args, **kwargs)
+            cache.put(key, value, name, version)
+            return value
+
+        wrapper.cache_name = name
+        wrapper.cache_version = version
+        return wrapper
+    return decorator
@@ -0,0 +1,438 @@
+"""
+Vectorized power engine for the K01 power calculations
+
+Array-in/array-out versions of the K01PowerAnalysis power primitives. Every
+argument may be a scalar or an array; inputs broadcast against each other
+following NumPy rules and every returned entry has the broadcast shape.
+
+The numbers match the scalar statsmodels path (two-sided ``ttest_power`` on
+Cohen's h for Aim 1, on the logistic d approximation for Aim 3). Elements
+where that path is undefined fall back to the normal approximation through
+an explicit per-element mask, reported alongside the results.
+
+Critical values and noncentral t power are interpolated from precomputed
+tables while lookup_tables is enabled, and evaluated exactly otherwise.
+"""
+
+import numpy as np
+from scipy import special
+
+import instrumentation
+import lookup_tables
+
+
+def or_to_proportion(odds_ratio, p_ref):
+    """Proportion whose odds are ``odds_ratio`` times the odds of ``p_ref``"""
+    odds_ratio = np.asarray(odds_ratio, dtype=float)
+    p_ref = np.asarray(p_ref, dtype=float)
+    return (odds_ratio * p_ref) / (1 + odds_ratio * p_ref - p_ref)
+
+
+def odds_ratio(p1, p2):
+    """Odds ratio of p1 relative to p2"""
+    p1 = np.asarray(p1, dtype=float)
+    p2 = np.asarray(p2, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (p1 / (1 - p1)) / (p2 / (1 - p2))
+
+
+def critical_t(alpha, df):
+    """Upper two-sided critical value of Student's t"""
+    tables = lookup_tables.active()
+    if tables is not None:
+        return tables.critical_value(alpha, df)
+    return _critical_t_exact(alpha, df)
+
+
+def _critical_t_exact(alpha, df):
+    """Upper two-sided critical value of Student's t, computed once per unique (alpha, df)"""
+    alpha, df = np.broadcast_arrays(np.asarray(alpha, dtype=float), np.asarray(df, dtype=float))
+    if alpha.size < 64:
+        return -special.stdtrit(df, alpha / 2)
+    # One 1-D sort over (alpha, df) pairs packed as complex numbers (set
+    # directly: alpha + 1j * inf would be nan + inf j)
+    packed = np.empty(alpha.shape, dtype=complex)
+    packed.real, packed.imag = alpha, df
+    pairs, inverse = np.unique(packed.ravel(), return_inverse=True)
+    crit = -special.stdtrit(pairs.imag, pairs.real / 2)
+    return crit[inverse].reshape(alpha.shape)
+
+
+def noncentral_t_power(ncp, df, alpha):
+    """Two-sided power of a t-test with noncentrality ``ncp`` and ``df`` degrees of freedom"""
+    tables = lookup_tables.active()
+    if tables is not None:
+        return tables.noncentral_t_power(ncp, df, alpha, exact=_noncentral_t_power_exact)
+    return _noncentral_t_power_exact(ncp, df, alpha)
+
+
+def _noncentral_t_power_exact(ncp, df, alpha):
+    """
+    Exact two-sided noncentral t power
+
+    The critical value is evaluated on the broadcast of ``df`` and ``alpha``
+    only. The minor tail is skipped where it is bounded by Phi(-|ncp|) < 1e-16.
+    Either tail is replaced by its normal approximation where the noncentral t
+    CDF fails to NaN for finite arguments (far tails, very large ncp).
+    """
+    df = np.asarray(df, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        crit = _critical_t_exact(alpha, df)
+        # Power is symmetric in the sign of the effect
+        nc = np.abs(np.asarray(ncp, dtype=float))
+        df, crit, nc = np.broadcast_arrays(df, crit, nc)
+
+        upper = special.nctdtr(df, nc, crit)
+        underflow = np.isnan(upper) & np.isfinite(crit) & np.isfinite(nc)
+        if underflow.any():
+            instrumentation.count_mask('noncentral_t_power.normal_tail', underflow)
+            upper = np.where(underflow, special.ndtr(crit - nc), upper)
+        power = np.asarray(1 - upper)
+
+        minor = special.ndtr(-nc) > 1e-16
+        if minor.any():
+            lower = special.nctdtr(df[minor], nc[minor], -crit[minor])
+            instrumentation.count_mask('noncentral_t_power.normal_tail', np.isnan(lower))
+            lower = np.where(np.isnan(lower), special.ndtr(-crit[minor] - nc[minor]), lower)
+            power[minor] += lower
+        return power[()]
+
+
+def ttest_power(effect_size, nobs, alpha):
+    """Two-sided one-sample t-test power, elementwise equivalent of ``smp.ttest_power``"""
+    nobs = np.asarray(nobs, dtype=float)
+    with np.errstate(invalid='ignore'):
+        ncp = np.asarray(effect_size, dtype=float) * np.sqrt(nobs)
+    return noncentral_t_power(ncp, nobs - 1, alpha)
+
+
+def normal_power(z_stat, alpha):
+    """Two-sided power of a z-test with standardized effect ``z_stat``"""
+    tables = lookup_tables.active()
+    if tables is not None:
+        z_alpha = tables.critical_value(alpha)
+    else:
+        z_alpha = special.ndtri(1 - np.asarray(alpha, dtype=float) / 2)
+    return 1 - special.ndtr(z_alpha - z_stat) + special.ndtr(-z_alpha - z_stat)
+
+
+def outer_grid(**axes):
+    """
+    Lay out parameters on an outer-product grid
+
+    Every non-scalar argument becomes its own axis, in keyword order; scalars
+    are passed through. Returns (dims, coords, arrays) where ``arrays`` holds
+    the reshaped values ready for broadcasting.
+    """
+    dims = [name for name, value in axes.items() if np.ndim(value) > 0]
+    coords = {name: np.asarray(axes[name], dtype=float).ravel() for name in dims}
+    arrays = {}
+    for name, value in axes.items():
+        if name in coords:
+            shape = [1] * len(dims)
+            shape[dims.index(name)] = -1
+            arrays[name] = coords[name].reshape(shape)
+        else:
+            arrays[name] = np.asarray(value, dtype=float)
+    return dims, coords, arrays
+
+
+def min_detectable_effect_size(nobs, power=0.8, alpha=0.05, method='exact'):
+    """
+    Smallest standardized effect reaching ``power`` in a two-sided one-sample t-test
+
+    ``method='normal'`` returns the closed-form normal inverse
+    (z_{1-alpha/2} + z_power) / sqrt(nobs). ``method='exact'`` uses it to seed
+    a bracket, then solves the t-test power equation with a bracketed
+    (Chandrupatla) root finder applied elementwise, since power is monotone
+    in the effect size. Points that cannot be bracketed or do not converge
+    are NaN and flagged in ``converged``.
+    """
+    nobs, power, alpha = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (nobs, power, alpha))
+    )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        closed_form = (special.ndtri(1 - alpha / 2) + special.ndtri(power)) / np.sqrt(nobs)
+    solvable = np.isfinite(closed_form) & (power > alpha) & (power < 1) & (nobs > 1)
+
+    if method == 'normal':
+        effect_size = np.where(solvable, closed_form, np.nan)
+        return {
+            'effect_size': effect_size,
+            'converged': solvable,
+            'iterations': np.zeros(nobs.shape, dtype=int),
+        }
+    if method != 'exact':
+        raise ValueError("method has to be 'exact' or 'normal'")
+
+    def power_gap(d, nobs, alpha, power):
+        return ttest_power(d, nobs, alpha) - power
+
+    # scipy.optimize is only imported by the solvers, keeping the engine quick to import
+    from scipy.optimize import elementwise
+
+    start = np.where(solvable, closed_form, 1.0)
+    args = (nobs, alpha, power)
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        bracket = elementwise.bracket_root(power_gap, 0.5 * start, 1.5 * start, xmin=0.0, args=args)
+        root = elementwise.find_root(
+            power_gap, bracket.bracket, args=args,
+            tolerances=dict(xatol=1e-12, xrtol=1e-12)
+        )
+    converged = solvable & (bracket.status == 0) & (root.status == 0)
+    instrumentation.count('min_detectable_effect_size.points', converged.size)
+    instrumentation.count('min_detectable_effect_size.iterations', np.sum(bracket.nit + root.nit))
+    instrumentation.count_mask('min_detectable_effect_size.not_converged', ~converged)
+
+    return {
+        'effect_size': np.where(converged, root.x, np.nan),
+        'converged': converged,
+        'iterations': bracket.nit + root.nit,
+    }
+
+
+def min_detectable_OR(n1, n2, p2, power=0.8, alpha=0.05, design_effect=1.0, method='exact'):
+    """Minimum detectable odds ratio (Cohen's h inverted at p2), broadcast over all inputs"""
+    p2 = np.asarray(p2, dtype=float)
+
+    # Adjust for design effect
+    n1_eff = np.asarray(n1, dtype=float) / design_effect
+    n2_eff = np.asarray(n2, dtype=float) / design_effect
+    n_harmonic = 2 / (1 / n1_eff + 1 / n2_eff)
+
+    # The effect size does not depend on p2, so solve before broadcasting against it
+    solution = min_detectable_effect_size(n_harmonic, power, alpha, method)
+    min_effect_size = solution['effect_size']
+
+    # Convert to proportion difference
+    with np.errstate(invalid='ignore'):
+        arcsin_p1 = np.clip(np.arcsin(np.sqrt(p2)) + min_effect_size / 2, 0, np.pi / 2)
+        p1_min = np.sin(arcsin_p1) ** 2
+        valid = (p1_min > 0) & (p1_min < 1) & (p2 > 0) & (p2 < 1)
+        min_OR = np.where(valid, odds_ratio(p1_min, p2), np.nan)
+
+    shape = min_OR.shape
+    return {
+        'min_OR': min_OR,
+        'p1_min': p1_min,
+        'effect_size_h': np.broadcast_to(min_effect_size, shape),
+        'converged': np.broadcast_to(solution['converged'], shape),
+        'iterations': np.broadcast_to(solution['iterations'], shape),
+    }
+
+
+def two_sample_proportion_power(n1, n2, p1, p2, alpha=0.05, design_effect=1.0):
+    """Power for two-sample proportion tests with design effects, broadcast over all inputs"""
+    n1, n2, p1, p2, alpha, design_effect = (
+        np.asarray(v, dtype=float) for v in (n1, n2, p1, p2, alpha, design_effect)
+    )
+    shape = np.broadcast_shapes(n1.shape, n2.shape, p1.shape, p2.shape, alpha.shape, design_effect.shape)
+
+    n1_eff = n1 / design_effect
+    n2_eff = n2 / design_effect
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Cohen's h and the harmonic mean for unequal sample sizes
+        effect_size = 2 * np.arcsin(np.sqrt(p1)) - 2 * np.arcsin(np.sqrt(p2))
+        n_harmonic = 2 / (1 / n1_eff + 1 / n2_eff)
+
+        power = ttest_power(effect_size, n_harmonic, alpha)
+
+        # Normal approximation wherever the t path is undefined
+        fallback = ~np.isfinite(power)
+        instrumentation.count('two_sample_proportion_power.points', fallback.size)
+        instrumentation.count_mask('two_sample_proportion_power.fallback', fallback)
+        if fallback.any():
+            p_pooled = (n1_eff * p1 + n2_eff * p2) / (n1_eff + n2_eff)
+            se = np.sqrt(p_pooled * (1 - p_pooled) * (1 / n1_eff + 1 / n2_eff))
+            z_stat = np.abs(p1 - p2) / se
+            power = np.where(fallback, normal_power(z_stat, alpha), power)
+
+    return {
+        'power': np.broadcast_to(np.clip(power, 0, 1), shape),
+        'effect_size_h': np.broadcast_to(effect_size, shape),
+        'n1_effective': np.broadcast_to(n1_eff, shape),
+        'n2_effective': np.broadcast_to(n2_eff, shape),
+        'observed_OR': np.broadcast_to(odds_ratio(p1, p2), shape),
+        'p1': np.broadcast_to(p1, shape),
+        'p2': np.broadcast_to(p2, shape),
+        'fallback': np.broadcast_to(fallback, shape),
+    }
+
+
+def apim_effect_power(n_couples, p_baseline, effect_OR, icc, alpha=0.05):
+    """
+    Power for a single APIM effect, broadcast over all inputs
+
+    Returns (power, fallback) where ``fallback`` marks the elements computed
+    with the normal approximation.
+    """
+    n_couples, p_baseline, effect_OR, icc = (
+        np.asarray(v, dtype=float) for v in (n_couples, p_baseline, effect_OR, icc)
+    )
+    n_effective = (2 * n_couples) / (1 + icc)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Convert OR to effect size
+        d = np.log(effect_OR) * np.sqrt(3) / np.pi
+        power = ttest_power(d, n_effective, alpha)
+
+        fallback = ~np.isfinite(power)
+        instrumentation.count('apim_effect_power.points', fallback.size)
+        instrumentation.count_mask('apim_effect_power.fallback', fallback)
+        if fallback.any():
+            se_approx = np.sqrt(4 / (n_effective * p_baseline * (1 - p_baseline)))
+            z_stat = np.abs(np.log(effect_OR)) / se_approx
+            power = np.where(fallback, normal_power(z_stat, alpha), power)
+
+    return np.clip(power, 0, 1), fallback
+
+
+def dyadic_power_apim(n_couples, p_baseline, actor_OR, partner_OR, icc, alpha=0.05):
+    """Power for dyadic APIM analysis, broadcast over all inputs"""
+    n_couples, p_baseline, actor_OR, partner_OR, icc, alpha = (
+        np.asarray(v, dtype=float) for v in (n_couples, p_baseline, actor_OR, partner_OR, icc, alpha)
+    )
+    shape = np.broadcast_shapes(
+        n_couples.shape, p_baseline.shape, actor_OR.shape, partner_OR.shape, icc.shape, alpha.shape
+    )
+
+    # Design effect for clustered data
+    design_effect = 1 + icc
+    n_effective = (2 * n_couples) / design_effect
+
+    power_actor, actor_fallback = apim_effect_power(n_couples, p_baseline, actor_OR, icc, alpha)
+    power_partner, partner_fallback = apim_effect_power(n_couples, p_baseline, partner_OR, icc, alpha)
+
+    return {
+        'actor_power': np.broadcast_to(power_actor, shape),
+        'partner_power': np.broadcast_to(power_partner, shape),
+        'design_effect': np.broadcast_to(design_effect, shape),
+        'n_effective': np.broadcast_to(n_effective, shape),
+        'actor_fallback': np.broadcast_to(actor_fallback, shape),
+        'partner_fallback': np.broadcast_to(partner_fallback, shape),
+    }
+
+
+def smallest_integer_n(power_at, target, guess, n_min=2, n_max=10**7):
+    """
+    Smallest integer n with ``power_at(n, idx) >= target``, solved elementwise
+
+    ``power_at`` evaluates power at integer sizes ``n`` for the flat scenario
+    indices ``idx`` and must be nondecreasing in n. ``guess`` (e.g. a normal
+    approximation) seeds the upper bound, which doubles until it reaches the
+    target or ``n_max``; integer bisection then closes the bracket. Returns
+    (n, achievable) as flat arrays, with NaN where ``n_max`` is not enough.
+    """
+    target = np.asarray(target, dtype=float).ravel()
+    guess = np.asarray(guess, dtype=float).ravel()
+    size = target.size
+    idx = np.arange(size)
+
+    # Point evaluations of power_at, reported to instrumentation
+    evaluations = 0
+
+    def counted_power_at(n, idx):
+        nonlocal evaluations
+        evaluations += len(idx)
+        return power_at(n, idx)
+
+    n = np.full(size, np.nan)
+    at_min = counted_power_at(np.full(size, n_min), idx) >= target
+    n[at_min] = n_min
+
+    # Tighten the lower bound around the guess where it still misses the target
+    lo = np.full(size, n_min, dtype=np.int64)
+    seeded = ~at_min & np.isfinite(guess) & (guess * 0.9 > n_min)
+    lo_seed = np.floor(np.minimum(guess[seeded] * 0.9, n_max - 1)).astype(np.int64)
+    below = counted_power_at(lo_seed, idx[seeded]) < target[seeded]
+    lo[idx[seeded][below]] = lo_seed[below]
+
+    # Expand the upper bound until it reaches the target
+    hi = np.where(np.isfinite(guess), np.ceil(guess * 1.1) + 1, n_min + 1)
+    hi = np.clip(np.maximum(hi, lo + 1), n_min + 1, n_max).astype(np.int64)
+    pending = ~at_min
+    while pending.any():
+        reached = counted_power_at(hi[pending], idx[pending]) >= target[pending]
+        pending_idx = idx[pending]
+        lo[pending_idx[~reached]] = hi[pending_idx[~reached]]
+        capped = hi[pending_idx] >= n_max
+        pending[pending_idx[reached | capped]] = False
+        grow = pending_idx[~reached & ~capped]
+        hi[grow] = np.minimum(hi[grow] * 2, n_max)
+
+    achievable = at_min.copy()
+    bracketed = ~at_min
+    bracketed[bracketed] = counted_power_at(hi[bracketed], idx[bracketed]) >= target[bracketed]
+    achievable |= bracketed
+
+    # Integer bisection keeping power(lo) < target <= power(hi)
+    active = bracketed & (hi - lo > 1)
+    while active.any():
+        active_idx = idx[active]
+        mid = (lo[active_idx] + hi[active_idx]) // 2
+        reached = counted_power_at(mid, active_idx) >= target[active_idx]
+        hi[active_idx[reached]] = mid[reached]
+        lo[active_idx[~reached]] = mid[~reached]
+        active[active_idx] = hi[active_idx] - lo[active_idx] > 1
+
+    n[bracketed] = hi[bracketed]
+    instrumentation.count('smallest_integer_n.power_evaluations', evaluations)
+    return n, achievable
+
+
+def required_n_two_sample(p1, p2, n2, power=0.8, alpha=0.05, design_effect=1.0, n_max=10**7):
+    """Smallest integer n1 reaching ``power`` in the two-sample proportion test, broadcast over all inputs"""
+    p1, p2, n2, power, alpha, design_effect = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (p1, p2, n2, power, alpha, design_effect))
+    )
+    shape = p1.shape
+    flat = [v.ravel() for v in (p1, p2, n2, alpha, design_effect)]
+
+    def power_at(n, idx):
+        p1_, p2_, n2_, alpha_, deff_ = (v[idx] for v in flat)
+        return two_sample_proportion_power(n, n2_, p1_, p2_, alpha_, deff_)['power']
+
+    # Normal approximation for the harmonic mean, solved back for n1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        h = np.abs(2 * np.arcsin(np.sqrt(p1)) - 2 * np.arcsin(np.sqrt(p2)))
+        n_harmonic = ((special.ndtri(1 - alpha / 2) + special.ndtri(power)) / h) ** 2
+        guess = design_effect / (2 / n_harmonic - design_effect / n2)
+        guess = np.where(guess > 0, guess, n_max)
+
+    n, achievable = smallest_integer_n(power_at, power, guess, n_max=n_max)
+    n = n.reshape(shape)
+    achieved = two_sample_proportion_power(np.nan_to_num(n, nan=n_max), n2, p1, p2, alpha, design_effect)['power']
+    return {
+        'n': n,
+        'power': np.where(np.isnan(n), np.nan, achieved),
+        'achievable': achievable.reshape(shape),
+    }
+
+
+def required_n_couples(effect_OR, icc, power=0.8, alpha=0.05, p_baseline=0.2, n_max=10**7):
+    """Smallest integer number of couples reaching ``power`` for one APIM effect, broadcast over all inputs"""
+    effect_OR, icc, power, alpha, p_baseline = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (effect_OR, icc, power, alpha, p_baseline))
+    )
+    shape = effect_OR.shape
+    flat = [v.ravel() for v in (p_baseline, effect_OR, icc, alpha)]
+
+    def power_at(n, idx):
+        p_, or_, icc_, alpha_ = (v[idx] for v in flat)
+        return apim_effect_power(n, p_, or_, icc_, alpha_)[0]
+
+    # Normal approximation for the effective n, converted back to couples
+    with np.errstate(invalid='ignore', divide='ignore'):
+        d = np.abs(np.log(effect_OR)) * np.sqrt(3) / np.pi
+        n_effective = ((special.ndtri(1 - alpha / 2) + special.ndtri(power)) / d) ** 2
+        guess = n_effective * (1 + icc) / 2
+
+    n, achievable = smallest_integer_n(power_at, power, guess, n_max=n_max)
+    n = n.reshape(shape)
+    achieved = apim_effect_power(np.nan_to_num(n, nan=n_max), p_baseline, effect_OR, icc, alpha)[0]
+    return {
+        'n_couples': n,
+        'power': np.where(np.isnan(n), np.nan, achieved),
+        'achievable': achievable.reshape(shape),
+    }
@@ -0,0 +1,178 @@
+"""
+Streaming, resumable result writer for K01 power runs
+
+Results are written chunk by chunk as they are computed, both as CSV rows
+appended to one file and as columnar binary parts (one .npz per chunk). A
+JSON manifest, replaced atomically after every chunk, records the completed
+chunks and the CSV byte offset they end at. Reopening the directory with the
+same run fingerprint resumes after the last recorded chunk: CSV bytes past
+the recorded offset (a chunk interrupted mid-write) are truncated and the
+caller skips the completed chunks.
+
+Layout of a run directory:
+    manifest.json
+    results.csv
+    parts/part-00000.npz, part-00001.npz, ...
+"""
+
+import json
+import os
+
+import numpy as np
+
+MANIFEST = 'manifest.json'
+
+
+def _atomic_write(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _csv_bytes(columns, header):
+    import pandas as pd
+    return pd.DataFrame(columns, copy=False).to_csv(index=False, header=header, lineterminator='\n').encode()
+
+
+def write_table(path, columns, chunk_rows=100_000):
+    """
+    Write a columnar table (dict of equal-length arrays) to CSV in chunks
+
+    The file appears atomically, so an interrupted run never leaves a
+    truncated table at ``path``.
+    """
+    size = len(next(iter(columns.values())))
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        for start in range(0, max(size, 1), chunk_rows):
+            chunk = {name: np.asarray(column)[start:start + chunk_rows] for name, column in columns.items()}
+            f.write(_csv_bytes(chunk, header=start == 0))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ResultWriter:
+    """
+    Append-only chunked writer with a checkpoint manifest
+
+    ``fingerprint`` identifies the run (e.g. a hash of the plan and settings);
+    reopening a directory written by a different run raises ValueError rather
+    than mixing results. ``metadata`` (JSON-serializable) is stored in the
+    manifest of a new run, e.g. the settings needed to resume it; see
+    read_manifest. Chunks have to be written in index order.
+    """
+
+    def __init__(self, directory, fingerprint=None, n_chunks=None, csv_name='results.csv', metadata=None):
+        self.directory = directory
+        self.csv_path = os.path.join(directory, csv_name)
+        self.parts_dir = os.path.join(directory, 'parts')
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        os.makedirs(self.parts_dir, exist_ok=True)
+
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+            if self.manifest['fingerprint'] != fingerprint:
+                raise ValueError(f"{directory} holds results of a different run; use a new directory")
+            # Drop rows of a chunk that was interrupted before its manifest update
+            if os.path.exists(self.csv_path):
+                with open(self.csv_path, 'r+b') as f:
+                    f.truncate(self.manifest['csv_bytes'])
+        else:
+            self.manifest = {
+                'fingerprint': fingerprint,
+                'n_chunks': n_chunks,
+                'columns': None,
+                'csv': csv_name,
+                'csv_bytes': 0,
+                'n_rows': 0,
+                'chunks': [],
+                'complete': False,
+                'metadata': metadata,
+            }
+            if os.path.exists(self.csv_path):
+                os.remove(self.csv_path)
+            self._save_manifest()
+
+    @property
+    def completed(self):
+        """Indices of the chunks already on disk"""
+        return {chunk['index'] for chunk in self.manifest['chunks']}
+
+    @property
+    def complete(self):
+        return self.manifest['complete']
+
+    def write(self, index, columns):
+        """Persist one chunk of results (dict of equal-length 1-D arrays)"""
+        if self.manifest['chunks'] and index <= self.manifest['chunks'][-1]['index']:
+            raise ValueError(f"chunk {index} is already written or out of order")
+        names = list(columns)
+        if self.manifest['columns'] is None:
+            self.manifest['columns'] = names
+        elif names != self.manifest['columns']:
+            raise ValueError(f"chunk columns {names} differ from {self.manifest['columns']}")
+        n_rows = len(next(iter(columns.values())))
+
+        part = f'part-{index:05d}.npz'
+        part_path = os.path.join(self.parts_dir, part)
+        with open(f'{part_path}.tmp', 'wb') as f:
+            np.savez(f, **{name: np.asarray(column) for name, column in columns.items()})
+        os.replace(f'{part_path}.tmp', part_path)
+
+        with open(self.csv_path, 'ab') as f:
+            f.write(_csv_bytes(columns, header=self.manifest['csv_bytes'] == 0))
+            f.flush()
+            os.fsync(f.fileno())
+            csv_bytes = f.tell()
+
+        self.manifest['chunks'].append({
+            'index': index,
+            'start': self.manifest['n_rows'],
+            'n_rows': n_rows,
+            'part': part,
+            'csv_bytes': csv_bytes,
+        })
+        self.manifest['csv_bytes'] = csv_bytes
+        self.manifest['n_rows'] += n_rows
+        if self.manifest['n_chunks'] is not None and len(self.manifest['chunks']) == self.manifest['n_chunks']:
+            self.manifest['complete'] = True
+        self._save_manifest()
+
+    def finalize(self):
+        """Mark the run complete"""
+        self.manifest['complete'] = True
+        self._save_manifest()
+
+    def read_columns(self):
+        """All written chunks concatenated into one columnar table"""
+        return read_columns(self.directory)
+
+    def _save_manifest(self):
+        _atomic_write(self.manifest_path, json.dumps(self.manifest, indent=2).encode())
+
+
+def read_manifest(directory):
+    """Manifest of a run directory, or None when nothing has been written there"""
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_columns(directory):
+    """Columnar table (dict of arrays) from the binary parts of a run directory"""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if not manifest['chunks']:
+        return {}
+    parts = []
+    for chunk in manifest['chunks']:
+        with np.load(os.path.join(directory, 'parts', chunk['part'])) as data:
+            parts.append({name: data[name] for name in manifest['columns']})
+    return {name: np.concatenate([part[name] for part in parts]) for name in manifest['columns']}
@@ -0,0 +1,106 @@
+"""
+Columnar result tables for the K01 power computations
+
+The batch APIs return one PowerResultTable instead of per-point dicts: a
+read-only mapping of column name -> NumPy array, all columns sharing one
+shape (1-D for sweeps, N-D for outer-grid surfaces). Columns are stored as
+given or as broadcast views, never copied, so a million-point surface costs
+one array per quantity. Existing code indexing results by key keeps working.
+
+Conversions:
+    table.to_frame()     pandas DataFrame sharing the column buffers
+    table.to_csv(path)   chunked, atomic CSV via result_writer.write_table
+    table.to_records()   NumPy structured array (one copy)
+    table.row(i)         one point as a dict of Python scalars
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+
+import result_writer
+
+
+class PowerResultTable(Mapping):
+    """
+    Equal-shape result columns, plus metadata such as grid 'dims' and 'coords'
+
+    As a mapping the table holds its columns only: iteration, ``in``,
+    ``len()``, ``keys()`` and ``dict(table)`` cover columns. Metadata is in
+    ``meta``; for compatibility with the dicts these tables replace,
+    ``table[key]`` also returns a metadata entry when no column has that name.
+    """
+
+    __slots__ = ('_columns', '_meta', 'shape')
+
+    def __init__(self, columns, **meta):
+        arrays = {name: np.asarray(value) for name, value in columns.items()}
+        self.shape = np.broadcast_shapes(*(a.shape for a in arrays.values())) if arrays else ()
+        self._columns = {
+            name: a if a.shape == self.shape else np.broadcast_to(a, self.shape) for name, a in arrays.items()
+        }
+        self._meta = meta
+
+    def __getitem__(self, key):
+        if key in self._columns:
+            return self._columns[key]
+        # Metadata stays reachable by key, as in the dicts these tables replace
+        if key in self._meta:
+            return self._meta[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def __repr__(self):
+        return f"PowerResultTable(shape={self.shape}, columns={list(self._columns)})"
+
+    @property
+    def meta(self):
+        return dict(self._meta)
+
+    @property
+    def size(self):
+        """Number of points (rows once flattened)"""
+        return int(np.prod(self.shape))
+
+    def flat(self):
+        """Columns as 1-D arrays; views wherever the column is contiguous"""
+        columns = {}
+        dims = self._meta.get('dims')
+        if dims:
+            # Grid coordinates as leading columns, one row per grid point
+            mesh = np.meshgrid(*(self._meta['coords'][name] for name in dims), indexing='ij')
+            columns.update((name, axis.reshape(-1)) for name, axis in zip(dims, mesh))
+        columns.update((name, column.reshape(-1)) for name, column in self._columns.items())
+        return columns
+
+    def row(self, index):
+        """One point (flat or N-D index) as a dict of Python scalars"""
+        if not isinstance(index, tuple):
+            index = np.unravel_index(index, self.shape) if self.shape else ()
+        return {name: column[index].item() for name, column in self._columns.items()}
+
+    def to_records(self):
+        """Structured array with one field per column"""
+        columns = self.flat()
+        records = np.empty(self.size, dtype=[(name, column.dtype) for name, column in columns.items()])
+        for name, column in columns.items():
+            records[name] = column
+        return records
+
+    def to_frame(self):
+        """pandas DataFrame over the flattened columns, without copying them"""
+        import pandas as pd
+        return pd.DataFrame(self.flat(), copy=False)
+
+    def to_csv(self, path, chunk_rows=100_000):
+        """Write the flattened table to CSV (atomically, in chunks)"""
+        result_writer.write_table(path, self.flat(), chunk_rows)
+        return path
@@ -0,0 +1,183 @@
+"""
+Global sensitivity analysis (Sobol indices) of the K01 power results
+
+Which assumption drives the power numbers: the design effect, the baseline
+rates, the ICC or alpha? Each parameter of config.aim1_grid / aim3_grid is
+varied over its [min, max] range with a Saltelli design built on a
+scrambled Sobol sequence: two base matrices A and B of ``n_base`` rows, plus
+one matrix AB_i per parameter (A with column i taken from B), n_base * (d + 2)
+evaluations in all. The plan is evaluated by sweep.run_sweep, in vectorized
+chunks across a process pool.
+
+First-order indices use the Saltelli (2010) estimator and total indices the
+Jansen (1999) estimator. Confidence intervals are percentile bootstraps over
+the base rows, computed in batched index arrays.
+
+Usage:
+    python sensitivity.py --aim 3 --base 16384
+"""
+
+import argparse
+
+import numpy as np
+
+import config
+import sweep
+
+
+def saltelli_plan(ranges, n_base, seed=None):
+    """
+    Saltelli design over ``ranges`` (parameter -> values spanning its range)
+
+    ``n_base`` is rounded up to a power of two. Returns a plan of columns
+    laid out as blocks [A, B, AB_1, ..., AB_d], each n_base rows; parameters
+    named ``n_*`` are rounded to integers as in sweep.expand_plan.
+    """
+    from scipy.stats import qmc
+
+    names = list(ranges)
+    d = len(names)
+    m = max(int(np.ceil(np.log2(n_base))), 0)
+    unit = qmc.Sobol(2 * d, scramble=True, seed=seed).random_base2(m)
+    A, B = unit[:, :d], unit[:, d:]
+    blocks = [A, B]
+    for i in range(d):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        blocks.append(AB)
+    unit = np.concatenate(blocks)
+
+    plan = {}
+    for j, name in enumerate(names):
+        v = np.asarray(ranges[name], dtype=float).ravel()
+        column = v.min() + unit[:, j] * (v.max() - v.min())
+        plan[name] = np.round(column) if name.startswith('n_') else column
+    return plan
+
+
+def _estimates(fA, fB, fAB):
+    """First-order and total indices along the last axis; fAB is (d, ..., n)"""
+    variance = np.var(np.concatenate([fA, fB], axis=-1), axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        first = np.mean(fB * (fAB - fA), axis=-1) / variance
+        total = 0.5 * np.mean((fA - fAB) ** 2, axis=-1) / variance
+    return first, total, variance
+
+
+def sobol_indices(values, n_params, n_bootstrap=500, confidence=0.95, seed=None, batch_size=2_000_000):
+    """
+    Sobol indices from outputs of a Saltelli plan (blocks [A, B, AB_1, ..., AB_d])
+
+    Returns 'first_order' and 'total' (one per parameter), their
+    'first_order_ci' and 'total_ci' ((d, 2) percentile bootstrap intervals
+    at ``confidence``) and the output 'variance'. Bootstrap replicates are
+    drawn in batches of about ``batch_size`` resampled rows.
+    """
+    values = np.asarray(values, dtype=float)
+    blocks = values.reshape(n_params + 2, -1)
+    fA, fB, fAB = blocks[0], blocks[1], blocks[2:]
+    n_base = fA.size
+    first, total, variance = _estimates(fA, fB, fAB)
+
+    rng = np.random.default_rng(seed)
+    boot_first, boot_total = [], []
+    per_batch = max(batch_size // n_base, 1)
+    for start in range(0, n_bootstrap, per_batch):
+        idx = rng.integers(0, n_base, (min(per_batch, n_bootstrap - start), n_base))
+        f, t, _ = _estimates(fA[idx], fB[idx], fAB[:, idx])
+        boot_first.append(f)
+        boot_total.append(t)
+
+    tail = 100 * (1 - confidence) / 2
+    output = {
+        'first_order': first,
+        'total': total,
+        'variance': float(variance),
+    }
+    if n_bootstrap:
+        output['first_order_ci'] = np.percentile(np.concatenate(boot_first, axis=1), [tail, 100 - tail], axis=1).T
+        output['total_ci'] = np.percentile(np.concatenate(boot_total, axis=1), [tail, 100 - tail], axis=1).T
+    return output
+
+
+OUTPUTS = {
+    'aim1': ('power', 'min_detectable_OR'),
+    'aim3': ('actor_power', 'partner_power'),
+}
+
+
+def run_sensitivity(aim, ranges=None, n_base=None, outputs=None, base_params=None, n_bootstrap=None,
+                    confidence=None, seed=None, chunk_size=None, n_jobs=None):
+    """
+    Sobol indices of ``aim``'s power results ('aim1' or 'aim3')
+
+    ``ranges`` defaults to config.aim1_grid / aim3_grid; parameters not in it
+    stay at ``base_params``. Other settings default to
+    config.sensitivity_params. Returns 'parameters', 'n_evaluations', the
+    evaluated 'table' and one sobol_indices result per output.
+    """
+    if aim not in OUTPUTS:
+        raise ValueError(f"aim has to be one of {sorted(OUTPUTS)}")
+    settings = config.sensitivity_params
+    if ranges is None:
+        ranges = config.aim1_grid if aim == 'aim1' else config.aim3_grid
+    seed = settings['seed'] if seed is None else seed
+
+    plan = saltelli_plan(ranges, settings['n_base'] if n_base is None else n_base, seed)
+    table = sweep.run_sweep(
+        aim, plan, base_params,
+        chunk_size=settings['chunk_size'] if chunk_size is None else chunk_size,
+        n_jobs=settings['n_jobs'] if n_jobs is None else n_jobs
+    )
+    result = {
+        'parameters': list(ranges),
+        'n_evaluations': len(table[next(iter(table))]),
+        'table': table,
+    }
+    for name in OUTPUTS[aim] if outputs is None else outputs:
+        result[name] = sobol_indices(
+            table[name], len(ranges),
+            n_bootstrap=settings['n_bootstrap'] if n_bootstrap is None else n_bootstrap,
+            confidence=settings['confidence'] if confidence is None else confidence,
+            seed=seed
+        )
+    return result
+
+
+def format_indices(result):
+    """Plain-text table of the indices, largest total index first"""
+    lines = []
+    for name, indices in result.items():
+        if not isinstance(indices, dict) or 'total' not in indices:
+            continue
+        lines.append(f"{name} (variance {indices['variance']:.4g})")
+        lines.append(f"  {'parameter':<20}{'first order':>26}{'total':>26}")
+        for i in np.argsort(-np.nan_to_num(indices['total'])):
+            first = f"{indices['first_order'][i]:.3f}"
+            total = f"{indices['total'][i]:.3f}"
+            if 'total_ci' in indices:
+                first += f" [{indices['first_order_ci'][i, 0]:.3f}, {indices['first_order_ci'][i, 1]:.3f}]"
+                total += f" [{indices['total_ci'][i, 0]:.3f}, {indices['total_ci'][i, 1]:.3f}]"
+            lines.append(f"  {result['parameters'][i]:<20}{first:>26}{total:>26}")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sobol sensitivity indices of the K01 power results")
+    parser.add_argument('--aim', choices=['1', '3'], required=True)
+    parser.add_argument('--base', type=int, default=None, help="base sample size (rounded up to a power of two)")
+    parser.add_argument('--bootstrap', type=int, default=None, help="bootstrap replicates for the intervals")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: every core)")
+    args = parser.parse_args(argv)
+
+    result = run_sensitivity(f'aim{args.aim}', n_base=args.base, n_bootstrap=args.bootstrap,
+                             seed=args.seed, n_jobs=args.jobs)
+    print(f"{result['n_evaluations']:,} evaluations")
+    print(format_indices(result))
+    return result
+
+
+if __name__ == "__main__":
+    main()
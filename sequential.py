@@ -0,0 +1,165 @@
+"""
+Sequential Monte Carlo power with early stopping and resumable checkpoints
+
+Simulation-based power spends most replicates on scenarios whose power is
+plainly near 0 or 1. The sequential driver runs replicates in batches and
+stops once the Wilson confidence interval of every monitored power is
+narrower than ``tolerance`` or lies entirely above or below the target
+power, or once ``max_reps`` is reached.
+
+Batch k draws from its own stream, SeedSequence(entropy, spawn_key=root +
+(k,)), so the result depends only on the seed and the batch size, never on
+when a run was interrupted or how many workers it used. With a
+``checkpoint`` path, the entropy, spawn key, batch count and running tallies
+are saved as JSON after every batch; rerunning with the same checkpoint
+continues where it stopped and gives exactly the result of an uninterrupted
+run.
+"""
+
+import json
+import os
+
+import numpy as np
+from scipy import special
+
+from power_cache import cache_key
+from simulation import _apim_chunk, _survey_chunk, run_chunks
+
+# Bump when the stopping rules or tallies change, so old checkpoints are not reused
+CHECKPOINT_VERSION = 1
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """Wilson score interval for a binomial proportion; (0, 1) without trials"""
+    if trials == 0:
+        return 0.0, 1.0
+    z = special.ndtri(1 - (1 - confidence) / 2)
+    p = successes / trials
+    centre = (p + z ** 2 / (2 * trials)) / (1 + z ** 2 / trials)
+    half = z / (1 + z ** 2 / trials) * np.sqrt(p * (1 - p) / trials + z ** 2 / (4 * trials ** 2))
+    return float(max(centre - half, 0.0)), float(min(centre + half, 1.0))
+
+
+def stopping_reason(successes, trials, target=0.8, tolerance=0.02, confidence=0.95):
+    """'precision', 'above_target' or 'below_target' once the interval settles, else None"""
+    lo, hi = wilson_interval(successes, trials, confidence)
+    if hi - lo <= tolerance:
+        return 'precision'
+    if lo > target:
+        return 'above_target'
+    if hi < target:
+        return 'below_target'
+    return None
+
+
+def apim_batch(seed_seq, n_reps, *args):
+    """Actor and partner rejections of one batch of simulation.simulate_apim_power replicates"""
+    actor, partner, converged = _apim_chunk(seed_seq, n_reps, *args)
+    return {'actor_power': (actor, converged), 'partner_power': (partner, converged)}
+
+
+def survey_batch(seed_seq, n_reps, *args):
+    """Rejections of one batch of simulation.simulate_survey_power replicates"""
+    reject, converged, _ = _survey_chunk(seed_seq, n_reps, *args)
+    return {'power': (reject, converged)}
+
+
+def _write_json(path, state):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2)
+        f.write('\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def run_sequential(worker, args=(), target=0.8, tolerance=0.02, confidence=0.95, batch_size=250,
+                   min_reps=500, max_reps=20_000, seed=None, n_jobs=1, checkpoint=None, fingerprint=None):
+    """
+    Run ``worker(seed_seq, n_reps, *args)`` in batches until every power settles
+
+    ``worker`` returns a dict of monitored name -> (rejections, valid)
+    boolean arrays. ``seed`` is an int, None or a SeedSequence whose spawn
+    key roots the batch streams. No stopping rule applies before
+    ``min_reps`` replicates. With ``n_jobs`` > 1, that many batches run at a
+    time (None: every core) and batches past the stopping point are
+    discarded, so the result does not depend on ``n_jobs``.
+
+    ``fingerprint`` identifies the scenario in the checkpoint; reopening a
+    checkpoint written for a different scenario or settings raises
+    ValueError. Returns, for each name, 'power', 'ci', 'successes',
+    'trials' and the stopping 'reason', plus 'n_reps', 'batches' and
+    'stopped' ('rule' or 'max_reps').
+    """
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    settings = {
+        'fingerprint': fingerprint, 'target': target, 'tolerance': tolerance, 'confidence': confidence,
+        'batch_size': batch_size, 'min_reps': min_reps, 'max_reps': max_reps,
+    }
+    key = cache_key('sequential', CHECKPOINT_VERSION, settings)
+    state = None
+    if checkpoint is not None and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        if state['key'] != key:
+            raise ValueError(f"{checkpoint} belongs to a different scenario or settings")
+    if state is None:
+        state = {
+            'key': key,
+            'entropy': root.entropy,
+            'spawn_key': list(root.spawn_key),
+            'batches': 0,
+            'n_reps': 0,
+            'tallies': {},
+            'reasons': {},
+            'stopped': None,
+        }
+
+    def settled():
+        reasons = {
+            name: stopping_reason(s, t, target, tolerance, confidence) if state['n_reps'] >= min_reps else None
+            for name, (s, t) in state['tallies'].items()
+        }
+        state['reasons'] = reasons
+        if reasons and all(reasons.values()):
+            return 'rule'
+        if state['n_reps'] >= max_reps:
+            return 'max_reps'
+        return None
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    while state['stopped'] is None:
+        first = state['batches']
+        batches = range(first, first + max(n_jobs, 1))
+        sizes = [min(batch_size, max_reps - state['n_reps'] - (k - first) * batch_size) for k in batches]
+        tasks = [
+            (np.random.SeedSequence(state['entropy'], spawn_key=tuple(state['spawn_key']) + (k,)), size) + tuple(args)
+            for k, size in zip(batches, sizes) if size > 0
+        ]
+        for size, result in zip(sizes, run_chunks(worker, tasks, n_jobs)):
+            for name, (reject, valid) in result.items():
+                s, t = state['tallies'].get(name, (0, 0))
+                state['tallies'][name] = [s + int(np.count_nonzero(reject & valid)), t + int(np.count_nonzero(valid))]
+            state['batches'] += 1
+            state['n_reps'] += size
+            state['stopped'] = settled()
+            if checkpoint is not None:
+                _write_json(checkpoint, state)
+            if state['stopped'] is not None:
+                break
+
+    output = {}
+    for name, (s, t) in state['tallies'].items():
+        output[name] = {
+            'power': s / t if t else np.nan,
+            'ci': wilson_interval(s, t, confidence),
+            'successes': s,
+            'trials': t,
+            'reason': state['reasons'].get(name),
+        }
+    output['n_reps'] = state['n_reps']
+    output['batches'] = state['batches']
+    output['stopped'] = state['stopped']
+    return output
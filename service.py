@@ -0,0 +1,359 @@
+"""
+Local power-calculation service for the K01 analyses
+
+A small asyncio HTTP/1.1 JSON service (standard library only) that answers
+power, minimum detectable effect and sample-size queries for Aims 1 and 3,
+plus APIMPowerR-style APIM power. Concurrent queries to the same endpoint
+are micro-batched: they are collected for up to ``max_delay`` seconds (or
+``max_batch`` queries) and answered by one vectorized power_engine call.
+Repeated queries are answered from a power_cache.PowerCache, and identical
+queries in flight share one evaluation.
+
+Usage:
+    python service.py --port 8765
+
+    curl -s localhost:8765/aim1/power -d '{"odds_ratio": 1.5}'
+    curl -s localhost:8765/aim3/sample_size -d '[{"icc_partners": 0.1}, {"icc_partners": 0.5}]'
+    curl -s localhost:8765/endpoints
+
+Omitted fields default to the study parameters in config.py.
+"""
+
+import argparse
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+import numpy as np
+
+import apim_power
+import config
+import power_engine
+from power_cache import PowerCache, cache_key
+
+# Bump when an endpoint's results change, so cached answers are not reused
+SERVICE_VERSION = 1
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def _aim1_power(q):
+    p1 = power_engine.or_to_proportion(q['odds_ratio'], q['ipv_p_others'])
+    result = power_engine.two_sample_proportion_power(
+        q['n_south_asian'], q['n_others'], p1, q['ipv_p_others'], q['alpha'], q['design_effect']
+    )
+    return {key: result[key] for key in ('power', 'effect_size_h', 'n1_effective', 'fallback')}
+
+
+def _aim1_mde(q):
+    result = power_engine.min_detectable_OR(
+        q['n_south_asian'], q['n_others'], q['ipv_p_others'], q['power'], q['alpha'], q['design_effect']
+    )
+    return {'min_OR': result['min_OR'], 'p1_min': result['p1_min'], 'converged': result['converged']}
+
+
+def _aim1_sample_size(q):
+    p1 = power_engine.or_to_proportion(q['odds_ratio'], q['ipv_p_others'])
+    result = power_engine.required_n_two_sample(
+        p1, q['ipv_p_others'], q['n_others'], q['power'], q['alpha'], q['design_effect']
+    )
+    return {'n_south_asian': result['n'], 'power': result['power'], 'achievable': result['achievable']}
+
+
+def _aim3_power(q):
+    result = power_engine.dyadic_power_apim(
+        q['n_couples'], q['baseline_ipv_rate'], q['actor_effect_OR'], q['partner_effect_OR'],
+        q['icc_partners'], q['alpha']
+    )
+    return {key: result[key] for key in ('actor_power', 'partner_power', 'n_effective')}
+
+
+def _aim3_sample_size(q):
+    return power_engine.required_n_couples(
+        q['effect_OR'], q['icc_partners'], q['power'], q['alpha'], q['baseline_ipv_rate']
+    )
+
+
+def _apim_power(q):
+    result = apim_power.apim_power(
+        q['n_dyads'], apim_power.odds_ratio_to_d(q['actor_OR']), apim_power.odds_ratio_to_d(q['partner_OR']),
+        q['alpha'], predictor_correlation=q['predictor_correlation'], error_correlation=q['error_correlation']
+    )
+    return {
+        'actor_power': result['actor_1']['power'],
+        'partner_power': result['partner_1']['power'],
+        'actor_partial_r': result['actor_1']['partial_r'],
+        'partner_partial_r': result['partner_1']['partial_r'],
+        'df': result['df'],
+    }
+
+
+def endpoints(aim1_params, aim3_params):
+    """Endpoint path -> (field defaults, vectorized evaluation over columns of queries)"""
+    aim1 = {
+        'n_south_asian': aim1_params['n_south_asian'],
+        'n_others': aim1_params['n_others'],
+        'ipv_p_others': aim1_params['ipv_p_others'],
+        'alpha': aim1_params['alpha'],
+        'design_effect': aim1_params['design_effect'],
+    }
+    observed_OR = float(power_engine.odds_ratio(aim1_params['ipv_p_south_asian'], aim1_params['ipv_p_others']))
+    aim3 = {
+        'baseline_ipv_rate': aim3_params['baseline_ipv_rate'],
+        'icc_partners': aim3_params['icc_partners'],
+        'alpha': aim3_params['alpha'],
+    }
+    return {
+        '/aim1/power': ({**aim1, 'odds_ratio': observed_OR}, _aim1_power),
+        '/aim1/mde': ({**aim1, 'power': 0.8}, _aim1_mde),
+        '/aim1/sample_size': ({**aim1, 'odds_ratio': observed_OR, 'power': 0.8}, _aim1_sample_size),
+        '/aim3/power': ({
+            **aim3,
+            'n_couples': aim3_params['n_couples'],
+            'actor_effect_OR': aim3_params['actor_effect_OR'],
+            'partner_effect_OR': aim3_params['partner_effect_OR'],
+        }, _aim3_power),
+        '/aim3/sample_size': ({
+            **aim3,
+            'effect_OR': aim3_params['actor_effect_OR'],
+            'power': 0.8,
+        }, _aim3_sample_size),
+        '/apim/power': ({
+            'n_dyads': aim3_params['n_couples'],
+            'actor_OR': aim3_params['actor_effect_OR'],
+            'partner_OR': aim3_params['partner_effect_OR'],
+            'alpha': aim3_params['alpha'],
+            'predictor_correlation': aim3_params['predictor_correlation'],
+            'error_correlation': aim3_params['icc_partners'],
+        }, _apim_power),
+    }
+
+
+def _json_value(value):
+    value = value.item() if isinstance(value, np.generic) else value
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+class MicroBatcher:
+    """
+    Collects queries for one endpoint and evaluates them in vectorized batches
+
+    When a batch fails, its queries are evaluated one by one, so a query
+    that cannot be answered fails alone instead of with the whole batch.
+    """
+
+    def __init__(self, evaluate, max_batch=512, max_delay=0.002):
+        self.evaluate = evaluate
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending = []
+        self.batches = 0
+        self.largest_batch = 0
+        self._timer = None
+        # Batch tasks in flight; the event loop only keeps weak references
+        self._tasks = set()
+
+    def submit(self, query):
+        """Queue one query (dict of field -> number); returns a future for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((query, future))
+        if len(self.pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _evaluate(self, queries):
+        """Results of a list of queries from one vectorized evaluation"""
+        columns = {name: np.array([query[name] for query in queries], dtype=float) for name in queries[0]}
+        size = len(queries)
+        result = {key: np.broadcast_to(value, (size,)) for key, value in self.evaluate(columns).items()}
+        return [{key: _json_value(value[i]) for key, value in result.items()} for i in range(size)]
+
+    def _evaluate_each(self, queries):
+        """(result, error) of every query evaluated on its own"""
+        outcomes = []
+        for query in queries:
+            try:
+                outcomes.append((self._evaluate([query])[0], None))
+            except Exception as error:
+                outcomes.append((None, error))
+        return outcomes
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        loop = asyncio.get_running_loop()
+        queries = [query for query, _ in batch]
+        try:
+            # Evaluate off the event loop so connections keep being accepted
+            outcomes = [(result, None) for result in await loop.run_in_executor(None, self._evaluate, queries)]
+        except Exception:
+            outcomes = await loop.run_in_executor(None, self._evaluate_each, queries)
+        for (_, future), (result, error) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+class PowerService:
+    """Power queries over HTTP, micro-batched per endpoint and cached"""
+
+    def __init__(self, aim1_params=None, aim3_params=None, cache=None, max_batch=None, max_delay=None):
+        settings = config.service_params
+        self.endpoints = endpoints(aim1_params or config.aim1_params, aim3_params or config.aim3_params)
+        self.cache = PowerCache() if cache is None else cache
+        max_batch = settings['max_batch'] if max_batch is None else max_batch
+        max_delay = settings['max_delay_ms'] / 1000 if max_delay is None else max_delay
+        self.batchers = {
+            path: MicroBatcher(evaluate, max_batch, max_delay) for path, (_, evaluate) in self.endpoints.items()
+        }
+        self.queries = 0
+        self._in_flight = {}
+
+    def stats(self):
+        return {
+            'queries': self.queries,
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'batches': {path: batcher.batches for path, batcher in self.batchers.items()},
+            'largest_batch': max(batcher.largest_batch for batcher in self.batchers.values()),
+        }
+
+    def _complete(self, path, params):
+        defaults, _ = self.endpoints[path]
+        unknown = set(params) - set(defaults)
+        if unknown:
+            raise ValueError(f"unknown fields for {path}: {', '.join(sorted(unknown))}")
+        query = dict(defaults)
+        for name, value in params.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"field {name} has to be a number")
+            query[name] = float(value)
+        return query
+
+    async def query(self, path, params):
+        """Answer one query (dict of fields) for an endpoint path such as '/aim1/power'"""
+        if path not in self.endpoints:
+            raise KeyError(path)
+        query = self._complete(path, params)
+        self.queries += 1
+        key = cache_key(path, SERVICE_VERSION, query)
+        hit, value = self.cache.get(key)
+        if hit:
+            return value
+        if key not in self._in_flight:
+            self._in_flight[key] = self.batchers[path].submit(query)
+        try:
+            result = await asyncio.shield(self._in_flight[key])
+        finally:
+            self._in_flight.pop(key, None)
+        self.cache.put(key, result, path, SERVICE_VERSION)
+        return dict(result)
+
+    async def dispatch(self, method, target, body):
+        """(status, payload) for one HTTP request"""
+        path = urlsplit(target).path.rstrip('/') or '/'
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', **self.stats()}
+        if method == 'GET' and path == '/endpoints':
+            return 200, {name: defaults for name, (defaults, _) in self.endpoints.items()}
+        if path not in self.endpoints:
+            return 404, {'error': f"unknown endpoint {path}"}
+        if method != 'POST':
+            return 405, {'error': "queries are POSTed as JSON"}
+        try:
+            payload = json.loads(body or b'{}')
+            if isinstance(payload, list):
+                return 200, list(await asyncio.gather(*(self.query(path, item) for item in payload)))
+            if isinstance(payload, dict):
+                return 200, await self.query(path, payload)
+            raise ValueError("the body has to be a JSON object or a list of objects")
+        except (ValueError, TypeError, AttributeError) as error:
+            return 400, {'error': str(error)}
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection (keep-alive supported)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except Exception as error:
+                    status, payload = 500, {'error': f"{type(error).__name__}: {error}"}
+                data = json.dumps(payload).encode()
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=None, port=None):
+        """Start listening; returns the asyncio server"""
+        settings = config.service_params
+        return await asyncio.start_server(
+            self.handle,
+            settings['host'] if host is None else host,
+            settings['port'] if port is None else port
+        )
+
+
+async def serve(host=None, port=None):
+    # In-memory cache: a disk write per new query would stall the event loop
+    service = PowerService(cache=PowerCache(max_memory_items=config.cache_params['max_memory_items']))
+    server = await service.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"K01 power service listening on http://{address[0]}:{address[1]}")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve K01 power queries over HTTP")
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
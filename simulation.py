@@ -0,0 +1,354 @@
+"""
+Monte Carlo power simulation for the K01 analyses
+
+Simulation counterparts of the closed-form power approximations. Replicates
+are generated and fitted in stacked NumPy arrays (many logistic regressions
+per IRLS pass) and split into fixed-size chunks, each with its own
+independent RNG stream spawned from one seed. Chunks can run in a process
+pool; because the chunking does not depend on the number of workers, the
+same seed gives the same result on every run.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import special
+
+
+def spawn_streams(seed, n_streams):
+    """Independent child seed sequences for ``n_streams`` chunks"""
+    return np.random.SeedSequence(seed).spawn(n_streams)
+
+
+def split_reps(n_reps, chunk_size):
+    """Replicate counts of the chunks of a simulation; ValueError unless both are positive"""
+    if n_reps < 1:
+        raise ValueError(f"n_reps has to be at least 1, got {n_reps}")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size has to be at least 1, got {chunk_size}")
+    chunks = [chunk_size] * (n_reps // chunk_size)
+    if n_reps % chunk_size:
+        chunks.append(n_reps % chunk_size)
+    return chunks
+
+
+def iter_chunks(worker, tasks, n_jobs=None):
+    """
+    Yield ``worker(*task)`` for every task, in task order, as results arrive
+
+    ``n_jobs=1`` runs inline; ``None`` uses every core. Lets callers stream
+    each chunk's result out before the remaining chunks finish.
+    """
+    tasks = list(tasks)
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(tasks))
+    if n_jobs <= 1:
+        for task in tasks:
+            yield worker(*task)
+        return
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        yield from pool.map(worker, *zip(*tasks))
+
+
+def run_chunks(worker, tasks, n_jobs=None):
+    """
+    Run ``worker(*task)`` for every task, in order, optionally in a process pool
+
+    ``n_jobs=1`` runs inline; ``None`` uses every core. Results come back in
+    task order regardless of scheduling.
+    """
+    return list(iter_chunks(worker, tasks, n_jobs))
+
+
+def batched_logistic_irls(X, y, weights=None, max_iter=25, tol=1e-8):
+    """
+    Fit a stack of logistic regressions by iteratively reweighted least squares
+
+    X is (R, N, p) or a design shared by all replicates (N, p); y is (R, N);
+    weights are optional case weights broadcastable to (R, N). Replicates
+    that have converged are frozen; replicates that fail to converge (e.g.
+    under separation) are flagged in ``converged``.
+
+    Returns a dict with 'coef' (R, p), 'mu' (R, N), 'information' (R, p, p)
+    and 'converged' (R,).
+    """
+    y = np.asarray(y, dtype=float)
+    X = np.asarray(X, dtype=float)
+    n_reps, n_obs = y.shape
+    n_coef = X.shape[-1]
+    weights = np.ones_like(y) if weights is None else np.broadcast_to(weights, y.shape)
+    shared = X.ndim == 2
+    ridge = 1e-10 * np.eye(n_coef)
+
+    if shared:
+        # Row-wise outer products, so the information is one (R, N) x (N, p^2) product
+        outer = (X[:, :, None] * X[:, None, :]).reshape(n_obs, n_coef * n_coef)
+
+    def linear_predictor(coef):
+        return coef @ X.T if shared else np.einsum('rnp,rp->rn', X, coef)
+
+    def information(w):
+        if shared:
+            return (w @ outer).reshape(n_reps, n_coef, n_coef)
+        return np.matmul(np.swapaxes(X * w[..., None], 1, 2), X)
+
+    def fitted(coef):
+        # In-place 1 / (1 + exp(-eta)); about twice as fast as special.expit
+        mu = np.negative(linear_predictor(coef))
+        with np.errstate(over='ignore'):
+            np.exp(mu, out=mu)
+        mu += 1
+        return np.reciprocal(mu, out=mu)
+
+    def working_weights(mu):
+        w = 1 - mu
+        w *= mu
+        w *= weights
+        return w
+
+    def score(resid):
+        return resid @ X if shared else np.einsum('rnp,rn->rp', X, resid)
+
+    coef = np.zeros((n_reps, n_coef))
+    # Start the intercept (first column) at the weighted logit of the mean
+    ybar = np.clip((weights * y).sum(axis=1) / weights.sum(axis=1), 1e-6, 1 - 1e-6)
+    coef[:, 0] = special.logit(ybar)
+
+    active = np.ones(n_reps, dtype=bool)
+    converged = np.zeros(n_reps, dtype=bool)
+    for _ in range(max_iter):
+        mu = fitted(coef)
+        info = information(working_weights(mu))
+        resid = np.subtract(y, mu, out=mu)
+        resid *= weights
+        step = np.linalg.solve(info + ridge, score(resid)[..., None])[..., 0]
+        step[~active] = 0
+        coef += step
+        done = active & (np.abs(step).max(axis=1) < tol)
+        converged |= done
+        active &= ~done
+        if not active.any():
+            break
+
+    mu = fitted(coef)
+    info = information(working_weights(mu))
+    converged &= np.isfinite(coef).all(axis=1) & (np.abs(coef).max(axis=1) < 30)
+    return {'coef': coef, 'mu': mu, 'information': info, 'converged': converged}
+
+
+def cluster_robust_cov(X, y, fit, cluster_starts, weights=None, strata_starts=None):
+    """
+    Cluster-robust (sandwich) covariance for a stack of logistic fits
+
+    Rows must be sorted by cluster, with ``cluster_starts`` giving the first
+    row of each cluster. With independence working correlation this is the
+    GEE robust variance, including the G / (G - 1) small-sample factor.
+
+    For survey data, pass the PSUs as clusters, sorted by stratum, with
+    ``strata_starts`` giving the first PSU of each stratum: the result is the
+    Taylor-linearization variance with PSU totals centred within strata and
+    the n_h / (n_h - 1) factor per stratum.
+    """
+    y = np.asarray(y, dtype=float)
+    resid = y - fit['mu'] if weights is None else np.broadcast_to(weights, y.shape) * (y - fit['mu'])
+    X = np.asarray(X, dtype=float)
+    scores = (X if X.ndim == 3 else X[None]) * resid[..., None]
+    cluster_scores = np.add.reduceat(scores, cluster_starts, axis=1)
+
+    n_clusters = len(cluster_starts)
+    if strata_starts is None:
+        strata_starts = np.array([0])
+    stratum_size = np.diff(np.append(strata_starts, n_clusters))
+    stratum_of = np.repeat(np.arange(len(strata_starts)), stratum_size)
+    stratum_means = np.add.reduceat(cluster_scores, strata_starts, axis=1) / stratum_size[:, None]
+    centred = cluster_scores - stratum_means[:, stratum_of]
+    factor = (stratum_size / np.maximum(stratum_size - 1, 1))[stratum_of]
+
+    meat = np.matmul(np.swapaxes(centred * factor[:, None], 1, 2), centred)
+    bread = np.linalg.inv(fit['information'] + 1e-10 * np.eye(X.shape[-1]))
+    return bread @ meat @ bread
+
+
+def simulate_apim_dyads(rng, n_reps, n_couples, p_baseline, actor_OR, partner_OR, icc,
+                        x_prevalence=0.5, x_correlation=0.3):
+    """
+    Simulate binary APIM data for distinguishable dyads
+
+    Each partner has a binary predictor X (prevalence ``x_prevalence``,
+    correlated ``x_correlation`` across partners) and a binary IPV outcome
+    from a logistic model with actor and partner log-ORs and a shared dyad
+    random intercept whose variance gives a latent-scale ICC of ``icc``.
+    ``p_baseline`` is the outcome rate for unexposed partners at a zero
+    random effect.
+
+    Rows are ordered dyad by dyad (person 1, person 2). Returns (X, y) with
+    X (n_reps, 2 * n_couples, 4) = [intercept, role, actor X, partner X].
+    """
+    x1 = rng.random((n_reps, n_couples)) < x_prevalence
+    shared = rng.random((n_reps, n_couples)) < x_correlation
+    x2 = np.where(shared, x1, rng.random((n_reps, n_couples)) < x_prevalence)
+
+    sigma = np.sqrt(icc / (1 - icc) * np.pi ** 2 / 3)
+    dyad_effect = sigma * rng.standard_normal((n_reps, n_couples))
+    intercept = special.logit(p_baseline) + dyad_effect
+    eta1 = intercept + np.log(actor_OR) * x1 + np.log(partner_OR) * x2
+    eta2 = intercept + np.log(actor_OR) * x2 + np.log(partner_OR) * x1
+
+    y = np.empty((n_reps, 2 * n_couples))
+    y[:, 0::2] = rng.random((n_reps, n_couples)) < special.expit(eta1)
+    y[:, 1::2] = rng.random((n_reps, n_couples)) < special.expit(eta2)
+
+    X = np.empty((n_reps, 2 * n_couples, 4))
+    X[..., 0] = 1
+    X[:, 0::2, 1], X[:, 1::2, 1] = 0, 1
+    X[:, 0::2, 2], X[:, 1::2, 2] = x1, x2
+    X[:, 0::2, 3], X[:, 1::2, 3] = x2, x1
+    return X, y
+
+
+def _apim_chunk(seed_seq, n_reps, n_couples, p_baseline, actor_OR, partner_OR, icc, alpha,
+                x_prevalence, x_correlation):
+    """Simulate and fit one chunk of APIM replicates; returns per-replicate rejections"""
+    rng = np.random.default_rng(seed_seq)
+    X, y = simulate_apim_dyads(rng, n_reps, n_couples, p_baseline, actor_OR, partner_OR, icc,
+                               x_prevalence, x_correlation)
+    fit = batched_logistic_irls(X, y)
+    cov = cluster_robust_cov(X, y, fit, np.arange(0, 2 * n_couples, 2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = fit['coef'][:, 2:4] / np.sqrt(np.diagonal(cov, axis1=1, axis2=2)[:, 2:4])
+    reject = np.abs(z) > special.ndtri(1 - alpha / 2)
+    converged = fit['converged'] & np.isfinite(z).all(axis=1)
+    return reject[:, 0], reject[:, 1], converged
+
+
+def simulate_apim_power(n_couples, p_baseline, actor_OR, partner_OR, icc, alpha=0.05,
+                        n_reps=2000, seed=None, n_jobs=None, chunk_size=250,
+                        x_prevalence=0.5, x_correlation=0.3):
+    """
+    Monte Carlo power for actor and partner effects in a binary APIM
+
+    Each replicate fits a pooled logistic regression of IPV on role, actor X
+    and partner X, with GEE (independence) cluster-robust standard errors by
+    dyad, and tests the actor and partner effects with two-sided Wald tests.
+    Power is the rejection rate among converged replicates.
+    """
+    n_couples = int(n_couples)
+    chunks = split_reps(n_reps, chunk_size)
+    streams = spawn_streams(seed, len(chunks))
+    tasks = [
+        (stream, reps, n_couples, p_baseline, actor_OR, partner_OR, icc, alpha, x_prevalence, x_correlation)
+        for stream, reps in zip(streams, chunks)
+    ]
+    results = run_chunks(_apim_chunk, tasks, n_jobs)
+
+    actor = np.concatenate([r[0] for r in results])
+    partner = np.concatenate([r[1] for r in results])
+    converged = np.concatenate([r[2] for r in results])
+    n_converged = int(converged.sum())
+
+    actor_power = actor[converged].mean() if n_converged else np.nan
+    partner_power = partner[converged].mean() if n_converged else np.nan
+    return {
+        'actor_power': float(actor_power),
+        'partner_power': float(partner_power),
+        'actor_power_se': float(np.sqrt(actor_power * (1 - actor_power) / max(n_converged, 1))),
+        'partner_power_se': float(np.sqrt(partner_power * (1 - partner_power) / max(n_converged, 1))),
+        'n_reps': n_reps,
+        'n_converged': n_converged,
+    }
+
+
+def build_survey_design(rng, n_group, n_others, n_strata=40, psus_per_stratum=10, weight_cv=0.7):
+    """
+    Fixed stratified, PSU-clustered sample resembling a CHIS pooled file
+
+    Respondents (``n_group`` in the focal group, ``n_others`` in the
+    comparison group) are allocated at random to ``n_strata`` strata of
+    ``psus_per_stratum`` PSUs each and carry lognormal relative weights with
+    coefficient of variation ``weight_cv`` (Kish design effect 1 + cv^2).
+    Rows are sorted by stratum and PSU.
+    """
+    n_total = n_group + n_others
+    n_psu = n_strata * psus_per_stratum
+    group = np.zeros(n_total, dtype=bool)
+    group[rng.choice(n_total, n_group, replace=False)] = True
+    psu = rng.integers(0, n_psu, n_total)
+    # Guarantee every PSU is sampled so the strata layout is complete
+    psu[:n_psu] = np.arange(n_psu)
+
+    order = np.argsort(psu, kind='stable')
+    group, psu = group[order], psu[order]
+    sigma = np.sqrt(np.log(1 + weight_cv ** 2))
+    weights = rng.lognormal(-sigma ** 2 / 2, sigma, n_total)
+
+    X = np.column_stack([np.ones(n_total), group.astype(float)])
+    return {
+        'X': X,
+        'psu': psu,
+        'weights': weights / weights.mean(),
+        'psu_starts': np.flatnonzero(np.r_[True, np.diff(psu) != 0]),
+        'strata_starts': np.arange(0, n_psu, psus_per_stratum),
+    }
+
+
+def _survey_chunk(seed_seq, n_reps, design, p_group, p_others, psu_icc, alpha):
+    """Simulate outcomes on the fixed design and fit one chunk of weighted logistic models"""
+    rng = np.random.default_rng(seed_seq)
+    X, psu, weights = design['X'], design['psu'], design['weights']
+    n_psu = psu.max() + 1
+
+    sigma = np.sqrt(psu_icc / (1 - psu_icc) * np.pi ** 2 / 3)
+    psu_effect = sigma * rng.standard_normal((n_reps, n_psu))
+    eta = special.logit(p_others) + (special.logit(p_group) - special.logit(p_others)) * X[:, 1] + psu_effect[:, psu]
+    y = (rng.random(eta.shape) < special.expit(eta)).astype(float)
+
+    fit = batched_logistic_irls(X, y, weights)
+    cov = cluster_robust_cov(X, y, fit, design['psu_starts'], weights, design['strata_starts'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = fit['coef'][:, 1] / np.sqrt(cov[:, 1, 1])
+        # Simple-random-sampling variance at the same fit, for the implied design effect
+        srs_info = np.einsum('np,rn,nq->rpq', X, fit['mu'] * (1 - fit['mu']), X, optimize=True)
+        srs_var = np.linalg.inv(srs_info)[:, 1, 1]
+    reject = np.abs(z) > special.ndtri(1 - alpha / 2)
+    converged = fit['converged'] & np.isfinite(z)
+    return reject, converged, cov[:, 1, 1] / srs_var
+
+
+def simulate_survey_power(n_group, n_others, p_group, p_others, alpha=0.05, n_reps=1000, seed=None,
+                          n_jobs=None, chunk_size=50, n_strata=40, psus_per_stratum=10,
+                          weight_cv=0.7, psu_icc=0.02):
+    """
+    Monte Carlo power for a group difference in a complex-survey logistic regression
+
+    One stratified, PSU-clustered, weighted design is drawn from the seed;
+    each replicate redraws PSU random effects (latent-scale ICC ``psu_icc``)
+    and outcomes, fits a survey-weighted logistic regression of the outcome
+    on group membership and tests it with the Taylor-linearization Wald test.
+    The shared design matrix lets a whole chunk of replicates be fitted in
+    one stacked IRLS pass.
+    """
+    chunks = split_reps(n_reps, chunk_size)
+    design_stream, *streams = spawn_streams(seed, len(chunks) + 1)
+    design = build_survey_design(np.random.default_rng(design_stream), int(n_group), int(n_others),
+                                 n_strata, psus_per_stratum, weight_cv)
+    tasks = [
+        (stream, reps, design, p_group, p_others, psu_icc, alpha)
+        for stream, reps in zip(streams, chunks)
+    ]
+    results = run_chunks(_survey_chunk, tasks, n_jobs)
+
+    reject = np.concatenate([r[0] for r in results])
+    converged = np.concatenate([r[1] for r in results])
+    deff = np.concatenate([r[2] for r in results])
+    n_converged = int(converged.sum())
+
+    power = reject[converged].mean() if n_converged else np.nan
+    return {
+        'power': float(power),
+        'power_se': float(np.sqrt(power * (1 - power) / max(n_converged, 1))),
+        'design_effect': float(np.median(deff[converged])) if n_converged else np.nan,
+        'n_reps': n_reps,
+        'n_converged': n_converged,
+    }
@@ -0,0 +1,251 @@
+"""
+Memory-mapped store of precomputed power surfaces
+
+A surface is power over the outer grid of several parameters (e.g. South
+Asian n x odds ratio x alpha x design effect), saved in its own directory:
+
+    meta.json        dims, coordinates, quantities, fingerprint, completed chunks
+    <quantity>.npy   one array per quantity, opened memory-mapped
+
+Surfaces are filled in chunks along the first dimension, evaluated with the
+vectorized power engine across a process pool and written straight into the
+memory map, so a surface larger than RAM can be built and an interrupted
+build resumes with the chunks still missing. A surface whose grid or
+parameters changed is rebuilt.
+
+Queries read only the grid hyperplanes they need: slice() fixes some
+dimensions (e.g. power vs OR at n=237, alpha=0.1) and interpolate() evaluates
+arbitrary points. Values between grid points are multilinear interpolations
+of the neighbouring grid values.
+
+Usage:
+    python surface_store.py --surface aim1_power
+"""
+
+import argparse
+import itertools
+import json
+import os
+
+import numpy as np
+
+import config
+import power_engine
+from power_cache import cache_key
+from results import PowerResultTable
+from simulation import iter_chunks
+
+# Bump when an evaluator changes, so stored surfaces are rebuilt
+SURFACE_VERSION = 1
+
+
+def evaluate_aim1_power(grid, base_params):
+    """Aim 1 power over an outer grid of n_south_asian, odds_ratio, alpha and design_effect"""
+    p_others = base_params['ipv_p_others']
+    result = power_engine.two_sample_proportion_power(
+        grid['n_south_asian'], base_params['n_others'],
+        power_engine.or_to_proportion(grid['odds_ratio'], p_others), p_others,
+        grid['alpha'], grid['design_effect']
+    )
+    return {'power': result['power']}
+
+
+def evaluate_aim3_power(grid, base_params):
+    """Power of one APIM effect (actor or partner) over n_couples, effect_OR, alpha and icc_partners"""
+    power, _ = power_engine.apim_effect_power(
+        grid['n_couples'], base_params['baseline_ipv_rate'], grid['effect_OR'], grid['icc_partners'], grid['alpha']
+    )
+    return {'power': power}
+
+
+SURFACES = {
+    'aim1_power': evaluate_aim1_power,
+    'aim3_power': evaluate_aim3_power,
+}
+
+
+def grid_coords(spec):
+    """Sorted coordinates from a list of values or a {'start', 'stop', 'num'} spec"""
+    if isinstance(spec, dict):
+        return np.linspace(spec['start'], spec['stop'], spec['num'])
+    return np.unique(np.asarray(spec, dtype=float))
+
+
+def _surface_chunk(name, coords, base_params):
+    """Evaluate one chunk (a slab along the first dimension) of a surface"""
+    dims, _, grid = power_engine.outer_grid(**coords)
+    shape = tuple(len(coords[dim]) for dim in dims)
+    return {q: np.broadcast_to(v, shape).astype(float) for q, v in SURFACES[name](grid, base_params).items()}
+
+
+def _write_meta(directory, meta):
+    path = os.path.join(directory, 'meta.json')
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+        f.write('\n')
+    os.replace(f'{path}.tmp', path)
+
+
+class Surface:
+    """A stored surface, opened read-only and memory-mapped"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.directory = directory
+        self.dims = self.meta['dims']
+        self.coords = {dim: np.asarray(self.meta['coords'][dim], dtype=float) for dim in self.dims}
+        self.quantities = self.meta['quantities']
+        self.arrays = {q: np.load(os.path.join(directory, f'{q}.npy'), mmap_mode='r') for q in self.quantities}
+        self.computed = 0
+
+    @property
+    def shape(self):
+        return tuple(len(self.coords[dim]) for dim in self.dims)
+
+    def _bracket(self, dim, value):
+        """Lower and upper grid index and upper weight of each value along ``dim``"""
+        grid = self.coords[dim]
+        value = np.asarray(value, dtype=float)
+        if np.any((value < grid[0]) | (value > grid[-1])) or np.any(np.isnan(value)):
+            raise ValueError(f"{dim} outside the stored grid [{grid[0]:g}, {grid[-1]:g}]")
+        upper = np.clip(np.searchsorted(grid, value, side='left'), 0, len(grid) - 1)
+        lower = np.clip(upper - 1, 0, None)
+        span = grid[upper] - grid[lower]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(span > 0, (value - grid[lower]) / span, 1.0)
+        return lower, upper, weight
+
+    def interpolate(self, quantity='power', **point):
+        """Multilinear interpolation at points given for every dimension (arrays broadcast)"""
+        missing = set(self.dims) - set(point)
+        if missing:
+            raise ValueError(f"missing coordinates: {', '.join(sorted(missing))}")
+        brackets = [self._bracket(dim, point[dim]) for dim in self.dims]
+        shape = np.broadcast_shapes(*(np.shape(point[dim]) for dim in self.dims))
+        array = self.arrays[quantity]
+        total = np.zeros(shape)
+        for corner in itertools.product((0, 1), repeat=len(self.dims)):
+            index = tuple(np.broadcast_to(upper if c else lower, shape) for (lower, upper, _), c in zip(brackets, corner))
+            weight = np.ones(shape)
+            for (_, _, w), c in zip(brackets, corner):
+                weight = weight * (w if c else 1 - w)
+            if np.any(weight):
+                total += weight * array[index]
+        return total
+
+    def slice(self, quantities=None, **fixed):
+        """
+        Sub-surface over the dimensions not fixed, as a PowerResultTable
+
+        Each fixed dimension takes one value, on or between grid points;
+        only the grid hyperplanes next to it are read.
+        """
+        unknown = set(fixed) - set(self.dims)
+        if unknown:
+            raise ValueError(f"unknown dimensions: {', '.join(sorted(unknown))}")
+        free = [dim for dim in self.dims if dim not in fixed]
+        brackets = {dim: self._bracket(dim, float(value)) for dim, value in fixed.items()}
+        columns = {}
+        for quantity in quantities or self.quantities:
+            array = self.arrays[quantity]
+            total = 0.0
+            for corner in itertools.product((0, 1), repeat=len(brackets)):
+                weight = 1.0
+                choice = dict(zip(brackets, corner))
+                for dim, c in choice.items():
+                    weight *= brackets[dim][2] if c else 1 - brackets[dim][2]
+                if weight == 0:
+                    continue
+                index = tuple(
+                    int(brackets[dim][1] if choice[dim] else brackets[dim][0]) if dim in fixed else slice(None)
+                    for dim in self.dims
+                )
+                total = total + weight * array[index]
+            columns[quantity] = np.asarray(total)
+        return PowerResultTable(columns, dims=free, coords={dim: self.coords[dim] for dim in free})
+
+
+def build_surface(directory, name, grid, base_params, chunk_size=8, n_jobs=None):
+    """
+    Build surface ``name`` over ``grid`` (dimension -> coordinate spec) in ``directory``
+
+    Missing chunks are computed and written into the memory maps; an
+    up-to-date surface is only opened. Returns the Surface, with
+    ``computed`` set to the number of chunks evaluated by this call.
+    """
+    if name not in SURFACES:
+        raise ValueError(f"surface has to be one of {sorted(SURFACES)}")
+    coords = {dim: grid_coords(spec) for dim, spec in grid.items()}
+    dims = list(coords)
+    shape = tuple(len(coords[dim]) for dim in dims)
+    n_chunks = -(-shape[0] // chunk_size)
+    fingerprint = cache_key('surface', SURFACE_VERSION, {
+        'name': name, 'coords': coords, 'base_params': base_params, 'chunk_size': chunk_size
+    })
+
+    meta_path = os.path.join(directory, 'meta.json')
+    meta = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['fingerprint'] != fingerprint:
+            meta = None
+    os.makedirs(directory, exist_ok=True)
+
+    pending = [i for i in range(n_chunks) if meta is None or i not in meta['completed']]
+    if not pending:
+        return Surface(directory)
+
+    tasks = []
+    for i in pending:
+        chunk = dict(coords)
+        chunk[dims[0]] = coords[dims[0]][i * chunk_size:(i + 1) * chunk_size]
+        tasks.append((name, chunk, base_params))
+    arrays = None
+    for i, result in zip(pending, iter_chunks(_surface_chunk, tasks, n_jobs)):
+        if arrays is None:
+            mode = 'w+' if meta is None else 'r+'
+            arrays = {
+                q: np.lib.format.open_memmap(os.path.join(directory, f'{q}.npy'), mode=mode, dtype=float, shape=shape)
+                for q in result
+            }
+            if meta is None:
+                meta = {
+                    'name': name,
+                    'fingerprint': fingerprint,
+                    'dims': dims,
+                    'coords': {dim: coords[dim].tolist() for dim in dims},
+                    'quantities': list(result),
+                    'chunk_size': chunk_size,
+                    'completed': [],
+                }
+        for q, values in result.items():
+            arrays[q][i * chunk_size:(i + 1) * chunk_size] = values
+            arrays[q].flush()
+        meta['completed'] = sorted(meta['completed'] + [i])
+        _write_meta(directory, meta)
+
+    surface = Surface(directory)
+    surface.computed = len(pending)
+    return surface
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a stored K01 power surface over config.surface_grids")
+    parser.add_argument('--surface', choices=sorted(SURFACES), required=True)
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: every core)")
+    args = parser.parse_args(argv)
+
+    settings = config.surface_params
+    base_params = config.aim1_params if args.surface.startswith('aim1') else config.aim3_params
+    directory = os.path.join(settings['directory'], args.surface)
+    surface = build_surface(directory, args.surface, config.surface_grids[args.surface], base_params,
+                            settings['chunk_size'], args.jobs)
+    print(f"{args.surface}: {' x '.join(map(str, surface.shape))} grid in {directory} "
+          f"({surface.computed} chunks computed)")
+    return surface
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Parallel multi-dimensional parameter sweeps for the K01 power analyses
+
+Grids for any subset of the study parameters (config.aim1_grid /
+config.aim3_grid, keyed like config.aim1_params / config.aim3_params) are
+expanded into a Cartesian or Latin-hypercube plan, split into chunks,
+evaluated with the vectorized power engine across a process pool and
+gathered into one columnar table (a dict of equal-length arrays). Chunks can
+be streamed to a resumable run directory as they finish (result_writer.py).
+
+Usage:
+    python sweep.py --aim 1 --design lhs --samples 100000 --out runs/aim1_lhs
+"""
+
+import argparse
+
+import numpy as np
+
+import config
+import power_engine
+from power_cache import cache_key
+from result_writer import ResultWriter, read_manifest
+from results import PowerResultTable
+from simulation import iter_chunks
+
+
+def expand_plan(grid, design='cartesian', n_samples=None, seed=None):
+    """
+    Expand parameter grids into a plan of equal-length columns
+
+    ``design='cartesian'`` crosses every listed value. ``design='lhs'`` draws
+    ``n_samples`` Latin-hypercube points over each parameter's [min, max]
+    range; parameters named ``n_*`` are rounded to integers.
+    """
+    names = list(grid)
+    values = [np.asarray(grid[name], dtype=float).ravel() for name in names]
+    if design == 'cartesian':
+        mesh = np.meshgrid(*values, indexing='ij')
+        return {name: axis.ravel() for name, axis in zip(names, mesh)}
+    if design != 'lhs':
+        raise ValueError("design has to be 'cartesian' or 'lhs'")
+    if not n_samples:
+        raise ValueError("a Latin-hypercube design needs n_samples")
+
+    from scipy.stats import qmc
+    unit = qmc.LatinHypercube(d=len(names), seed=seed).random(n_samples)
+    plan = {}
+    for j, (name, v) in enumerate(zip(names, values)):
+        column = v.min() + unit[:, j] * (v.max() - v.min())
+        plan[name] = np.round(column) if name.startswith('n_') else column
+    return plan
+
+
+def evaluate_aim1(columns, base_params):
+    """
+    Aim 1 power and minimum detectable OR for a chunk of the plan
+
+    Parameters missing from the plan come from ``base_params``. An
+    ``odds_ratio`` column sets the South Asian rate relative to
+    ``ipv_p_others``; otherwise ``ipv_p_south_asian`` is used. A plan with
+    both raises ValueError.
+    """
+    if 'odds_ratio' in columns and 'ipv_p_south_asian' in columns:
+        raise ValueError("give either odds_ratio or ipv_p_south_asian in an Aim 1 plan, not both")
+    p = {key: columns.get(key, base_params[key]) for key in base_params}
+    if 'odds_ratio' in columns:
+        p_sa = power_engine.or_to_proportion(columns['odds_ratio'], p['ipv_p_others'])
+    else:
+        p_sa = p['ipv_p_south_asian']
+    result = power_engine.two_sample_proportion_power(
+        p['n_south_asian'], p['n_others'], p_sa, p['ipv_p_others'], p['alpha'], p['design_effect']
+    )
+    mde = power_engine.min_detectable_OR(
+        p['n_south_asian'], p['n_others'], p['ipv_p_others'], 0.8, p['alpha'], p['design_effect']
+    )
+    size = len(next(iter(columns.values())))
+    return {
+        'power': np.broadcast_to(result['power'], size),
+        'n1_effective': np.broadcast_to(result['n1_effective'], size),
+        'min_detectable_OR': np.broadcast_to(mde['min_OR'], size),
+    }
+
+
+def evaluate_aim3(columns, base_params):
+    """Aim 3 actor and partner power for a chunk of the plan; missing parameters come from ``base_params``"""
+    p = {key: columns.get(key, base_params[key]) for key in base_params}
+    result = power_engine.dyadic_power_apim(
+        p['n_couples'], p['baseline_ipv_rate'], p['actor_effect_OR'], p['partner_effect_OR'],
+        p['icc_partners'], p['alpha']
+    )
+    size = len(next(iter(columns.values())))
+    return {
+        'actor_power': np.broadcast_to(result['actor_power'], size),
+        'partner_power': np.broadcast_to(result['partner_power'], size),
+        'n_effective': np.broadcast_to(result['n_effective'], size),
+    }
+
+
+EVALUATORS = {
+    'aim1': evaluate_aim1,
+    'aim3': evaluate_aim3,
+}
+
+# Plan columns an evaluator reads besides the keys of its base parameters
+EXTRA_COLUMNS = {
+    'aim1': ('odds_ratio',),
+    'aim3': (),
+}
+
+
+def _sweep_chunk(aim, columns, base_params):
+    """Evaluate one chunk of the plan (process-pool worker)"""
+    return {key: np.array(value) for key, value in EVALUATORS[aim](columns, base_params).items()}
+
+
+def plan_chunks(plan, chunk_size):
+    """Split a plan into consecutive chunks of at most ``chunk_size`` rows"""
+    size = len(next(iter(plan.values())))
+    for start in range(0, size, chunk_size):
+        yield start, {name: column[start:start + chunk_size] for name, column in plan.items()}
+
+
+def run_sweep(aim, plan, base_params=None, chunk_size=50_000, n_jobs=None, out_dir=None, metadata=None):
+    """
+    Evaluate a plan for ``aim`` ('aim1' or 'aim3') in chunks across a process pool
+
+    Returns one results.PowerResultTable: the plan columns followed by the
+    result columns, in plan order. With ``out_dir`` every chunk is streamed to disk
+    as it completes (see result_writer.ResultWriter, which keeps ``metadata``
+    in the run manifest); rerunning the same sweep into the same directory
+    skips the chunks already written. A plan without columns or rows, or
+    with a column that is not a parameter of ``aim``, raises ValueError.
+    """
+    if aim not in EVALUATORS:
+        raise ValueError(f"aim has to be one of {sorted(EVALUATORS)}")
+    if not plan or len(next(iter(plan.values()))) == 0:
+        raise ValueError("the plan has no scenarios (no parameters or an empty grid axis)")
+    if base_params is None:
+        base_params = config.aim1_params if aim == 'aim1' else config.aim3_params
+    unknown = set(plan) - set(base_params) - set(EXTRA_COLUMNS[aim])
+    if unknown:
+        raise ValueError(f"unknown {aim} parameters {', '.join(sorted(unknown))}")
+    chunks = list(plan_chunks(plan, chunk_size))
+
+    writer = None
+    done = set()
+    if out_dir is not None:
+        fingerprint = cache_key('sweep', 1, {
+            'aim': aim, 'plan': plan, 'base_params': base_params, 'chunk_size': chunk_size
+        })
+        writer = ResultWriter(out_dir, fingerprint, n_chunks=len(chunks), metadata=metadata)
+        done = writer.completed
+
+    pending = [i for i in range(len(chunks)) if i not in done]
+    tasks = [(aim, chunks[i][1], base_params) for i in pending]
+    results = []
+    for i, result in zip(pending, iter_chunks(_sweep_chunk, tasks, n_jobs)):
+        if writer is None:
+            results.append(result)
+        else:
+            writer.write(i, {**chunks[i][1], **result})
+    if writer is not None:
+        return PowerResultTable(writer.read_columns())
+
+    table = {name: np.asarray(column) for name, column in plan.items()}
+    for name in results[0]:
+        table[name] = np.concatenate([chunk[name] for chunk in results])
+    return PowerResultTable(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a K01 power sensitivity sweep over config grids")
+    parser.add_argument('--aim', choices=['1', '3'], required=True)
+    parser.add_argument('--design', choices=['cartesian', 'lhs'], default='cartesian')
+    parser.add_argument('--samples', type=int, default=None, help="number of Latin-hypercube points")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="Latin-hypercube seed (default: the run's saved seed, or a fresh one)")
+    parser.add_argument('--chunk-size', type=int, default=50_000)
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: every core)")
+    parser.add_argument('--out', default=None,
+                        help="run directory for streamed, resumable results (default: aim<N>_sweep)")
+    args = parser.parse_args(argv)
+
+    aim = f'aim{args.aim}'
+    grid = config.aim1_grid if aim == 'aim1' else config.aim3_grid
+    out = args.out or f'{aim}_sweep'
+    seed = args.seed
+    if args.design == 'lhs' and seed is None:
+        # Resuming has to redraw the same plan: reuse the seed saved with the run
+        seed = ((read_manifest(out) or {}).get('metadata') or {}).get('seed')
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+    plan = expand_plan(grid, args.design, args.samples, seed)
+    table = run_sweep(aim, plan, chunk_size=args.chunk_size, n_jobs=args.jobs, out_dir=out,
+                      metadata={'design': args.design, 'samples': args.samples, 'seed': seed})
+    print(f"{len(table[next(iter(table))]):,} {aim} scenarios written to {out}/results.csv")
+    return table
+
+
+if __name__ == "__main__":
+    main()
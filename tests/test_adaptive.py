@@ -0,0 +1,52 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import adaptive
+import power_engine
+from k01_power_analysis import K01PowerAnalysis
+import config
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_or_crossing_matches_min_detectable_OR(analysis):
+    params = config.aim1_params
+    result = analysis.adaptive_power_curve('aim1_or')
+    expected = analysis.min_detectable_OR(
+        params['n_south_asian'], params['n_others'], params['ipv_p_others'],
+        0.8, params['alpha'], params['design_effect']
+    )
+    assert result['crossings'][0.8] == pytest.approx([expected], abs=1e-8)
+    # Far fewer evaluations than a grid resolving the crossing to 1e-8
+    assert result['n_evaluations'] < 60
+    assert np.all(np.diff(result['x']) > 0)
+
+def test_sample_size_crossing_is_smallest_integer(analysis):
+    params = config.aim1_params
+    result = analysis.adaptive_power_curve('aim1_n', targets=(0.8, 0.9))
+    for target in (0.8, 0.9):
+        required = analysis.required_n_south_asian(
+            OR=power_engine.odds_ratio(params['ipv_p_south_asian'], params['ipv_p_others']), power=target
+        )
+        assert result['crossings'][target].tolist() == [required['n']]
+    couples = analysis.adaptive_power_curve('aim3_actor_n')
+    assert couples['crossings'][0.8].tolist() == [analysis.required_n_couples()['n_couples']]
+
+def test_refines_where_curve_bends():
+    # Flat except for a steep logistic step at x = 0.7
+    result = adaptive.adaptive_curve(lambda x: 1 / (1 + np.exp(-200 * (x - 0.7))), 0, 1,
+                                     targets=(0.5,), curvature_tol=0.01)
+    x = result['x']
+    near = np.sum(np.abs(x - 0.7) < 0.05)
+    assert near > np.sum(np.abs(x - 0.25) < 0.05)
+    assert result['crossings'][0.5] == pytest.approx([0.7], abs=1e-9)
+
+def test_falling_curve_and_no_crossing():
+    falling = adaptive.adaptive_curve(lambda n: 1000 / (n + 1000), 0, 1000, targets=(0.8,), integer=True)
+    # 1000 / (n + 1000) >= 0.8 up to n = 250
+    assert falling['crossings'][0.8].tolist() == [250]
+    flat = adaptive.adaptive_curve(lambda x: np.full(x.shape, 0.5), 0, 1, targets=(0.8,))
+    assert flat['crossings'][0.8].size == 0
+    assert flat['n_evaluations'] == 9
@@ -0,0 +1,70 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import apim_power
+from k01_power_analysis import K01PowerAnalysis
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ROW_NAMES = {
+    'Actor Effect for Person 1': 'actor_1',
+    'Actor Effect for Person 2': 'actor_2',
+    'Partner Effect for Person 1': 'partner_1',
+    'Partner Effect for Person 2': 'partner_2',
+    'Difference in Actor Effects': 'actor_difference',
+    'Difference in Partner Effects': 'partner_difference',
+    'Average of Actor Effects': 'actor_average',
+    'Average of Partner Effects': 'partner_average',
+}
+
+def read_apimpowerr_table(filename):
+    """Parse the effect table of an APIMPowerR output file into {row: {column: value}}"""
+    rows = {}
+    with open(os.path.join(ROOT, filename)) as f:
+        lines = [line.rstrip('\n') for line in f]
+    header = lines.index(next(line for line in lines if line.startswith('Effect\t')))
+    for line in lines[header + 1:]:
+        fields = line.split('\t')
+        if fields[0] not in ROW_NAMES:
+            break
+        values = [float(v) if v else None for v in fields[1:]]
+        columns = ['d', 'power', 'N', 'df', 'd_input', 'beta', 'r', 'partial_r', 'ncp']
+        rows[ROW_NAMES[fields[0]]] = dict(zip(columns, values))
+    return rows
+
+@pytest.mark.parametrize('filename, n_dyads', [
+    ('apimpower-200dyads.txt', 200),
+    ('apimpower-154effectivedyads.txt', 154),
+])
+def test_matches_apimpowerr_output(filename, n_dyads):
+    expected = read_apimpowerr_table(filename)
+    result = apim_power.apim_power(n_dyads, 0.186, 0.260, alpha=0.1,
+                                   predictor_correlation=0.3, error_correlation=0.3)
+    for row, values in expected.items():
+        assert result[row]['power'] == pytest.approx(values['power'], abs=0.0005), row
+        assert result[row]['ncp'] == pytest.approx(values['ncp'], abs=0.0005), row
+        if values['df'] is not None:
+            assert result['df'] == values['df']
+            for column in ('beta', 'r', 'partial_r'):
+                assert result[row][column] == pytest.approx(values[column], abs=0.0005), (row, column)
+
+def test_vectorized_over_scenarios():
+    n = np.array([[100], [200], [300]])
+    d = np.array([0.1, 0.186, 0.3])
+    result = apim_power.apim_power(n, d, d, alpha=0.1)
+    assert result['actor_1']['power'].shape == (3, 3)
+    assert result['df'].shape == (3, 3)
+    assert np.all(np.diff(result['actor_1']['power'], axis=0) > 0)
+    assert result['actor_1']['power'][1, 1] == pytest.approx(0.346, abs=0.0005)
+
+def test_unequal_persons_difference_has_power():
+    result = apim_power.apim_power(200, 0.1, 0.2, alpha=0.1, actor_d2=0.5, predictor_ratio=1.5, error_ratio=0.8)
+    assert result['actor_difference']['power'] > 0.1
+    assert result['actor_2']['power'] > result['actor_1']['power']
+
+def test_validate_with_apimpowerr_is_native():
+    validation = K01PowerAnalysis().validate_with_apimpowerr()
+    # config ORs convert to d = 0.1855 / 0.2591, just below the rounded APIMPowerR inputs
+    assert validation['actor_power_r'] == pytest.approx(0.346, abs=0.005)
+    assert validation['partner_power_r'] == pytest.approx(0.538, abs=0.005)
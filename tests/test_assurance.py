@@ -0,0 +1,70 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import assurance
+import config
+import power_engine
+from power_cache import PowerCache
+from k01_power_analysis import K01PowerAnalysis
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_nodes_integrate_prior_moments():
+    priors = {'p': {'distribution': 'beta', 'a': 10, 'b': 90}, 'icc': {'distribution': 'uniform', 'loc': 0.1, 'scale': 0.4}}
+    for method in assurance.METHODS:
+        values, weights = assurance.prior_nodes(priors, method, n_nodes=24, n_samples=8192, seed=0)
+        assert weights.sum() == pytest.approx(1)
+        assert weights @ values['p'] == pytest.approx(0.1, abs=1e-4)
+        assert weights @ values['icc'] == pytest.approx(0.3, abs=1e-4)
+    with pytest.raises(ValueError):
+        assurance.prior_nodes({'p': {'distribution': 'nonsense'}})
+
+def test_quadrature_matches_qmc_and_monte_carlo(analysis):
+    quadrature = analysis.aim1_assurance()
+    qmc = analysis.aim1_assurance(method='qmc')
+    draws = np.random.default_rng(1).beta(10, 90, 200_000)
+    monte_carlo = power_engine.two_sample_proportion_power(237, 50000, draws, 0.06, 0.1, 1.5)['power'].mean()
+    assert quadrature['assurance'] == pytest.approx(qmc['assurance'], abs=1e-4)
+    assert quadrature['assurance'] == pytest.approx(monte_carlo, abs=3e-3)
+    # Uncertainty about the effect pulls expected power below the point power
+    assert quadrature['assurance'] < quadrature['power']
+
+def test_narrow_prior_reduces_to_point_power(analysis):
+    priors = {'icc_partners': {'distribution': 'norm', 'loc': 0.3, 'scale': 1e-6}}
+    result = analysis.aim3_assurance(priors=priors)
+    assert result['actor_assurance'] == pytest.approx(result['actor_power'], abs=1e-6)
+    assert result['partner_assurance'] == pytest.approx(result['partner_power'], abs=1e-6)
+    with pytest.raises(ValueError):
+        analysis.aim3_assurance(priors={'not_a_parameter': priors['icc_partners']})
+
+def test_priors_on_design_choices_are_rejected(analysis):
+    # n and alpha are fixed by the design; a prior on them used to be silently ignored
+    beta = {'distribution': 'beta', 'a': 2, 'b': 20}
+    with pytest.raises(ValueError, match='alpha'):
+        analysis.aim1_assurance(priors={'alpha': beta})
+    with pytest.raises(ValueError, match='n_south_asian'):
+        analysis.aim1_assurance(priors={'n_south_asian': beta})
+    with pytest.raises(ValueError, match='n_couples'):
+        analysis.aim3_assurance(priors={'n_couples': beta})
+
+def test_assurance_curve_matches_pointwise_calls(analysis):
+    n = np.array([100, 200, 237, 400, 800])
+    curve = analysis.aim1_assurance(n)
+    assert curve['assurance'].shape == n.shape
+    assert np.all(np.diff(curve['assurance']) > 0)
+    for i, k in enumerate(n):
+        assert analysis.aim1_assurance(int(k))['assurance'] == pytest.approx(curve['assurance'][i], abs=1e-12)
+
+def test_assurance_config_is_part_of_the_cache_key(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite')
+    default = K01PowerAnalysis(cache=PowerCache(path)).aim1_assurance()
+    wide = {'ipv_p_south_asian': {'distribution': 'beta', 'a': 2, 'b': 18}}
+    monkeypatch.setitem(config.assurance_priors, 'aim1', wide)
+    analysis = K01PowerAnalysis(cache=PowerCache(path))
+    assert analysis.aim1_assurance()['assurance'] != pytest.approx(default['assurance'])
+    monkeypatch.setitem(config.assurance_params, 'n_nodes', 8)
+    analysis.aim1_assurance()
+    assert analysis.cache.hits == 0
@@ -0,0 +1,74 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import contextlib
+import io
+import json
+import pytest
+import batch_runner
+import config
+from k01_power_analysis import K01PowerAnalysis
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+@pytest.fixture
+def scenario_file(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.simulation_params, 'multiplicity_reps', 50_000)
+    path = tmp_path / 'scenarios.jsonl'
+    lines = [
+        {'name': 'base'},
+        {'name': 'icc05', 'aim3': {'icc_partners': 0.5}},
+        {'name': 'n300', 'aim1': {'n_south_asian': 300}},
+        {'name': 'n300_icc05', 'aim1': {'n_south_asian': 300}, 'aim3': {'icc_partners': 0.5}},
+    ]
+    path.write_text('\n'.join(json.dumps(line) for line in lines) + '\n')
+    return path
+
+def test_shared_calls_are_computed_once(scenario_file):
+    scenarios = batch_runner.read_scenarios(scenario_file)
+    calls, dependencies = batch_runner.build_graph(scenarios)
+    # Observed and target OR at alpha 0.1 and 0.05 for each of the two Aim 1 designs
+    assert len(calls['two_sample']) == 8
+    assert len(calls['multiplicity']) == 2 and len(calls['dyadic']) == 2
+    assert dependencies['base']['multiplicity'] == dependencies['icc05']['multiplicity']
+    assert dependencies['base']['aim3'] == dependencies['n300']['aim3']
+    # At alpha 0.05 the scenario's own two calls at the observed OR coincide
+    scenarios[0]['aim1_params']['alpha'] = 0.05
+    _, dependencies = batch_runner.build_graph(scenarios[:1])
+    assert dependencies['base']['aim1'] == dependencies['base']['aim1_05']
+
+def test_summaries_match_the_single_scenario_path(scenario_file, analysis, tmp_path):
+    result = batch_runner.run_batch(batch_runner.read_scenarios(scenario_file), str(tmp_path / 'out'), n_jobs=2)
+    assert result['n_calls'] == 24 and result['n_unique'] == 12
+
+    analysis.aim3_params['icc_partners'] = 0.5
+    params = analysis.aim1_params
+    p_target = params['target_or'] * params['ipv_p_others'] / (1 + (params['target_or'] - 1) * params['ipv_p_others'])
+    power = lambda p, alpha: analysis.two_sample_proportion_power(
+        params['n_south_asian'], params['n_others'], p, params['ipv_p_others'], alpha, params['design_effect'])
+    joint = analysis.multiplicity_power(n_jobs=1)
+    aim1 = {'observed_OR': power(params['ipv_p_south_asian'], 0.1)['observed_OR'],
+            'power_unadjusted': power(params['ipv_p_south_asian'], 0.1)['power'],
+            'power_05': power(params['ipv_p_south_asian'], 0.05)['power'],
+            'power_fdr': joint['bh']['outcome_power'][0]}
+    target = {'target_or': params['target_or'], 'power_01': power(p_target, 0.1)['power'],
+              'power_05': power(p_target, 0.05)['power']}
+    aim3 = analysis.dyadic_power_apim(200, 0.2, 1.4, 1.6, 0.5, 0.1)
+    expected = io.StringIO()
+    with contextlib.redirect_stdout(expected):
+        analysis.write_grant_ready_summary(aim1, target, aim3)
+
+    assert result['scenarios']['icc05']['summary'] == expected.getvalue()
+    assert (tmp_path / 'out' / 'icc05.txt').read_text() == expected.getvalue()
+    csv = (tmp_path / 'out' / 'scenarios.csv').read_text().splitlines()
+    assert csv[0].startswith('name,power_unadjusted') and len(csv) == 5
+
+def test_rejects_unknown_parameters_and_duplicate_names(tmp_path):
+    path = tmp_path / 'bad.jsonl'
+    path.write_text('{"name": "a", "aim1": {"n_southasian": 300}}\n')
+    with pytest.raises(ValueError, match='aim1.n_southasian'):
+        batch_runner.read_scenarios(path)
+    path.write_text('{"name": "a"}\n{"name": "a"}\n')
+    with pytest.raises(ValueError, match='duplicate'):
+        batch_runner.read_scenarios(path)
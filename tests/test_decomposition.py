@@ -0,0 +1,66 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from scipy import special
+import decomposition
+import simulation
+import config
+from power_cache import PowerCache
+from k01_power_analysis import K01PowerAnalysis
+
+COVARIATES = config.aim1_decomposition['covariates']
+
+def test_calibrated_model_reproduces_rates():
+    model = decomposition.calibrate(COVARIATES, 0.10, 0.06)
+    n_cells = model['design'].shape[0]
+    for cells, rate in ((model['cells_south_asian'], 0.10), (model['cells_others'], 0.06)):
+        assert cells.sum() == pytest.approx(1)
+        assert cells[:n_cells].sum() == pytest.approx(rate)
+    assert model['explained'] + model['unexplained'] == pytest.approx(model['gap'])
+    # Expected counts of a very large sample recover the true components
+    components = decomposition.fairlie_components(model['cells_south_asian'] * 1e7, model['cells_others'] * 1e7,
+                                                  model['design'])
+    for name in decomposition.COMPONENTS:
+        assert components[name] == pytest.approx(model[name], abs=1e-8)
+
+def test_cell_counts_match_individual_level_decomposition():
+    model = decomposition.calibrate(COVARIATES, 0.10, 0.06)
+    rng = np.random.default_rng(2)
+    design = model['design']
+    n_cells = design.shape[0]
+    sa = rng.multinomial(150, model['cells_south_asian'])
+    others = rng.multinomial(3000, model['cells_others'])
+    components = decomposition.fairlie_components(sa, others, design)
+
+    def individuals(counts):
+        cell = np.repeat(np.arange(2 * n_cells), counts)
+        return design[cell % n_cells], (cell < n_cells).astype(float)
+    X_sa, y_sa = individuals(sa)
+    X_o, y_o = individuals(others)
+    coef = simulation.batched_logistic_irls(X_o, y_o[None])['coef'][0]
+    explained = special.expit(X_sa @ coef).mean() - special.expit(X_o @ coef).mean()
+    assert components['explained'] == pytest.approx(explained, abs=1e-10)
+    assert components['unexplained'] == pytest.approx(y_sa.mean() - special.expit(X_sa @ coef).mean(), abs=1e-10)
+
+def test_power_is_reproducible_and_holds_size():
+    kwargs = dict(n_reps=60, n_bootstrap=50, seed=4, chunk_size=20)
+    inline = decomposition.simulate_decomposition_power(COVARIATES, 0.10, 0.06, 237, 5000, 1.5, 0.1, n_jobs=1, **kwargs)
+    pooled = decomposition.simulate_decomposition_power(COVARIATES, 0.10, 0.06, 237, 5000, 1.5, 0.1, n_jobs=2, **kwargs)
+    assert inline == pooled
+    # Same covariate distribution in both groups: nothing to explain
+    same = {name: {**spec, 'p_south_asian': spec['p_others']} for name, spec in COVARIATES.items()}
+    null = decomposition.simulate_decomposition_power(same, 0.10, 0.06, 237, 5000, 1.5, 0.1, n_reps=500,
+                                                      n_bootstrap=100, seed=5, n_jobs=1)
+    assert null['explained'] == pytest.approx(0, abs=1e-12)
+    assert null['explained_power'] == pytest.approx(0.1, abs=0.05)
+
+def test_covariates_are_part_of_the_cache_key(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite')
+    kwargs = dict(n_reps=20, n_bootstrap=20, n_jobs=1)
+    default = K01PowerAnalysis(cache=PowerCache(path)).decomposition_power(**kwargs)
+    same = {name: {**spec, 'p_south_asian': spec['p_others']} for name, spec in COVARIATES.items()}
+    monkeypatch.setitem(config.aim1_decomposition, 'covariates', same)
+    analysis = K01PowerAnalysis(cache=PowerCache(path))
+    assert analysis.decomposition_power(**kwargs)['explained'] != pytest.approx(default['explained'])
+    assert analysis.cache.hits == 0
@@ -0,0 +1,44 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from scipy.stats import fisher_exact
+import exact_power
+from k01_power_analysis import K01PowerAnalysis
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_score_power_matches_monte_carlo():
+    rng = np.random.default_rng(0)
+    n1, n2, p1, p2, alpha = 158, 5000, 0.1, 0.06, 0.1
+    x1 = rng.binomial(n1, p1, 400_000).astype(float)
+    x2 = rng.binomial(n2, p2, 400_000).astype(float)
+    pooled = (x1 + x2) / (n1 + n2)
+    z = (x1 / n1 - x2 / n2) / np.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+    simulated = np.mean(np.abs(z) >= 1.6448536269514722)
+    result = exact_power.exact_power(n1, n2, p1, p2, alpha, test='score')
+    assert result['power'] == pytest.approx(simulated, abs=0.003)
+
+def test_fisher_pvalues_and_conservative_size():
+    n1, n2 = 158, 33333
+    for a, b in [(5, 300), (20, 2000), (30, 1900), (16, 2000)]:
+        table = [[a, n1 - a], [b, n2 - b]]
+        one_sided = min(fisher_exact(table, alternative='less')[1], fisher_exact(table, alternative='greater')[1])
+        assert exact_power.fisher_pvalues(n1, n2, a, b) == pytest.approx(min(1, 2 * one_sided), rel=1e-8)
+    fisher = exact_power.exact_power(237, 50000, [0.08, 0.1, 0.12], 0.06, 0.1, 1.5, test='fisher')
+    score = exact_power.exact_power(237, 50000, [0.08, 0.1, 0.12], 0.06, 0.1, 1.5, test='score')
+    assert fisher['size'] <= 0.1
+    assert np.all(fisher['power'] <= score['power'])
+
+def test_exact_curve_matches_pointwise_and_reports_error(analysis):
+    curve = analysis.exact_power_curve()
+    assert curve['size'] == pytest.approx(0.1, abs=0.02)
+    assert np.all(np.diff(curve['power']) > 0)
+    for i in (0, 10, 20):
+        point = analysis.exact_power_curve(odds_ratios=[curve['odds_ratio'][i]])
+        assert point['power'][0] == pytest.approx(curve['power'][i], abs=1e-12)
+    np.testing.assert_allclose(curve['approx_error'], curve['approx_power'] - curve['power'])
+    with pytest.raises(ValueError):
+        analysis.exact_power_curve(test='boschloo')
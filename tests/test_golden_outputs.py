@@ -0,0 +1,39 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from k01_power_analysis import K01PowerAnalysis
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Checked-in CSV -> (power_curves key per column)
+GOLDEN = {
+    'aim1_power_vs_or.csv': {'OR': 'or_range', 'power_alpha_0.1': 'aim1_power_01',
+                             'power_alpha_0.05': 'aim1_power_05'},
+    'aim1_power_vs_n.csv': {'n': 'n_range', 'power': 'aim1_power_vs_n'},
+    'aim3_power_vs_or.csv': {'OR': 'or_range', 'actor_power': 'aim3_actor_vs_or',
+                             'partner_power': 'aim3_partner_vs_or'},
+    'aim3_power_vs_n.csv': {'n_couples': 'couples_range', 'actor_power': 'aim3_actor_vs_n',
+                            'partner_power': 'aim3_partner_vs_n'},
+}
+
+@pytest.fixture(scope='module')
+def curves():
+    return K01PowerAnalysis().power_curves()
+
+@pytest.mark.parametrize('filename', sorted(GOLDEN))
+def test_power_curves_match_published_csv(curves, filename):
+    golden = pd.read_csv(os.path.join(ROOT, filename), float_precision='round_trip')
+    assert list(golden.columns) == list(GOLDEN[filename])
+    for column, key in GOLDEN[filename].items():
+        np.testing.assert_allclose(curves[key], golden[column], rtol=0, atol=1e-12, err_msg=f"{filename}:{column}")
+
+def test_create_power_vs_or_plots_reproduces_csv_files(tmp_path, monkeypatch):
+    monkeypatch.setenv('MPLBACKEND', 'Agg')
+    monkeypatch.chdir(tmp_path)
+    K01PowerAnalysis().create_power_vs_or_plots()
+    for filename in GOLDEN:
+        ours = pd.read_csv(tmp_path / filename, float_precision='round_trip')
+        golden = pd.read_csv(os.path.join(ROOT, filename), float_precision='round_trip')
+        pd.testing.assert_frame_equal(ours, golden, check_exact=False, rtol=0, atol=1e-12)
@@ -0,0 +1,14 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+import import_time
+
+def test_compute_core_imports_without_plotting_stack():
+    for module in ('power_engine', 'k01_power_analysis'):
+        assert import_time.measure(module, repeat=1)['heavy'] == []
+    assert 'matplotlib' in import_time.measure('plotting', repeat=1)['heavy']
+
+def test_compute_core_imports_faster_than_plotting():
+    core = import_time.measure('k01_power_analysis', repeat=3)
+    plotting = import_time.measure('plotting', repeat=3)
+    assert core['seconds'] < plotting['seconds']
@@ -0,0 +1,45 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pytest
+import instrumentation
+import power_engine
+from k01_power_analysis import K01PowerAnalysis
+from power_cache import PowerCache
+import config
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis(cache=PowerCache())
+
+def test_nothing_is_recorded_unless_enabled(analysis):
+    assert instrumentation.active() is None
+    analysis.dyadic_power_apim(200, 0.2, 1.4, 1.6, 0.3, 0.1)
+    assert instrumentation.active() is None
+
+def test_records_timings_cache_fallbacks_and_iterations(analysis, tmp_path):
+    params = config.aim1_params
+    with instrumentation.instrumented() as record:
+        for _ in range(2):
+            analysis.two_sample_proportion_power(237, 50000, 0.10, 0.06, 0.1, 1.5)
+        analysis.min_detectable_OR(237, 50000, 0.06, 0.8, 0.1, 1.5)
+        # n_harmonic <= 1 forces the normal fallback for one of two points
+        power_engine.two_sample_proportion_power([0.6, 237], 50000, 0.10, 0.06, 0.1, 1.5)
+        with instrumentation.stage('sweep'):
+            analysis.run_sweep('aim1', grid={'n_south_asian': [150, 237]}, n_jobs=1)
+    assert instrumentation.active() is None
+
+    assert record.timings['two_sample_proportion_power']['calls'] == 2
+    assert record.timings['sweep']['seconds'] >= record.timings['run_sweep']['seconds']
+    assert record.counters['cache.two_sample_proportion_power.miss'] == 1
+    assert record.counters['cache.two_sample_proportion_power.hit'] == 1
+    assert record.counters['two_sample_proportion_power.fallback'] == 1
+    assert record.counters['min_detectable_effect_size.iterations'] > 0
+    assert record.counters['min_detectable_effect_size.not_converged'] == 0
+
+    exported = json.loads(record.to_json(tmp_path / 'record.json'))
+    assert exported == json.loads((tmp_path / 'record.json').read_text())
+    assert exported['counters']['two_sample_proportion_power.fallback'] == 1
+    summary = record.summary()
+    assert 'run_sweep' in summary and 'two_sample_proportion_power.fallback' in summary
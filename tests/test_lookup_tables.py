@@ -0,0 +1,70 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from scipy import special
+import lookup_tables
+import power_engine
+from k01_power_analysis import K01PowerAnalysis
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_refine_meets_tolerance_between_nodes():
+    func = lambda x, y: np.sin(3 * x) * np.exp(y)
+    (xs, ys), values, errors = lookup_tables.refine(func, [(0, 2, 4), (0, 1, 2)], 1e-4)
+    assert max(errors) <= 0.5e-4 and values.shape == (len(xs), len(ys))
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(0, 2, 10_000), rng.uniform(0, 1, 10_000)
+    i, wx = lookup_tables._locate(xs, x)
+    j, wy = lookup_tables._locate(ys, y)
+    interpolated = ((1 - wx) * ((1 - wy) * values[i, j] + wy * values[i, j + 1])
+                    + wx * ((1 - wy) * values[i + 1, j] + wy * values[i + 1, j + 1]))
+    assert np.abs(interpolated - func(x, y)).max() <= 1e-4
+
+def test_tabulated_power_and_critical_values_within_tolerance():
+    rng = np.random.default_rng(1)
+    ncp, df = rng.uniform(-12, 12, 20_000), rng.uniform(20, 5000, 20_000)
+    exact_power = power_engine.noncentral_t_power(ncp, df, 0.05)
+    exact_crit = power_engine.critical_t(0.05, df)
+    with lookup_tables.tabulated(alphas=[0.05], tolerance=1e-5) as tables:
+        assert lookup_tables.active() is tables
+        power = power_engine.noncentral_t_power(ncp, df, 0.05)
+        crit = power_engine.critical_t(0.05, df)
+        z = tables.critical_value([0.05, 0.1], sides=1)
+    assert lookup_tables.active() is None
+    assert np.abs(power - exact_power).max() <= 1e-5
+    assert np.abs(crit - exact_crit).max() <= 1e-5
+    np.testing.assert_allclose(z, special.ndtri([0.95, 0.9]), atol=1e-12)
+
+def test_outside_the_tables_is_exact():
+    ncp = np.array([1.0, 2.0, 15.0, np.nan, 2.5])
+    df = np.array([10.0, 100.0, 100.0, 100.0, 100.0])
+    alpha = np.array([0.05, 0.02, 0.05, 0.05, 0.05])
+    exact = power_engine.noncentral_t_power(ncp, df, alpha)
+    with lookup_tables.tabulated(alphas=[0.05], tolerance=1e-4):
+        power = power_engine.noncentral_t_power(ncp, df, alpha)
+    np.testing.assert_array_equal(power[:4], exact[:4])
+    assert power[4] != exact[4] and abs(power[4] - exact[4]) <= 1e-4
+
+def test_engine_results_and_cache_keys_with_tables(analysis):
+    n = np.arange(100, 1000, 50)[:, None]
+    exact = power_engine.two_sample_proportion_power(n, 33000, 0.10, 0.06, [0.05, 0.1], 1.5)['power']
+    assert analysis._cache_context()['lookup_tables'] is None
+    with lookup_tables.tabulated(alphas=[0.05, 0.1], tolerance=1e-5):
+        power = power_engine.two_sample_proportion_power(n, 33000, 0.10, 0.06, [0.05, 0.1], 1.5)['power']
+        assert analysis._cache_context()['lookup_tables']['tolerance'] == 1e-5
+    assert np.abs(power - exact).max() <= 1e-5
+
+def test_main_restores_global_state_when_a_stage_fails(tmp_path, monkeypatch):
+    import instrumentation
+    import k01_power_analysis
+    monkeypatch.chdir(tmp_path)
+    def fail(self):
+        assert lookup_tables.active() is not None and instrumentation.active() is not None
+        raise RuntimeError('stage failed')
+    monkeypatch.setattr(K01PowerAnalysis, 'consultation_question_target_or_power', fail)
+    with pytest.raises(RuntimeError, match='stage failed'):
+        k01_power_analysis.main(instrument=True, lookup=True)
+    assert lookup_tables.active() is None and instrumentation.active() is None
@@ -0,0 +1,64 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from statsmodels.stats.multitest import multipletests
+import config
+import multiplicity
+import power_engine
+from power_cache import PowerCache
+from k01_power_analysis import K01PowerAnalysis
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_rejections_match_statsmodels():
+    rng = np.random.default_rng(0)
+    p = rng.random((60, 4)) ** 3
+    for method, name in [('bonferroni', 'bonferroni'), ('holm', 'holm'), ('bh', 'fdr_bh')]:
+        rejected = multiplicity.reject(p, 0.1, method)
+        expected = np.array([multipletests(row, alpha=0.1, method=name)[0] for row in p])
+        np.testing.assert_array_equal(rejected, expected)
+
+def test_simulation_matches_closed_forms():
+    ncp = np.array([2.5, 0.0, 1.0])
+    result = multiplicity.simulate_multiplicity_power(
+        ncp, multiplicity.equicorrelation(3, 0.0), 0.1, n_reps=400_000, seed=1, n_jobs=1
+    )
+    np.testing.assert_allclose(result['unadjusted']['outcome_power'], power_engine.normal_power(ncp, 0.1), atol=0.003)
+    np.testing.assert_allclose(result['bonferroni']['outcome_power'], power_engine.normal_power(ncp, 0.1 / 3),
+                               atol=0.003)
+    # Independent outcomes: the all-outcome power is the product of the marginals
+    assert result['unadjusted']['all_power'] == pytest.approx(np.prod(power_engine.normal_power(ncp, 0.1)), abs=0.003)
+    # Holm and BH are uniformly more powerful than Bonferroni
+    bonferroni = result['bonferroni']['outcome_power']
+    assert np.all(result['holm']['outcome_power'] >= bonferroni)
+    assert np.all(result['bh']['outcome_power'] >= result['holm']['outcome_power'])
+
+def test_simulation_is_reproducible_across_workers():
+    kwargs = dict(ncp=[2.0, 1.5], correlation=multiplicity.equicorrelation(2, 0.5), alpha=0.05,
+                  n_reps=30_000, seed=3, chunk_size=10_000)
+    inline = multiplicity.simulate_multiplicity_power(n_jobs=1, **kwargs)
+    pooled = multiplicity.simulate_multiplicity_power(n_jobs=2, **kwargs)
+    for method in multiplicity.METHODS:
+        np.testing.assert_array_equal(inline[method]['outcome_power'], pooled[method]['outcome_power'])
+    with pytest.raises(ValueError):
+        multiplicity.simulate_multiplicity_power([1.0, 1.0], [[1, 2], [2, 1]])
+
+def test_aim1_fdr_power_is_adjusted(analysis):
+    joint = analysis.multiplicity_power(n_reps=200_000)
+    unadjusted = analysis.two_sample_proportion_power(237, 50000, 0.10, 0.06, 0.1, 1.5)['power']
+    ipv = joint['outcomes'].index('ipv')
+    assert joint['unadjusted']['outcome_power'][ipv] == pytest.approx(unadjusted, abs=0.005)
+    assert joint['bonferroni']['outcome_power'][ipv] < joint['bh']['outcome_power'][ipv] < unadjusted
+
+def test_outcome_config_is_part_of_the_cache_key(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite')
+    first = K01PowerAnalysis(cache=PowerCache(path)).multiplicity_power(n_reps=20_000, n_jobs=1)
+    monkeypatch.setitem(config.aim1_outcomes, 'outcome_correlation', 0.9)
+    analysis = K01PowerAnalysis(cache=PowerCache(path))
+    correlated = analysis.multiplicity_power(n_reps=20_000, n_jobs=1)
+    assert analysis.cache.hits == 0
+    ipv = first['outcomes'].index('ipv')
+    assert correlated['bh']['outcome_power'][ipv] != first['bh']['outcome_power'][ipv]
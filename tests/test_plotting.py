@@ -0,0 +1,60 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import gc
+import numpy as np
+import pytest
+from PIL import Image
+import plotting
+from k01_power_analysis import K01PowerAnalysis
+import config
+
+@pytest.fixture(scope='module')
+def specs():
+    curves = K01PowerAnalysis().power_curves()
+    return plotting.power_panel_specs(curves, config.aim1_params, config.aim3_params)
+
+def test_unchanged_panels_come_from_cache(specs, tmp_path):
+    cache_dir = str(tmp_path / 'figures')
+    first = plotting.render_batch([(specs, str(tmp_path / 'a.png'))], dpi=40, cache_dir=cache_dir, n_jobs=1)[0]
+    assert (first['rendered'], first['cached']) == (4, 0)
+    with Image.open(first['path']) as image:
+        assert image.size == (16 * 40, 12 * 40)
+
+    # Changing one curve re-renders only its panel
+    changed = [dict(spec) for spec in specs]
+    changed[1] = dict(changed[1], title='Aim 1: Power vs Sample Size (revised)')
+    second = plotting.render_batch([(changed, str(tmp_path / 'b.png'))], dpi=40, cache_dir=cache_dir, n_jobs=1)[0]
+    assert (second['rendered'], second['cached']) == (1, 3)
+    assert len(os.listdir(cache_dir)) == 5 + 2  # panels plus one tiled figure each
+
+def test_cache_is_pruned_to_its_cap_keeping_the_current_batch(specs, tmp_path):
+    cache_dir = str(tmp_path / 'figures')
+    plotting.render_batch([(specs, str(tmp_path / 'a.png'))], dpi=20, cache_dir=cache_dir, n_jobs=1)
+    changed = [dict(spec, title=f'Revised {i}') for i, spec in enumerate(specs)]
+    result = plotting.render_batch([(changed, str(tmp_path / 'b.png'))], dpi=20, cache_dir=cache_dir, n_jobs=1,
+                                   max_cache_mb=0)[0]
+    # Only the four revised panels and their tiled figure are left
+    assert result['rendered'] == 4 and len(os.listdir(cache_dir)) == 5
+    again = plotting.render_batch([(changed, str(tmp_path / 'c.png'))], dpi=20, cache_dir=cache_dir, n_jobs=1,
+                                  max_cache_mb=0)[0]
+    assert again['cached'] == 4
+
+def test_batch_rendering_does_not_leak_figures(specs, tmp_path):
+    import matplotlib.pyplot as plt
+    open_before = len(plt.get_fignums())
+    figures = []
+    for i in range(6):
+        scenario = [dict(spec, title=f'Scenario {i}') for spec in specs]
+        figures.append((scenario, str(tmp_path / f'scenario_{i}.png')))
+    results = plotting.render_batch(figures, dpi=20, cache_dir=str(tmp_path / 'cache'), n_jobs=2)
+    assert [r['rendered'] for r in results] == [4] * 6
+    assert all(os.path.exists(r['path']) for r in results)
+    gc.collect()
+    assert len(plt.get_fignums()) == open_before
+
+def test_create_power_vs_or_plots_is_headless(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(config.render_params, 'dpi', 30)
+    K01PowerAnalysis().create_power_vs_or_plots()
+    assert os.path.exists(tmp_path / 'k01_comprehensive_power_analysis.png')
+    assert os.path.exists(tmp_path / config.render_params['cache_dir'])
@@ -0,0 +1,86 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pickle
+import numpy as np
+import pytest
+from power_cache import PowerCache, cache_key, cached
+from k01_power_analysis import K01PowerAnalysis
+
+def test_cache_key_is_canonical():
+    assert cache_key('f', 1, {'n': 200, 'p': 0.1}) == cache_key('f', 1, {'p': 0.1, 'n': np.float64(200.0)})
+    assert cache_key('f', 1, {'n': np.arange(3)}) == cache_key('f', 1, {'n': np.array([0.0, 1.0, 2.0])})
+    assert cache_key('f', 1, {'n': 200}) != cache_key('f', 2, {'n': 200})
+    assert cache_key('f', 1, {'n': 200}) != cache_key('f', 1, {'n': 201})
+
+def test_memory_lru_evicts_oldest():
+    cache = PowerCache(max_memory_items=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+
+def test_disk_store_persists_and_is_bounded(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = PowerCache(path, max_disk_mb=0.01)
+    for i in range(10):
+        cache.put(f'k{i}', np.zeros(200) + i)
+    assert cache.disk_usage() <= 0.01 * 2 ** 20
+    cache.close()
+    reopened = PowerCache(path, max_disk_mb=0.01)
+    hit, value = reopened.get('k9')
+    assert hit and value[0] == 9
+    assert reopened.get('k0') == (False, None)
+
+def test_cached_method_hits_and_copies(tmp_path):
+    analysis = K01PowerAnalysis(cache=PowerCache(str(tmp_path / 'cache.sqlite')))
+    first = analysis.two_sample_proportion_power(237, 50000, 0.10, 0.06, 0.1, 1.5)
+    first['power'] = -1
+    second = analysis.two_sample_proportion_power(237.0, 50000, 0.10, 0.06, 0.1, 1.5)
+    assert second['power'] == pytest.approx(0.8376, abs=1e-3)
+    assert analysis.cache.hits == 1 and analysis.cache.misses == 1
+    # A fresh process-equivalent cache reads the disk store
+    fresh = K01PowerAnalysis(cache=PowerCache(str(tmp_path / 'cache.sqlite')))
+    fresh.two_sample_proportion_power(237, 50000, 0.10, 0.06, 0.1, 1.5)
+    assert fresh.cache.hits == 1
+
+def test_study_parameters_are_part_of_the_key():
+    analysis = K01PowerAnalysis(cache=PowerCache())
+    default = analysis.required_n_couples()
+    surface = analysis.min_detectable_OR_grid(n1=[100, 200])
+    analysis.aim1_params['design_effect'] = 2.0
+    assert analysis.min_detectable_OR_grid(n1=[100, 200])['min_OR'][0] > surface['min_OR'][0]
+    assert analysis.cache.hits == 0
+    assert default['n_couples'] > 0
+
+def test_version_bump_purges_stale_entries(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+
+    class Model:
+        def __init__(self, cache):
+            self.cache = cache
+            self.calls = 0
+
+        @cached('square', version=1)
+        def square(self, x):
+            self.calls += 1
+            return x * x
+
+    old = Model(PowerCache(path))
+    old.square(3)
+    old.square(3)
+    assert old.calls == 1
+
+    class NewModel(Model):
+        @cached('square', version=2)
+        def square(self, x):
+            self.calls += 1
+            return x * x
+
+    new = NewModel(PowerCache(path))
+    assert new.square(3) == 9
+    assert new.calls == 1
+    # Only the version 2 entry remains on disk
+    assert new.cache.disk_usage() == len(pickle.dumps(9, protocol=pickle.HIGHEST_PROTOCOL))
@@ -0,0 +1,126 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import statsmodels.stats.power as smp
+import power_engine
+from k01_power_analysis import K01PowerAnalysis
+import config
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_ttest_power_matches_statsmodels():
+    effect = np.array([0.0, 0.05, 0.2, -0.3, 0.6])
+    nobs = np.array([[40.0], [158.0], [307.7]])
+    power = power_engine.ttest_power(effect, nobs, 0.1)
+    assert power.shape == (3, 5)
+    for i, n in enumerate(nobs[:, 0]):
+        for j, d in enumerate(effect):
+            assert power[i, j] == pytest.approx(smp.ttest_power(d, n, 0.1, alternative='two-sided'), abs=1e-12)
+
+def test_two_sample_batch_matches_scalar(analysis):
+    params = config.aim1_params
+    n_range = np.arange(100, 500, 25)
+    batch = analysis.two_sample_proportion_power_batch(
+        n_range[:, None], params['n_others'],
+        params['ipv_p_south_asian'], params['ipv_p_others'],
+        np.array([0.05, 0.1]), params['design_effect']
+    )
+    assert batch['power'].shape == (len(n_range), 2)
+    for i, n in enumerate(n_range):
+        for j, alpha in enumerate([0.05, 0.1]):
+            scalar = analysis.two_sample_proportion_power(
+                n, params['n_others'], params['ipv_p_south_asian'], params['ipv_p_others'],
+                alpha, params['design_effect']
+            )
+            assert batch['power'][i, j] == pytest.approx(scalar['power'], abs=1e-12)
+            assert batch['n1_effective'][i, j] == pytest.approx(scalar['n1_effective'])
+
+def test_dyadic_batch_broadcasts_over_or_and_icc(analysis):
+    params = config.aim3_params
+    ors = np.array([1.2, 1.4, 1.6])
+    iccs = np.array([[0.1], [0.3], [0.5]])
+    batch = analysis.dyadic_power_apim_batch(
+        params['n_couples'], params['baseline_ipv_rate'], ors, ors, iccs, params['alpha']
+    )
+    assert batch['actor_power'].shape == (3, 3)
+    scalar = analysis.dyadic_power_apim(
+        params['n_couples'], params['baseline_ipv_rate'], 1.4, 1.6, 0.3, params['alpha']
+    )
+    assert batch['actor_power'][1, 1] == pytest.approx(scalar['actor_power'], abs=1e-12)
+    assert batch['partner_power'][1, 2] == pytest.approx(scalar['partner_power'], abs=1e-12)
+    # Power decreases with ICC at fixed OR
+    assert np.all(np.diff(batch['actor_power'], axis=0) < 0)
+
+def test_fallback_is_per_element():
+    # n_harmonic <= 1 leaves the t-test undefined for the first element only
+    result = power_engine.two_sample_proportion_power([0.6, 237], 50000, 0.10, 0.06, 0.1, 1.5)
+    assert result['fallback'].tolist() == [True, False]
+    assert np.all(np.isfinite(result['power']))
+    assert 0 <= result['power'][0] <= 1
+
+def test_min_detectable_OR_matches_power_target(analysis):
+    params = config.aim1_params
+    min_OR = analysis.min_detectable_OR(
+        params['n_south_asian'], params['n_others'], params['ipv_p_others'],
+        power=0.8, alpha=params['alpha'], design_effect=params['design_effect']
+    )
+    assert min_OR == pytest.approx(1.6943436, rel=1e-6)
+    p_sa = power_engine.or_to_proportion(min_OR, params['ipv_p_others'])
+    achieved = analysis.two_sample_proportion_power(
+        params['n_south_asian'], params['n_others'], p_sa, params['ipv_p_others'],
+        params['alpha'], params['design_effect']
+    )
+    assert achieved['power'] == pytest.approx(0.8, abs=1e-8)
+
+def test_min_detectable_OR_grid_surface(analysis):
+    n_grid = np.arange(100, 500, 50)
+    alphas = [0.05, 0.1]
+    surface = analysis.min_detectable_OR_grid(n1=n_grid, alpha=alphas, design_effect=[1.0, 1.5, 2.0])
+    assert surface['dims'] == ['n1', 'alpha', 'design_effect']
+    assert surface['min_OR'].shape == (len(n_grid), 2, 3)
+    assert surface['converged'].all()
+    # Larger samples, looser alpha and smaller design effects detect smaller ORs
+    assert np.all(np.diff(surface['min_OR'], axis=0) < 0)
+    assert np.all(surface['min_OR'][:, 1, :] < surface['min_OR'][:, 0, :])
+    assert np.all(np.diff(surface['min_OR'], axis=2) > 0)
+    assert surface['min_OR'][2, 1, 1] == pytest.approx(
+        analysis.min_detectable_OR(200, config.aim1_params['n_others'], config.aim1_params['ipv_p_others'],
+                                   alpha=0.1, design_effect=1.5)
+    )
+
+def test_min_detectable_effect_size_flags_unsolvable_points():
+    result = power_engine.min_detectable_effect_size([158.0, 158.0, 1.0], [0.8, 0.05, 0.8], 0.1)
+    assert result['converged'].tolist() == [True, False, False]
+    assert np.isnan(result['effect_size'][1:]).all()
+    normal = power_engine.min_detectable_effect_size(158.0, 0.8, 0.1, method='normal')
+    assert normal['effect_size'] == pytest.approx(result['effect_size'][0], rel=1e-2)
+
+def test_required_n_south_asian_is_smallest_integer(analysis):
+    ors = np.array([1.5, 1.74, 2.0])
+    result = analysis.required_n_south_asian(OR=ors)
+    assert result['achievable'].all()
+    assert np.all(result['power'] >= 0.8)
+    p_sa = power_engine.or_to_proportion(ors, config.aim1_params['ipv_p_others'])
+    below = analysis.two_sample_proportion_power_batch(
+        result['n'] - 1, config.aim1_params['n_others'], p_sa, config.aim1_params['ipv_p_others'],
+        config.aim1_params['alpha'], config.aim1_params['design_effect']
+    )['power']
+    assert np.all(below < 0.8)
+    # Too small a comparison group can never reach the target
+    capped = analysis.required_n_south_asian(OR=1.15, n_others=200)
+    assert not capped['achievable'] and np.isnan(capped['n'])
+
+def test_required_n_couples_over_icc(analysis):
+    iccs = np.array([0.1, 0.3, 0.5, 0.7])
+    result = analysis.required_n_couples(icc=iccs)
+    assert result['n_couples'].shape == (4,)
+    assert np.all(np.diff(result['n_couples']) > 0)
+    for icc, n in zip(iccs, result['n_couples']):
+        at_n = analysis.dyadic_power_apim(n, 0.2, 1.4, 1.4, icc, config.aim3_params['alpha'])
+        below = analysis.dyadic_power_apim(n - 1, 0.2, 1.4, 1.4, icc, config.aim3_params['alpha'])
+        assert at_n['actor_power'] >= 0.8 > below['actor_power']
+    partner = analysis.required_n_couples(effect='partner', icc=0.5)
+    assert partner['n_couples'] < result['n_couples'][2]
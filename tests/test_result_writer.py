@@ -0,0 +1,66 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import config
+import sweep
+from result_writer import ResultWriter, read_columns, write_table
+
+def chunk(start, stop):
+    n = np.arange(start, stop)
+    return {'n': n, 'power': 1 - 1 / (n + 1.0)}
+
+def test_writer_streams_csv_and_columnar_parts(tmp_path):
+    writer = ResultWriter(str(tmp_path), fingerprint='run', n_chunks=2)
+    writer.write(0, chunk(0, 3))
+    assert not writer.complete
+    writer.write(1, chunk(3, 5))
+    assert writer.complete
+    frame = pd.read_csv(tmp_path / 'results.csv')
+    np.testing.assert_array_equal(frame['n'], np.arange(5))
+    columns = read_columns(str(tmp_path))
+    np.testing.assert_array_equal(columns['power'], frame['power'])
+    with pytest.raises(ValueError):
+        writer.write(1, chunk(3, 5))
+
+def test_reopening_truncates_interrupted_chunk(tmp_path):
+    writer = ResultWriter(str(tmp_path), fingerprint='run', n_chunks=3)
+    writer.write(0, chunk(0, 3))
+    # A crash after appending CSV rows but before the manifest update
+    with open(tmp_path / 'results.csv', 'ab') as f:
+        f.write(b'3,0.75\n4,0.8')
+    resumed = ResultWriter(str(tmp_path), fingerprint='run', n_chunks=3)
+    assert resumed.completed == {0}
+    resumed.write(1, chunk(3, 5))
+    resumed.write(2, chunk(5, 6))
+    np.testing.assert_array_equal(pd.read_csv(tmp_path / 'results.csv')['n'], np.arange(6))
+    with pytest.raises(ValueError):
+        ResultWriter(str(tmp_path), fingerprint='another run')
+
+def test_write_table_matches_golden_csv(tmp_path):
+    golden_path = os.path.join(os.path.dirname(__file__), '..', 'aim3_power_vs_n.csv')
+    golden = pd.read_csv(golden_path, float_precision='round_trip')
+    path = tmp_path / 'aim3_power_vs_n.csv'
+    write_table(str(path), {name: golden[name].to_numpy() for name in golden}, chunk_rows=5)
+    with open(path) as ours, open(golden_path) as theirs:
+        assert ours.read() == theirs.read()
+
+def test_interrupted_sweep_resumes(tmp_path):
+    plan = sweep.expand_plan(config.aim1_grid)
+    full = sweep.run_sweep('aim1', plan, chunk_size=100, n_jobs=1)
+    out = tmp_path / 'aim1'
+    sweep.run_sweep('aim1', plan, chunk_size=100, n_jobs=1, out_dir=str(out))
+    expected_csv = (out / 'results.csv').read_bytes()
+    # Roll the manifest back two chunks, as if the run had stopped early
+    manifest = json.loads((out / 'manifest.json').read_text())
+    manifest['chunks'] = manifest['chunks'][:-2]
+    manifest['csv_bytes'] = manifest['chunks'][-1]['csv_bytes']
+    manifest['n_rows'] = sum(c['n_rows'] for c in manifest['chunks'])
+    manifest['complete'] = False
+    (out / 'manifest.json').write_text(json.dumps(manifest))
+    resumed = sweep.run_sweep('aim1', plan, chunk_size=100, n_jobs=1, out_dir=str(out))
+    assert (out / 'results.csv').read_bytes() == expected_csv
+    for name in full:
+        np.testing.assert_array_equal(resumed[name], full[name])
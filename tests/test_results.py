@@ -0,0 +1,46 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pandas as pd
+import pytest
+from k01_power_analysis import K01PowerAnalysis
+from results import PowerResultTable
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_batch_results_are_tables_matching_scalar_calls(analysis):
+    n = np.array([150, 237, 400])
+    table = analysis.two_sample_proportion_power_batch(n, 50000, 0.10, 0.06, 0.1, 1.5)
+    assert isinstance(table, PowerResultTable)
+    assert table.shape == (3,) and 'power' in table
+    for i, k in enumerate(n):
+        scalar = analysis.two_sample_proportion_power(int(k), 50000, 0.10, 0.06, 0.1, 1.5)
+        assert table.row(i)['power'] == pytest.approx(scalar['power'], abs=1e-12)
+    dyadic = analysis.dyadic_power_apim_batch([150, 200], 0.2, 1.4, 1.6, 0.3, 0.1)
+    assert dyadic.row(1)['actor_power'] == pytest.approx(
+        analysis.dyadic_power_apim(200, 0.2, 1.4, 1.6, 0.3, 0.1)['actor_power'], abs=1e-12)
+
+def test_frame_shares_column_buffers():
+    power = np.linspace(0, 1, 1000)
+    table = PowerResultTable({'power': power, 'n': np.arange(1000.0), 'alpha': 0.1})
+    frame = table.to_frame()
+    assert np.shares_memory(frame['power'].to_numpy(), power)
+    assert (frame['alpha'] == 0.1).all()
+    records = table.to_records()
+    np.testing.assert_array_equal(records['n'], np.arange(1000.0))
+
+def test_grid_table_flattens_with_coordinates(analysis, tmp_path):
+    surface = analysis.min_detectable_OR_grid(n1=[100, 200, 300], alpha=[0.05, 0.1])
+    assert surface.shape == (3, 2) and surface['dims'] == ['n1', 'alpha']
+    # Mapping views cover columns only; metadata is in .meta
+    assert 'dims' not in surface and 'min_OR' in surface
+    assert set(dict(surface)) == set(surface.keys()) == {k for k in surface} and len(surface) == len(dict(surface))
+    assert surface.meta['coords']['alpha'].tolist() == [0.05, 0.1]
+    path = surface.to_csv(str(tmp_path / 'surface.csv'))
+    frame = pd.read_csv(path, float_precision='round_trip')
+    assert list(frame.columns[:2]) == ['n1', 'alpha']
+    np.testing.assert_array_equal(frame['min_OR'], surface['min_OR'].ravel())
+    assert frame.loc[3, 'n1'] == 200 and frame.loc[3, 'alpha'] == 0.1
+    assert surface.row((1, 1))['min_OR'] == frame.loc[3, 'min_OR']
@@ -0,0 +1,38 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import sensitivity
+from k01_power_analysis import K01PowerAnalysis
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_ishigami_indices():
+    ranges = {'x1': [-np.pi, np.pi], 'x2': [-np.pi, np.pi], 'x3': [-np.pi, np.pi]}
+    plan = sensitivity.saltelli_plan(ranges, 2 ** 15, seed=0)
+    y = np.sin(plan['x1']) + 7 * np.sin(plan['x2']) ** 2 + 0.1 * plan['x3'] ** 4 * np.sin(plan['x1'])
+    indices = sensitivity.sobol_indices(y, 3, n_bootstrap=200, seed=0)
+    np.testing.assert_allclose(indices['first_order'], [0.3139, 0.4424, 0.0], atol=0.02)
+    np.testing.assert_allclose(indices['total'], [0.5576, 0.4424, 0.2437], atol=0.02)
+    assert np.all(indices['total_ci'][:, 0] <= indices['total'])
+    assert np.all(indices['total'] <= indices['total_ci'][:, 1])
+
+def test_saltelli_plan_layout():
+    plan = sensitivity.saltelli_plan({'n_couples': [100, 300], 'alpha': [0.05, 0.1]}, 1000, seed=1)
+    assert len(plan['alpha']) == 1024 * 4
+    assert np.all(plan['n_couples'] == np.round(plan['n_couples']))
+    A, B, AB1, AB2 = np.split(plan['alpha'], 4)
+    np.testing.assert_array_equal(AB1, A)
+    np.testing.assert_array_equal(AB2, B)
+
+def test_aim3_sensitivity(analysis):
+    result = analysis.sensitivity_analysis('aim3', n_base=1024, n_jobs=1)
+    names = result['parameters']
+    actor = result['actor_power']
+    assert result['n_evaluations'] == 1024 * (len(names) + 2)
+    # The partner effect does not enter actor power; the actor effect dominates it
+    assert actor['total'][names.index('partner_effect_OR')] == pytest.approx(0, abs=1e-12)
+    assert names[int(np.argmax(actor['total']))] == 'actor_effect_OR'
+    assert 'actor_effect_OR' in sensitivity.format_indices(result)
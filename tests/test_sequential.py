@@ -0,0 +1,51 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pytest
+from statsmodels.stats.proportion import proportion_confint
+import sequential
+from k01_power_analysis import K01PowerAnalysis
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def bernoulli_batch(seed_seq, n_reps, p, fail_at=None):
+    """Replicates rejecting with probability p; raises on batch ``fail_at`` to simulate an interruption"""
+    if fail_at is not None and seed_seq.spawn_key[-1] == fail_at:
+        raise KeyboardInterrupt
+    reject = np.random.default_rng(seed_seq).random(n_reps) < p
+    return {'power': (reject, np.ones(n_reps, dtype=bool))}
+
+def test_wilson_interval_matches_statsmodels():
+    for s, t in [(0, 50), (37, 50), (780, 1000), (1000, 1000)]:
+        np.testing.assert_allclose(sequential.wilson_interval(s, t), proportion_confint(s, t, method='wilson'))
+
+def test_stops_early_far_from_target():
+    kwargs = dict(batch_size=100, min_reps=200, max_reps=5000, seed=1, n_jobs=1)
+    high = sequential.run_sequential(bernoulli_batch, (0.99,), **kwargs)
+    low = sequential.run_sequential(bernoulli_batch, (0.3,), **kwargs)
+    close = sequential.run_sequential(bernoulli_batch, (0.8,), **kwargs)
+    assert high['n_reps'] == 200 and high['power']['reason'] == 'above_target'
+    assert low['n_reps'] == 200 and low['power']['reason'] == 'below_target'
+    assert close['stopped'] == 'max_reps' and close['n_reps'] == 5000
+
+def test_resume_after_interruption_is_exact(tmp_path):
+    kwargs = dict(batch_size=100, min_reps=200, max_reps=3000, seed=7, fingerprint='scenario')
+    path = str(tmp_path / 'checkpoint.json')
+    reference = sequential.run_sequential(bernoulli_batch, (0.79,), n_jobs=1, **kwargs)
+    with pytest.raises(KeyboardInterrupt):
+        sequential.run_sequential(bernoulli_batch, (0.79, 12), n_jobs=1, checkpoint=path, **kwargs)
+    with open(path) as f:
+        assert json.load(f)['batches'] == 12
+    resumed = sequential.run_sequential(bernoulli_batch, (0.79,), n_jobs=1, checkpoint=path, **kwargs)
+    assert resumed == reference
+    assert sequential.run_sequential(bernoulli_batch, (0.79,), n_jobs=3, **kwargs) == reference
+    with pytest.raises(ValueError):
+        sequential.run_sequential(bernoulli_batch, (0.79,), checkpoint=path, **{**kwargs, 'fingerprint': 'other'})
+
+def test_apim_scenario_stops_below_target(analysis):
+    result = analysis.sequential_power('aim3', n_couples=50, n_jobs=1)
+    assert result['stopped'] == 'rule' and result['n_reps'] == 500
+    assert result['actor_power']['ci'][1] < 0.8
@@ -0,0 +1,111 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import asyncio
+import json
+import numpy as np
+import pytest
+import power_engine
+from k01_power_analysis import K01PowerAnalysis
+from service import MicroBatcher, PowerService
+import config
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_queries_match_analysis(analysis):
+    async def run():
+        service = PowerService()
+        aim1 = await service.query('/aim1/power', {'odds_ratio': 1.5, 'alpha': 0.05})
+        mde = await service.query('/aim1/mde', {})
+        n = await service.query('/aim3/sample_size', {'icc_partners': 0.5})
+        aim3 = await service.query('/aim3/power', {'n_couples': 150})
+        apim = await service.query('/apim/power', {})
+        return aim1, mde, n, aim3, apim
+    aim1, mde, n, aim3, apim = asyncio.run(run())
+
+    p = config.aim1_params
+    expected = analysis.two_sample_proportion_power(
+        p['n_south_asian'], p['n_others'], power_engine.or_to_proportion(1.5, p['ipv_p_others']),
+        p['ipv_p_others'], 0.05, p['design_effect']
+    )
+    assert aim1['power'] == pytest.approx(expected['power'], abs=1e-12)
+    assert aim1['fallback'] is False
+    assert mde['min_OR'] == pytest.approx(
+        analysis.min_detectable_OR(p['n_south_asian'], p['n_others'], p['ipv_p_others'], 0.8, p['alpha'],
+                                   p['design_effect']), abs=1e-10)
+    assert n['n_couples'] == analysis.required_n_couples(icc=0.5)['n_couples']
+    assert aim3['actor_power'] == pytest.approx(
+        analysis.dyadic_power_apim(150, 0.2, 1.4, 1.6, 0.3, 0.1)['actor_power'], abs=1e-12)
+    assert apim['actor_power'] == pytest.approx(analysis.validate_with_apimpowerr()['actor_power_r'], abs=1e-12)
+
+def test_concurrent_queries_are_batched_and_repeats_cached():
+    async def run():
+        service = PowerService(max_delay=0.01)
+        ors = np.linspace(1.1, 2.0, 200)
+        first = await asyncio.gather(*(service.query('/aim1/power', {'odds_ratio': o}) for o in ors))
+        batches = service.batchers['/aim1/power'].batches
+        again = await asyncio.gather(*(service.query('/aim1/power', {'odds_ratio': o}) for o in ors))
+        return ors, first, again, batches, service
+    ors, first, again, batches, service = asyncio.run(run())
+    assert batches == 1
+    assert service.batchers['/aim1/power'].batches == 1
+    assert not service.batchers['/aim1/power']._tasks
+    assert service.cache.hits == 200
+    assert first == again
+    expected = power_engine.two_sample_proportion_power(
+        237, 50000, power_engine.or_to_proportion(ors, 0.06), 0.06, 0.1, 1.5)['power']
+    assert [r['power'] for r in first] == pytest.approx(expected, abs=1e-12)
+
+def test_http_round_trip():
+    async def request(port, method, path, body=None):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        data = json.dumps(body).encode() if body is not None else b''
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: x\r\nContent-Length: {len(data)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + data)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, payload = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(payload)
+
+    def broken(columns):
+        raise RuntimeError('solver crashed')
+
+    async def run():
+        service = PowerService()
+        service.batchers['/apim/power'].evaluate = broken
+        server = await service.start('127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            results = await asyncio.gather(
+                request(port, 'POST', '/aim3/power', [{'icc_partners': 0.1}, {'icc_partners': 0.5}]),
+                request(port, 'POST', '/aim1/power', {'odds_ratio': 'big'}),
+                request(port, 'POST', '/aim1/power', {'n_couples': 200}),
+                request(port, 'GET', '/nowhere'),
+                request(port, 'GET', '/health'),
+                request(port, 'POST', '/apim/power', {}),
+            )
+        return results
+    results = asyncio.run(run())
+    (ok, batch), (bad_type, _), (bad_field, error), (missing, _), (health, stats), (failed, crash) = results
+    assert ok == 200 and batch[0]['actor_power'] > batch[1]['actor_power']
+    assert (bad_type, bad_field, missing, health, failed) == (400, 400, 404, 200, 500)
+    assert 'n_couples' in error['error']
+    assert stats['status'] == 'ok'
+    assert 'solver crashed' in crash['error']
+
+def test_failing_query_does_not_fail_its_batch():
+    def evaluate(columns):
+        if np.any(columns['x'] == 0):
+            raise ZeroDivisionError('x is zero')
+        return {'y': 1 / columns['x']}
+
+    async def run():
+        batcher = MicroBatcher(evaluate, max_delay=0.01)
+        futures = [batcher.submit({'x': x}) for x in (1.0, 0.0, 2.0)]
+        return await asyncio.gather(*futures, return_exceptions=True), batcher.batches
+    (one, zero, two), batches = asyncio.run(run())
+    assert batches == 1
+    assert one == {'y': 1.0} and two == {'y': 0.5}
+    assert isinstance(zero, ZeroDivisionError)
@@ -0,0 +1,80 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import statsmodels.api as sm
+import simulation
+from k01_power_analysis import K01PowerAnalysis
+import config
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_irls_and_robust_se_match_statsmodels_gee():
+    rng = np.random.default_rng(0)
+    X, y = simulation.simulate_apim_dyads(rng, 1, 200, 0.2, 1.4, 1.6, 0.3)
+    fit = simulation.batched_logistic_irls(X, y)
+    cov = simulation.cluster_robust_cov(X, y, fit, np.arange(0, 400, 2))
+    gee = sm.GEE(y[0], X[0], groups=np.repeat(np.arange(200), 2), family=sm.families.Binomial()).fit()
+    assert fit['converged'].all()
+    np.testing.assert_allclose(fit['coef'][0], gee.params, rtol=1e-6)
+    # statsmodels omits the G / (G - 1) small-sample factor
+    np.testing.assert_allclose(np.sqrt(np.diag(cov[0]) * 199 / 200), gee.bse, rtol=1e-6)
+
+def test_simulated_power_is_reproducible_across_workers():
+    kwargs = dict(n_reps=300, seed=11, chunk_size=100)
+    inline = simulation.simulate_apim_power(200, 0.2, 1.4, 1.6, 0.3, 0.1, n_jobs=1, **kwargs)
+    pooled = simulation.simulate_apim_power(200, 0.2, 1.4, 1.6, 0.3, 0.1, n_jobs=2, **kwargs)
+    assert inline == pooled
+    assert inline['n_reps'] == 300
+
+def test_simulated_power_holds_type_one_error():
+    result = simulation.simulate_apim_power(200, 0.2, 1.0, 1.0, 0.3, 0.1, n_reps=2000, seed=5, n_jobs=1)
+    assert result['actor_power'] == pytest.approx(0.1, abs=0.025)
+    assert result['partner_power'] == pytest.approx(0.1, abs=0.025)
+
+def test_simulation_mode_is_close_to_apimpowerr(analysis):
+    # APIMPowerR (apimpower-200dyads.txt) reports .346 actor and .538 partner power
+    params = config.aim3_params
+    result = analysis.dyadic_power_apim(
+        params['n_couples'], params['baseline_ipv_rate'], params['actor_effect_OR'],
+        params['partner_effect_OR'], params['icc_partners'], params['alpha'],
+        method='simulation', n_reps=2000, n_jobs=1
+    )
+    assert result['n_converged'] == 2000
+    assert result['actor_power'] == pytest.approx(0.346, abs=0.05)
+    assert result['partner_power'] == pytest.approx(0.538, abs=0.05)
+
+def test_weighted_irls_matches_statsmodels_glm():
+    rng = np.random.default_rng(3)
+    design = simulation.build_survey_design(rng, 60, 2000, n_strata=5, psus_per_stratum=4, weight_cv=0.5)
+    y = (rng.random((2, 2060)) < np.where(design['X'][:, 1] == 1, 0.2, 0.1)).astype(float)
+    fit = simulation.batched_logistic_irls(design['X'], y, design['weights'])
+    for r in range(2):
+        glm = sm.GLM(y[r], design['X'], family=sm.families.Binomial(), freq_weights=design['weights']).fit()
+        np.testing.assert_allclose(fit['coef'][r], glm.params, rtol=1e-6)
+
+def test_survey_design_layout():
+    rng = np.random.default_rng(4)
+    design = simulation.build_survey_design(rng, 237, 5000, n_strata=10, psus_per_stratum=5)
+    assert design['X'][:, 1].sum() == 237
+    assert np.all(np.diff(design['psu']) >= 0)
+    assert len(design['psu_starts']) == 50
+    assert design['weights'].mean() == pytest.approx(1.0)
+
+def test_survey_power_simulation(analysis):
+    result = analysis.survey_power_simulation(n_reps=100, seed=1, n_jobs=1)
+    assert result['n_converged'] == 100
+    assert 0.3 < result['power'] < 0.9
+    # Weight variation should produce a design effect in the neighbourhood of CHIS's 1.5
+    assert 1.1 < result['design_effect'] < 2.0
+
+def test_rejects_empty_simulations():
+    assert simulation.split_reps(250, 100) == [100, 100, 50]
+    with pytest.raises(ValueError, match='n_reps'):
+        simulation.simulate_apim_power(200, 0.2, 1.4, 1.6, 0.3, 0.1, n_reps=0, n_jobs=1)
+    with pytest.raises(ValueError, match='n_reps'):
+        simulation.simulate_survey_power(237, 5000, 0.10, 0.06, 0.1, n_reps=0, n_jobs=1)
+    with pytest.raises(ValueError, match='chunk_size'):
+        simulation.simulate_survey_power(237, 5000, 0.10, 0.06, 0.1, n_reps=10, chunk_size=0, n_jobs=1)
@@ -0,0 +1,60 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import numpy as np
+import pytest
+import power_engine
+import surface_store
+import config
+
+GRID = {
+    'n_couples': [100, 150, 200, 250],
+    'effect_OR': {'start': 1.0, 'stop': 2.0, 'num': 21},
+    'alpha': [0.05, 0.1],
+    'icc_partners': [0.1, 0.3, 0.5],
+}
+
+def exact(n, OR, alpha, icc):
+    return power_engine.apim_effect_power(n, config.aim3_params['baseline_ipv_rate'], OR, icc, alpha)[0]
+
+def test_slices_match_power_engine_on_grid(tmp_path):
+    surface = surface_store.build_surface(str(tmp_path / 's'), 'aim3_power', GRID, config.aim3_params,
+                                          chunk_size=3, n_jobs=1)
+    assert surface.shape == (4, 21, 2, 3) and surface.computed == 2
+    curve = surface.slice(n_couples=200, alpha=0.1, icc_partners=0.3)
+    assert curve['dims'] == ['effect_OR']
+    np.testing.assert_allclose(curve['power'], exact(200, surface.coords['effect_OR'], 0.1, 0.3), atol=1e-14)
+    plane = surface.slice(effect_OR=1.4, alpha=0.05)
+    assert plane.shape == (4, 3)
+    np.testing.assert_allclose(plane['power'], exact(np.array([100, 150, 200, 250])[:, None], 1.4, 0.05,
+                                                     np.array([0.1, 0.3, 0.5])), atol=1e-14)
+
+def test_interpolation_between_grid_points(tmp_path):
+    surface = surface_store.build_surface(str(tmp_path / 's'), 'aim3_power', GRID, config.aim3_params, n_jobs=1)
+    OR = np.array([1.0, 1.234, 1.71, 2.0])
+    values = surface.interpolate(n_couples=175, effect_OR=OR, alpha=0.1, icc_partners=0.4)
+    np.testing.assert_allclose(values, exact(175, OR, 0.1, 0.4), atol=0.01)
+    # Multilinear: halfway between two grid points is their mean
+    mid = surface.slice(n_couples=175, alpha=0.1, icc_partners=0.3)['power']
+    np.testing.assert_allclose(mid, (exact(150, surface.coords['effect_OR'], 0.1, 0.3)
+                                     + exact(200, surface.coords['effect_OR'], 0.1, 0.3)) / 2, atol=1e-14)
+    with pytest.raises(ValueError):
+        surface.interpolate(n_couples=600, effect_OR=1.5, alpha=0.1, icc_partners=0.3)
+
+def test_build_resumes_missing_chunks_and_rebuilds_on_change(tmp_path):
+    directory = str(tmp_path / 's')
+    full = surface_store.build_surface(directory, 'aim3_power', GRID, config.aim3_params, chunk_size=1, n_jobs=1)
+    reference = np.array(full.arrays['power'])
+    # Drop two chunks as if the build had been interrupted
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    meta['completed'] = [0, 3]
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    resumed = surface_store.build_surface(directory, 'aim3_power', GRID, config.aim3_params, chunk_size=1, n_jobs=1)
+    assert resumed.computed == 2
+    np.testing.assert_array_equal(resumed.arrays['power'], reference)
+    assert surface_store.build_surface(directory, 'aim3_power', GRID, config.aim3_params, chunk_size=1).computed == 0
+    changed = surface_store.build_surface(directory, 'aim3_power', {**GRID, 'alpha': [0.1]}, config.aim3_params,
+                                          chunk_size=1, n_jobs=1)
+    assert changed.computed == 4 and changed.shape == (4, 21, 1, 3)
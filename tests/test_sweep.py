@@ -0,0 +1,75 @@
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+import power_engine
+import sweep
+from k01_power_analysis import K01PowerAnalysis
+import config
+
+@pytest.fixture
+def analysis():
+    return K01PowerAnalysis()
+
+def test_cartesian_plan_crosses_every_value():
+    plan = sweep.expand_plan({'n_couples': [100, 200], 'alpha': [0.05, 0.1, 0.2]})
+    assert plan['n_couples'].tolist() == [100, 100, 100, 200, 200, 200]
+    assert plan['alpha'].tolist() == [0.05, 0.1, 0.2] * 2
+
+def test_lhs_plan_stratifies_each_range():
+    plan = sweep.expand_plan({'n_couples': [100, 300], 'icc_partners': [0.1, 0.5]}, 'lhs', 50, seed=1)
+    icc = plan['icc_partners']
+    assert len(icc) == 50 and icc.min() >= 0.1 and icc.max() <= 0.5
+    # One point per stratum of the range
+    assert sorted(np.floor((icc - 0.1) / 0.4 * 50).astype(int)) == list(range(50))
+    assert np.all(plan['n_couples'] == np.round(plan['n_couples']))
+    with pytest.raises(ValueError):
+        sweep.expand_plan({'alpha': [0.05, 0.1]}, 'lhs')
+
+def test_aim1_sweep_matches_scalar_and_is_chunk_invariant(analysis):
+    table = analysis.run_sweep('aim1', chunk_size=77, n_jobs=1)
+    n_rows = np.prod([len(v) for v in config.aim1_grid.values()])
+    assert all(len(column) == n_rows for column in table.values())
+    i = 123
+    p_sa = power_engine.or_to_proportion(table['odds_ratio'][i], table['ipv_p_others'][i])
+    scalar = analysis.two_sample_proportion_power(
+        table['n_south_asian'][i], config.aim1_params['n_others'], p_sa, table['ipv_p_others'][i],
+        table['alpha'][i], table['design_effect'][i]
+    )
+    assert table['power'][i] == pytest.approx(scalar['power'], abs=1e-12)
+    parallel = analysis.run_sweep('aim1', chunk_size=100, n_jobs=2)
+    for name in table:
+        np.testing.assert_array_equal(table[name], parallel[name])
+
+def test_aim3_sweep_keeps_point_values_outside_grid(analysis):
+    table = analysis.run_sweep('aim3', grid={'icc_partners': [0.1, 0.3, 0.5]}, n_jobs=1)
+    assert list(table) == ['icc_partners', 'actor_power', 'partner_power', 'n_effective']
+    scalar = analysis.dyadic_power_apim(200, 0.2, 1.4, 1.6, 0.3, 0.1)
+    assert table['actor_power'][1] == pytest.approx(scalar['actor_power'], abs=1e-12)
+    assert table['partner_power'][1] == pytest.approx(scalar['partner_power'], abs=1e-12)
+
+def test_rejects_conflicting_and_empty_plans():
+    plan = sweep.expand_plan({'odds_ratio': [1.2, 1.5], 'ipv_p_south_asian': [0.08, 0.1]})
+    with pytest.raises(ValueError, match='odds_ratio'):
+        sweep.run_sweep('aim1', plan, n_jobs=1)
+    with pytest.raises(ValueError, match='no scenarios'):
+        sweep.run_sweep('aim3', sweep.expand_plan({'n_couples': []}), n_jobs=1)
+    with pytest.raises(ValueError, match='no scenarios'):
+        sweep.run_sweep('aim3', {}, n_jobs=1)
+
+def test_rejects_unknown_parameters():
+    plan = sweep.expand_plan({'n_south_asain': [200, 300], 'alpha': [0.05, 0.1]})
+    with pytest.raises(ValueError, match='n_south_asain'):
+        sweep.run_sweep('aim1', plan, n_jobs=1)
+    with pytest.raises(ValueError, match='odds_ratio'):
+        sweep.run_sweep('aim3', sweep.expand_plan({'odds_ratio': [1.2, 1.5]}), n_jobs=1)
+
+def test_unseeded_lhs_run_resumes_with_its_saved_seed(tmp_path):
+    argv = ['--aim', '3', '--design', 'lhs', '--samples', '40', '--chunk-size', '10', '--jobs', '1',
+            '--out', str(tmp_path)]
+    first = sweep.main(argv)
+    resumed = sweep.main(argv)
+    for name in first:
+        np.testing.assert_array_equal(first[name], resumed[name])
+    with pytest.raises(ValueError, match='different run'):
+        sweep.main(argv + ['--seed', '1'])